@@ -0,0 +1,126 @@
+### Imports
+import numpy as np
+import pandas as pd
+
+ROLLUP_KEYS = ['puuid', 'team_position', 'champion', 'patch']
+MATCHUP_KEYS = ROLLUP_KEYS + ['opp_champion']
+
+# Additive sums kept in a rollup: merging two rollups is a sum per key
+ROLLUP_SUMS = ['games', 'wins', 'kills', 'deaths', 'assists', 'cs', 'vision_score', 'minutes']
+
+
+def patch_of(game_version):
+    """'15.1.646.5271' -> '15.1', for a whole column."""
+    parts = game_version.astype(str).str.split('.', n=2)
+    return parts.str[0] + '.' + parts.str[1]
+
+
+def compute_rollup(df, keys=ROLLUP_KEYS):
+    """Aggregates player games into additive sums in one grouped pass.
+
+    Args:
+        df (DataFrame): Parsed matches (time_played in minutes).
+        keys (list, optional): Grouping keys. Defaults to puuid x role x champion x patch.
+
+    Returns:
+        DataFrame: keys + ROLLUP_SUMS, one row per key.
+    """
+    columns = {
+        'games': np.ones(len(df), dtype=np.int64),
+        'wins': df['win'].astype(np.int64).to_numpy(),
+    }
+    for stat in ['kills', 'deaths', 'assists', 'vision_score']:
+        columns[stat] = df[stat].to_numpy() if stat in df.columns else np.zeros(len(df), dtype=np.int64)
+    columns['cs'] = (df['total_minions_killed'] + df['total_neutral_minions_killed']).to_numpy() \
+        if 'total_minions_killed' in df.columns else np.zeros(len(df), dtype=np.int64)
+    columns['minutes'] = df['time_played'].to_numpy(dtype=float) if 'time_played' in df.columns else np.zeros(len(df))
+    for key in keys:
+        if key == 'patch' and 'patch' not in df.columns:
+            columns[key] = patch_of(df['game_version']).to_numpy()
+        else:
+            columns[key] = df[key].to_numpy()
+    frame = pd.DataFrame(columns)
+    return frame.groupby(keys, as_index=False, observed=True, dropna=False)[ROLLUP_SUMS].sum()
+
+
+def compute_matchup_rollup(df):
+    """Same as compute_rollup, also keyed by the lane opponent's champion."""
+    return compute_rollup(df[df['opp_champion'].notna()], MATCHUP_KEYS)
+
+
+def merge_rollups(*rollups):
+    """Merges rollups computed on disjoint batches of games, without rescanning the games.
+
+    Returns:
+        DataFrame: Summed rollup.
+    """
+    rollups = [rollup for rollup in rollups if rollup is not None and not rollup.empty]
+    if not rollups:
+        return pd.DataFrame(columns=ROLLUP_KEYS + ROLLUP_SUMS)
+    keys = [column for column in rollups[0].columns if column not in ROLLUP_SUMS]
+    merged = pd.concat(rollups, ignore_index=True)
+    return merged.groupby(keys, as_index=False, observed=True, dropna=False)[ROLLUP_SUMS].sum()
+
+
+def rollup_metrics(rollup, by=None):
+    """Derives the rates of a rollup, optionally re-aggregated on fewer keys (e.g. across patches).
+
+    Args:
+        rollup (DataFrame): Output of compute_rollup / merge_rollups.
+        by (list, optional): Keys to aggregate on first. Defaults to None (keep the rollup keys).
+
+    Returns:
+        DataFrame: keys, games, wins, win_rate (%), kda, cs_per_min, vision_per_min.
+    """
+    sums = [column for column in ROLLUP_SUMS if column in rollup.columns]
+    if by is not None:
+        rollup = rollup.groupby(by, as_index=False, observed=True, dropna=False)[sums].sum()
+    metrics = rollup.copy()
+    metrics['win_rate'] = (metrics['wins'] / metrics['games'] * 100).round(2)
+    # rates are only derived when their sums are in the rollup (e.g. not in the games / wins summary)
+    if {'kills', 'deaths', 'assists'} <= set(sums):
+        metrics['kda'] = ((metrics['kills'] + metrics['assists']) / metrics['deaths'].clip(lower=1)).round(2)
+    if 'minutes' in sums:
+        minutes = metrics['minutes'].where(metrics['minutes'] > 0)
+        metrics['cs_per_min'] = (metrics['cs'] / minutes).round(2)
+        metrics['vision_per_min'] = (metrics['vision_score'] / minutes).round(2)
+    return metrics
+
+
+def split_by(metrics, keys=('puuid', 'team_position'), sort_by='games'):
+    """Splits a metrics table into one table per key in one pass, most played first.
+
+    Returns:
+        dict: key tuple -> DataFrame.
+    """
+    metrics = metrics.sort_values(by=sort_by, ascending=False)
+    return {key: table for key, table in metrics.groupby(list(keys), observed=True, sort=False)}
+
+
+def load_rollup(path):
+    """Reads a rollup saved by save_rollup, None if it does not exist yet."""
+    try:
+        return pd.read_parquet(path)
+    except FileNotFoundError:
+        return None
+
+
+def save_rollup(rollup, path):
+    rollup.to_parquet(path, index=False)
+
+
+def update_rollup(path, df, matchups=False):
+    """Adds a batch of new games to a rollup file.
+
+    Args:
+        path (str): Parquet file of the rollup.
+        df (DataFrame): Newly ingested games, never counted before.
+        matchups (bool, optional): Matchup rollup (keyed by opp_champion). Defaults to False.
+
+    Returns:
+        DataFrame: The updated rollup.
+    """
+    batch = compute_matchup_rollup(df) if matchups else compute_rollup(df)
+    rollup = merge_rollups(load_rollup(path), batch)
+    save_rollup(rollup, path)
+    return rollup
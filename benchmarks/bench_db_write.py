@@ -0,0 +1,56 @@
+"""Measures the DB write throughput of db_writer.from_df_to_db.
+
+Writes a parsed batch of synthetic (or recorded) matches into a SQLite
+stand-in of supabase with a simulated round trip per request, for several
+batch size x workers configurations. '1x1' is the row-at-a-time insert loop
+update.py used to run.
+
+    $ python benchmarks/bench_db_write.py --matches 2000 --latency 0.02 --configs 1x1,100x4,500x4
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_writer import from_df_to_db
+from match_parser import MatchBatchBuilder, format_match_dataframe
+from record_fixtures import load_match_fixtures
+from sqlite_supabase import SQLiteSupabase
+from synthetic_matches import make_match_jsons
+
+
+def parse_configs(value):
+    return [tuple(map(int, config.split('x'))) for config in value.split(',')]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--matches', type=int, default=2000, help='number of synthetic matches to write')
+    arg_parser.add_argument('--fixtures', default=None, help='write the recorded matches of this directory instead')
+    arg_parser.add_argument('--latency', type=float, default=0.02, help='seconds of round trip per request')
+    arg_parser.add_argument('--configs', default='1x1,100x4,500x4', help='batch_size x max_workers to compare')
+    arg_parser.add_argument('--row-limit', type=int, default=500,
+                            help='rows written by the batch_size=1 configurations (they are slow)')
+    args = arg_parser.parse_args()
+
+    list_match_json = load_match_fixtures(args.fixtures) if args.fixtures else make_match_jsons(args.matches)
+    builder = MatchBatchBuilder()
+    builder.extend(list_match_json)
+    df = format_match_dataframe(builder.to_dataframe())
+    print(f'{len(df)} rows to write, {args.latency * 1000:.0f} ms per request')
+
+    for batch_size, max_workers in parse_configs(args.configs):
+        rows = df if batch_size > 1 else df.head(args.row_limit)
+        supabase = SQLiteSupabase(latency=args.latency)
+        t1 = time.perf_counter()
+        result = from_df_to_db(supabase, rows, 'game_player', batch_size=batch_size, max_workers=max_workers)
+        elapsed = time.perf_counter() - t1
+        assert supabase.count('game_player') == result['rows']
+        print(f'{batch_size}x{max_workers}: {result["rows"]} rows in {elapsed:.2f}s '
+              f'({result["rows"] / elapsed:.0f} rows/s, {supabase.requests} requests)')
+
+
+if __name__ == '__main__':
+    main()
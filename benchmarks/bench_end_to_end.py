@@ -0,0 +1,83 @@
+"""End-to-end throughput of api_get_match_history_puuid against the mock Riot server.
+
+Runs the whole ingestion (history walk, store lookup, match fetch, parse) for
+a set of players, with the threaded and/or the asyncio engine, and reports
+matches/s with the per-stage breakdown of metrics.py. Each run starts from an
+empty SQLite store, a fresh rate limiter and a fresh server.
+
+    $ python benchmarks/bench_end_to_end.py --players 5 --max-matches 100 --latency 0.05 --jitter 0.05
+    $ python benchmarks/bench_end_to_end.py --app-limits 20:1,100:120 --error-rate 0.02 --mode async
+    $ python benchmarks/bench_end_to_end.py --fixtures benchmarks/fixtures
+
+The default limits are those of a production key so the numbers reflect the
+client rather than the rate limits; pass --app-limits 20:1,100:120 to see a
+development key.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rate_limiter
+import riot_functions
+from config import get_config
+from match_store import SQLiteMatchStore
+from metrics import get_metrics
+from mock_riot_server import start_mock_server
+from record_fixtures import recorded_puuids
+
+
+def run(mode, list_puuid, args):
+    server = start_mock_server(app_limits=args.app_limits, latency=args.latency, jitter=args.jitter,
+                               error_rate=args.error_rate, fixtures=args.fixtures)
+    get_config().riot_base_url = server.base_url
+    rate_limiter.rate_limiter = rate_limiter.RateLimiter(app_limits=args.app_limits)
+    metrics = get_metrics()
+    metrics.reset()
+
+    t1 = time.perf_counter()
+    df = riot_functions.api_get_match_history_puuid(list_puuid, 'europe', asynchronous=(mode == 'async'),
+                                                    store=SQLiteMatchStore(), max_matches=args.max_matches)
+    elapsed = time.perf_counter() - t1
+    server.shutdown()
+    server.server_close()
+
+    summary = metrics.run_summary()
+    n_matches = df['match_id'].nunique() if len(df) else 0
+    latency = summary['histograms'].get('riot_request_seconds', {}).get('method="match-v5.getMatch"', {})
+    print(f'{mode:5}: {n_matches} matches, {len(df)} rows in {elapsed:.2f}s ({n_matches / elapsed:.1f} matches/s), '
+          f'{server.stats["requests"]} requests, {server.stats["429"]} answered 429 '
+          f'({server.stats["injected_429"]} injected), getMatch p50 {latency.get("p50", 0) * 1000:.0f} ms '
+          f'p95 {latency.get("p95", 0) * 1000:.0f} ms')
+    for stage, values in summary['stages'].items():
+        print(f'       {stage:15} {values["wall_seconds"]:8.2f}s wall, {values["seconds"]:8.2f}s over the threads')
+    return {'mode': mode, 'matches': n_matches, 'rows': len(df), 'seconds': elapsed,
+            'server': dict(server.stats), 'summary': summary}
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--players', type=int, default=5, help='synthetic players (ignored with --fixtures)')
+    arg_parser.add_argument('--max-matches', type=int, default=100, help='history length walked per player')
+    arg_parser.add_argument('--mode', choices=['sync', 'async', 'both'], default='both')
+    arg_parser.add_argument('--app-limits', default='500:10,30000:600')
+    arg_parser.add_argument('--latency', type=float, default=0.05, help='seconds added to every answer')
+    arg_parser.add_argument('--jitter', type=float, default=0.05, help='extra random latency in seconds')
+    arg_parser.add_argument('--error-rate', type=float, default=0.0, help="share of 'service' 429s")
+    arg_parser.add_argument('--fixtures', default=None, help='replay the recorded answers of this directory')
+    arg_parser.add_argument('--output', default=None, help='write the results as json to this file')
+    args = arg_parser.parse_args()
+
+    list_puuid = recorded_puuids(args.fixtures) if args.fixtures else [f'bench-player-{i}' for i in range(args.players)]
+    modes = ['sync', 'async'] if args.mode == 'both' else [args.mode]
+    results = [run(mode, list_puuid, args) for mode in modes]
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
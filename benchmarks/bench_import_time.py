@@ -0,0 +1,101 @@
+"""Tracks the import time of the pipeline modules with python -X importtime.
+
+Every module is imported in a fresh interpreter (what a Streamlit cold start or
+a spawned worker pays) and the best cumulative time of --repeat runs is kept,
+with the heaviest dependencies it pulled in. Results can be saved and later
+runs compared against them to catch a heavy import sneaking back in:
+
+    $ python benchmarks/bench_import_time.py --save benchmarks/import_time.json
+    $ python benchmarks/bench_import_time.py --baseline benchmarks/import_time.json --tolerance 0.5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ['config', 'match_parser', 'riot_client', 'riot_functions', 'match_stream', 'db_writer',
+           'update', 'reparse', 'dashboard_data']
+
+
+def parse_importtime(stderr):
+    """Parses the -X importtime report.
+
+    Returns:
+        list: (depth, module, self µs, cumulative µs) in report order.
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        entries.append((depth, name.strip(), int(self_us), int(cumulative_us)))
+    return entries
+
+
+def import_time(module):
+    """Imports a module in a fresh interpreter.
+
+    Returns:
+        dict: 'ms' cumulative import time, 'modules' number of modules imported,
+            'heaviest' top-level dependencies by cumulative ms. None if the import failed.
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        print(f'{module}: import failed ({result.stderr.strip().splitlines()[-1]})')
+        return None
+    entries = parse_importtime(result.stderr)
+    # children are reported before their parent: the module's imports follow the previous
+    # top-level entry (interpreter startup, site-packages .pth files)
+    end = max(i for i, (depth, name, _, _) in enumerate(entries) if name == module and depth == 0)
+    start = max([i + 1 for i, entry in enumerate(entries[:end]) if entry[0] == 0] + [0])
+    subtree = entries[start:end + 1]
+    heaviest = sorted(((name, cumulative) for depth, name, _, cumulative in subtree if depth == 1),
+                      key=lambda item: item[1], reverse=True)[:5]
+    return {'ms': entries[end][3] / 1000, 'modules': len(subtree),
+            'heaviest': [(name, round(cumulative / 1000, 1)) for name, cumulative in heaviest]}
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('modules', nargs='*', default=MODULES)
+    arg_parser.add_argument('--repeat', type=int, default=3, help='runs per module, the fastest is kept')
+    arg_parser.add_argument('--save', default=None, help='write the results to this json file')
+    arg_parser.add_argument('--baseline', default=None, help='json file of a previous --save to compare with')
+    arg_parser.add_argument('--tolerance', type=float, default=0.5,
+                            help='relative slowdown over the baseline reported as a regression')
+    args = arg_parser.parse_args()
+
+    results = {}
+    for module in args.modules:
+        runs = []
+        for _ in range(args.repeat):
+            run = import_time(module)
+            if run is None:
+                break
+            runs.append(run)
+        if not runs:
+            continue
+        results[module] = min(runs, key=lambda run: run['ms'])
+        heaviest = ', '.join(f'{name} {ms:.0f}' for name, ms in results[module]['heaviest'])
+        print(f'{module:16} {results[module]["ms"]:8.1f} ms  {results[module]["modules"]:4} modules  ({heaviest})')
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = [module for module, result in results.items()
+                       if module in baseline and result['ms'] > baseline[module]['ms'] * (1 + args.tolerance)]
+        for module in regressions:
+            print(f'REGRESSION {module}: {baseline[module]["ms"]:.1f} ms -> {results[module]["ms"]:.1f} ms')
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
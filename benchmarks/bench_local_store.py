@@ -0,0 +1,81 @@
+"""Measures the ingestion and the query latency of local_store.LocalStore.
+
+Ingests synthetic matches batch by batch like update.py does, then times the
+dashboard queries (a team's games and champion stats) and a global
+aggregation, against the same computation done in pandas on the whole
+DataFrame. The synthetic players are drawn from a pool of --players puuids so
+every player has a history.
+
+    $ python benchmarks/bench_local_store.py --matches 20000 --players 500
+    $ python benchmarks/bench_local_store.py --engine sqlite --batch-matches 100
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import compute_rollup
+from local_store import LocalStore
+from match_parser import MatchBatchBuilder, format_match_dataframe
+from synthetic_matches import make_match_jsons
+
+
+def timed(function, repeat):
+    """Best time of `repeat` calls, with the last result."""
+    best = float('inf')
+    for _ in range(repeat):
+        t1 = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - t1)
+    return best, result
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--matches', type=int, default=20000, help='number of synthetic matches')
+    arg_parser.add_argument('--players', type=int, default=500, help='size of the pool of puuids')
+    arg_parser.add_argument('--team', type=int, default=5, help='players of the team queries')
+    arg_parser.add_argument('--batch-matches', type=int, default=500, help='matches per ingested batch')
+    arg_parser.add_argument('--engine', choices=['duckdb', 'sqlite'], default=None)
+    arg_parser.add_argument('--repeat', type=int, default=5)
+    args = arg_parser.parse_args()
+
+    builder = MatchBatchBuilder()
+    builder.extend(make_match_jsons(args.matches))
+    df = format_match_dataframe(builder.to_dataframe())
+    pool = [f'bench-player-{i}' for i in range(args.players)]
+    df['puuid'] = [pool[i % args.players] for i in range(len(df))]
+    team = pool[:args.team]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = LocalStore(os.path.join(tmp, 'local_store.db'), args.engine)
+        rows_per_batch = args.batch_matches * 10
+        t1 = time.perf_counter()
+        for i in range(0, len(df), rows_per_batch):
+            store.ingest(df.iloc[i:i + rows_per_batch])
+        elapsed = time.perf_counter() - t1
+        print(f'{store.engine}: {store.count()} rows ingested in {elapsed:.2f}s ({len(df) / elapsed:.0f} rows/s), '
+              f'{os.path.getsize(store.path) / 1024 ** 2:.1f} MB')
+
+        queries = [
+            ('team games', lambda: store.player_games(team, ['puuid', 'team_position', 'champion', 'win']),
+             lambda: df[df['puuid'].isin(team)][['puuid', 'team_position', 'champion', 'win']]),
+            ('team champion stats', lambda: store.champion_stats(team),
+             lambda: compute_rollup(df[df['puuid'].isin(team)], ['puuid', 'team_position', 'champion'])),
+            ('champion stats, all', lambda: store.champion_stats(by=('champion', 'team_position')),
+             lambda: compute_rollup(df, ['champion', 'team_position'])),
+        ]
+        for name, local_query, pandas_query in queries:
+            local_seconds, local_result = timed(local_query, args.repeat)
+            pandas_seconds, pandas_result = timed(pandas_query, args.repeat)
+            assert len(local_result) == len(pandas_result), name
+            print(f'{name:22} {local_seconds * 1000:8.1f} ms  (pandas in memory {pandas_seconds * 1000:8.1f} ms, '
+                  f'{len(local_result)} rows)')
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
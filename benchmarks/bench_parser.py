@@ -0,0 +1,87 @@
+"""Compares the match flattening paths on synthetic match jsons.
+
+Run from the repository root:
+
+    $ python benchmarks/bench_parser.py --matches 10000
+    $ python benchmarks/bench_parser.py --fixtures benchmarks/fixtures
+
+The legacy path reproduces what api_get_match_history_puuid used to do: one
+single-row DataFrame per participant concatenated into the match DataFrame,
+then every match concatenated into a growing result. The per-match path calls
+process_match_json_reporting once per match and concatenates the results once.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from match_parser import MatchBatchBuilder, append_match_json_reporting, new_match_columns, process_match_json_reporting
+from record_fixtures import load_match_fixtures
+from synthetic_matches import make_match_jsons
+
+
+def legacy_parse(list_match_json):
+    """Per-row DataFrame + pd.concat path (quadratic in the number of matches)."""
+    df = pd.DataFrame()
+    for match_json in list_match_json:
+        columns = new_match_columns()
+        n_rows = append_match_json_reporting(columns, match_json)
+        matchDFs = pd.DataFrame()
+        for i in range(n_rows):
+            matchDF = pd.DataFrame({column: [values[i]] for column, values in columns.items()})
+            matchDFs = pd.concat([matchDFs, matchDF])
+        df = pd.concat([df, matchDFs])
+    return df
+
+
+def batch_parse(list_match_json):
+    """Columnar buffers, one DataFrame built at the end."""
+    builder = MatchBatchBuilder()
+    builder.extend(list_match_json)
+    return builder.to_dataframe()
+
+
+def per_match_parse(list_match_json):
+    """One process_match_json_reporting DataFrame per match, a single concat."""
+    return pd.concat([process_match_json_reporting(match_json) for match_json in list_match_json])
+
+
+def timed(function, list_match_json):
+    t1 = time.perf_counter()
+    df = function(list_match_json)
+    return df, time.perf_counter() - t1
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--matches', type=int, default=10000, help='number of matches to parse')
+    arg_parser.add_argument('--fixtures', default=None, help='parse the recorded matches of this directory instead')
+    arg_parser.add_argument('--legacy-matches', type=int, default=None,
+                            help='number of matches for the legacy path (defaults to --matches)')
+    args = arg_parser.parse_args()
+
+    list_match_json = load_match_fixtures(args.fixtures) if args.fixtures else make_match_jsons(args.matches)
+    n_matches = len(list_match_json)
+    n_legacy = n_matches if args.legacy_matches is None else min(args.legacy_matches, n_matches)
+
+    df_batch, t_batch = timed(batch_parse, list_match_json)
+    print(f'batch  : {n_matches} matches, {len(df_batch)} rows in {t_batch:.2f}s '
+          f'({n_matches / t_batch:.0f} matches/s)')
+
+    df_single, t_single = timed(per_match_parse, list_match_json)
+    print(f'single : {n_matches} matches, {len(df_single)} rows in {t_single:.2f}s '
+          f'({n_matches / t_single:.0f} matches/s)')
+
+    if n_legacy > 0:
+        df_legacy, t_legacy = timed(legacy_parse, list_match_json[:n_legacy])
+        print(f'legacy : {n_legacy} matches, {len(df_legacy)} rows in {t_legacy:.2f}s '
+              f'({n_legacy / t_legacy:.0f} matches/s)')
+        assert list(df_legacy.columns) == list(df_batch.columns)
+        print(f'speedup: {(t_legacy / n_legacy) / (t_batch / n_matches):.1f}x per match')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""Checks the shared rate limiter against the mock Riot server.
+
+Fires concurrent match requests through riot_client.api_request and
+reports the throughput reached and the number of 429s the server had to send.
+
+    $ python benchmarks/bench_rate_limiter.py --requests 300 --app-limits 20:1,100:10
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+import riot_client
+from config import get_config
+from mock_riot_server import start_mock_server
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--requests', type=int, default=300)
+    arg_parser.add_argument('--workers', type=int, default=15)
+    arg_parser.add_argument('--app-limits', default='20:1,100:10')
+    args = arg_parser.parse_args()
+
+    server = start_mock_server(app_limits=args.app_limits)
+    get_config().riot_base_url = server.base_url
+    session = requests.Session()
+
+    def fetch(i):
+        url = riot_client.riot_root_url('europe') + f'/lol/match/v5/matches/EUW1_{7000000000 + i}'
+        return riot_client.api_request(url, 'europe', 'match-v5.getMatch', session).status_code
+
+    t1 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        statuses = list(executor.map(fetch, range(args.requests)))
+    elapsed = time.perf_counter() - t1
+    server.shutdown()
+
+    print(f'{args.requests} requests in {elapsed:.1f}s ({args.requests / elapsed:.1f} req/s), '
+          f'{statuses.count(200)} ok, {server.stats["429"]} answered 429 by the server')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Compares the size of the wide game_player layout with the normalized one of normalized_store.
+
+Writes the same parsed matches both ways into SQLite stand-ins of supabase and
+reports the CSV size, the json bytes uploaded, the database file size and the
+json bytes of the dashboard query (a few players' puuid, role, champion, win).
+The normalized tables are read back into the wide layout and compared with
+the input.
+
+    $ python benchmarks/bench_storage.py --matches 2000
+    $ python benchmarks/bench_storage.py --csv template_csv_soloq.csv
+
+Synthetic matches have 10 new puuids each, the worst case for the dictionary:
+real histories of a roster share most of their players.
+"""
+import argparse
+import ast
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from db_writer import from_df_to_db
+from match_parser import MATCH_COLUMNS, MatchBatchBuilder, format_match_dataframe
+from normalized_store import IdDictionary, denormalize, from_df_to_normalized_db, load_player_games, normalize
+from record_fixtures import load_match_fixtures
+from sqlite_supabase import SQLiteSupabase
+from synthetic_matches import make_match_jsons
+
+DASHBOARD_COLUMNS = ['puuid', 'team_position', 'champion', 'win']
+
+
+def read_csv_export(path):
+    """Reads a CSV export of game_player like template_csv_soloq.csv."""
+    df = pd.read_csv(path)
+    df = df[[c for c in MATCH_COLUMNS if c in df.columns]]
+    df['participants'] = df['participants'].map(ast.literal_eval)
+    for column in ['game_creation', 'game_start_timestamp', 'game_end_timestamp']:
+        df[column] = pd.to_datetime(df[column])
+    for column in df.columns:
+        if pd.api.types.is_string_dtype(df[column]):
+            # empty cells are None in the parser's output (no lane opponent...)
+            df[column] = df[column].astype(object).where(df[column].notna(), None)
+    return df
+
+
+def csv_bytes(*frames):
+    return sum(len(frame.to_csv(index=False).encode()) for frame in frames)
+
+
+def megabytes(n):
+    return f'{n / 1024 ** 2:8.2f} MB'
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--matches', type=int, default=2000, help='number of synthetic matches')
+    arg_parser.add_argument('--fixtures', default=None, help='use the recorded matches of this directory instead')
+    arg_parser.add_argument('--csv', default=None, help='use a CSV export of game_player instead')
+    arg_parser.add_argument('--players', type=int, default=5, help='players read by the dashboard query')
+    args = arg_parser.parse_args()
+
+    if args.csv:
+        df = read_csv_export(args.csv)
+    else:
+        list_match_json = load_match_fixtures(args.fixtures) if args.fixtures else make_match_jsons(args.matches)
+        builder = MatchBatchBuilder()
+        builder.extend(list_match_json)
+        df = format_match_dataframe(builder.to_dataframe())
+    print(f'{df["match_id"].nunique()} matches, {len(df)} rows')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dictionary = IdDictionary(os.path.join(tmp, 'id_dictionary.json'))
+        matches, participants = normalize(df, dictionary)
+        dictionary.save()
+        rebuilt = denormalize(matches, participants, dictionary)
+        pd.testing.assert_frame_equal(rebuilt, df.reset_index(drop=True), check_dtype=False)
+
+        wide_db = SQLiteSupabase(os.path.join(tmp, 'wide.db'))
+        from_df_to_db(wide_db, df, 'game_player')
+        normalized_db = SQLiteSupabase(os.path.join(tmp, 'normalized.db'))
+        from_df_to_normalized_db(normalized_db, df, IdDictionary(os.path.join(tmp, 'upload_dictionary.json')))
+
+        list_puuid = df['puuid'].value_counts().head(args.players).index.tolist()
+        wide_db.bytes_received = normalized_db.bytes_received = 0
+        wide_games = pd.DataFrame(wide_db.table('game_player').select(','.join(DASHBOARD_COLUMNS))
+                                  .in_('puuid', list_puuid).execute().data)
+        normalized_games = load_player_games(normalized_db, list_puuid, DASHBOARD_COLUMNS)
+        assert len(wide_games) == len(normalized_games)
+
+        rows = [('csv', csv_bytes(df), csv_bytes(matches, participants) + os.path.getsize(dictionary.path)),
+                ('upload json', wide_db.bytes_sent, normalized_db.bytes_sent),
+                ('database file', os.path.getsize(os.path.join(tmp, 'wide.db')),
+                 os.path.getsize(os.path.join(tmp, 'normalized.db'))),
+                ('dashboard query', wide_db.bytes_received, normalized_db.bytes_received)]
+    print(f'{"":16} {"wide":>11} {"normalized":>11}')
+    for name, wide, normalized in rows:
+        print(f'{name:16} {megabytes(wide)} {megabytes(normalized)}  x{wide / normalized:.1f}')
+    print('round trip: the normalized tables rebuild the wide dataframe')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,291 @@
+"""Local mock of the Riot API answering with rate limit headers.
+
+It serves the account-v1 and match-v5 (match, ids, timeline) endpoints used by riot_client from
+recorded fixtures (see record_fixtures.py) or synthetic payloads and enforces
+fixed-window application and method limits like the real API: every answer
+carries X-App-Rate-Limit(-Count) and X-Method-Rate-Limit(-Count), and going
+over a limit answers 429 with Retry-After and X-Rate-Limit-Type. Latency,
+latency jitter and random 'service' 429s can be injected to check how the
+client behaves on a bad day.
+
+    $ python benchmarks/mock_riot_server.py --port 8080 --app-limits 20:1,100:120 \
+        --latency 0.05 --jitter 0.05 --error-rate 0.02 --fixtures benchmarks/fixtures
+
+Point riot_client at it with `base_url = http://127.0.0.1:8080` in the
+[riot_api] section of config.ini, or by setting config.get_config().riot_base_url.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+from synthetic_matches import make_match_json, make_timeline_json, match_creation
+
+DEFAULT_METHOD_LIMITS = {
+    'account-v1.getByRiotId': '1000:60',
+    'match-v5.getMatchIdsByPUUID': '2000:10',
+    'match-v5.getMatch': '2000:10',
+    'match-v5.getTimeline': '2000:10',
+}
+
+ROUTES = [
+    (re.compile(r'^/riot/account/v1/accounts/by-riot-id/([^/]+)/([^/]+)$'), 'account-v1.getByRiotId'),
+    (re.compile(r'^/lol/match/v5/matches/by-puuid/([^/]+)/ids$'), 'match-v5.getMatchIdsByPUUID'),
+    (re.compile(r'^/lol/match/v5/matches/([A-Z0-9]+_\d+)$'), 'match-v5.getMatch'),
+    (re.compile(r'^/lol/match/v5/matches/([A-Z0-9]+_\d+)/timeline$'), 'match-v5.getTimeline'),
+]
+
+
+class FixtureSet:
+
+    """Recorded Riot API answers laid out by record_fixtures.py.
+
+    root/account/<gameName>#<tagLine>.json, root/ids/<puuid>.json (whole
+    history, newest first), root/matches/<matchId>.json.gz and
+    root/timelines/<matchId>.json.gz. Every lookup returns None when the
+    payload was not recorded so the server can fall back to synthetic data.
+
+    Args:
+        root (str): Fixtures directory.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def load(self, *parts):
+        path = os.path.join(self.root, *parts)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                data = f.read()
+            return json.loads(gzip.decompress(data) if path.endswith('.gz') else data)
+        return None
+
+    def account(self, game_name, tag_line):
+        return self.load('account', f'{game_name}#{tag_line}.json')
+
+    def match_ids(self, puuid):
+        return self.load('ids', f'{puuid}.json')
+
+    def match(self, match_id):
+        return self.load('matches', f'{match_id}.json.gz')
+
+    def timeline(self, match_id):
+        return self.load('timelines', f'{match_id}.json.gz')
+
+
+def synthetic_index(match_id):
+    return int(match_id.split('_')[1]) - 7000000000
+
+
+class FixedWindowLimit:
+
+    """Riot style counter: the window opens on the first request and resets after `seconds`."""
+
+    def __init__(self, limit, seconds):
+        self.limit = limit
+        self.seconds = seconds
+        self.window_start = None
+        self.count = 0
+
+    def hit(self, now):
+        if self.window_start is None or now - self.window_start >= self.seconds:
+            self.window_start = now
+            self.count = 0
+        self.count += 1
+        return self.count <= self.limit
+
+    def retry_after(self, now):
+        return max(1, math.ceil(self.window_start + self.seconds - now))
+
+
+def parse_limits(value):
+    return [FixedWindowLimit(*map(int, pair.split(':'))) for pair in value.split(',')]
+
+
+def header_limits(limits):
+    return ','.join(f'{limit.limit}:{limit.seconds}' for limit in limits)
+
+
+def header_counts(limits):
+    return ','.join(f'{limit.count}:{limit.seconds}' for limit in limits)
+
+
+def puuid_for(game_name, tag_line):
+    return hashlib.sha256(f'{game_name}#{tag_line}'.encode()).hexdigest()[:78]
+
+
+def match_ids_for(puuid, start, count, start_time=None, end_time=None, queue=None, n_history=300):
+    """Deterministic match history, newest first.
+
+    Players share a pool of match ids so teams have common games. The creation
+    time of a synthetic match grows with its number (see synthetic_matches).
+    """
+    seed = int(hashlib.sha256(puuid.encode()).hexdigest()[:8], 16)
+    indexes = sorted({(seed + i * 7) % 5000 for i in range(n_history)}, reverse=True)
+    if start_time is not None:
+        indexes = [i for i in indexes if match_creation(i) // 1000 >= start_time]
+    if end_time is not None:
+        indexes = [i for i in indexes if match_creation(i) // 1000 <= end_time]
+    if queue is not None and queue != 420:
+        indexes = []
+    return [f'EUW1_{7000000000 + i}' for i in indexes[start:start + count]]
+
+
+class MockRiotServer(ThreadingHTTPServer):
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    """Mock Riot API server.
+
+    Args:
+        address (tuple): (host, port) to listen on.
+        app_limits (str, optional): Application limits. Defaults to '20:1,100:120' (development key).
+        method_limits (dict, optional): Limits per method. Defaults to DEFAULT_METHOD_LIMITS.
+        latency (float, optional): Seconds added to every answer. Defaults to 0.
+        jitter (float, optional): Extra uniform random latency in seconds. Defaults to 0.
+        error_rate (float, optional): Share of requests answered by a 'service' 429. Defaults to 0.
+        fixtures (str, optional): Directory of recorded answers served before synthetic ones. Defaults to None.
+        seed (int, optional): Seed of the jitter and error injection. Defaults to 0.
+    """
+
+    def __init__(self, address, app_limits='20:1,100:120', method_limits=None, latency=0.0, jitter=0.0,
+                 error_rate=0.0, fixtures=None, seed=0):
+        super().__init__(address, MockRiotHandler)
+        self.app_limits = parse_limits(app_limits)
+        self.method_limits = dict((method, parse_limits(limits))
+                                  for method, limits in (method_limits or DEFAULT_METHOD_LIMITS).items())
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.fixtures = FixtureSet(fixtures) if fixtures else None
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, '429': 0, 'injected_429': 0}
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+
+class MockRiotHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, payload, headers):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json;charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        for pattern, method in ROUTES:
+            match = pattern.match(url.path)
+            if match:
+                break
+        else:
+            self.send_json(404, {'status': {'message': 'Data not found', 'status_code': 404}}, {})
+            return
+
+        with server.lock:
+            now = time.monotonic()
+            server.stats['requests'] += 1
+            method_limits = server.method_limits[method]
+            app_ok = all([limit.hit(now) for limit in server.app_limits])
+            method_ok = all([limit.hit(now) for limit in method_limits])
+            headers = {
+                'X-App-Rate-Limit': header_limits(server.app_limits),
+                'X-App-Rate-Limit-Count': header_counts(server.app_limits),
+                'X-Method-Rate-Limit': header_limits(method_limits),
+                'X-Method-Rate-Limit-Count': header_counts(method_limits),
+            }
+            if not (app_ok and method_ok):
+                server.stats['429'] += 1
+                exceeded = [limit for limit in (server.app_limits if not app_ok else method_limits)
+                            if limit.count > limit.limit]
+                headers['Retry-After'] = str(max(limit.retry_after(now) for limit in exceeded))
+                headers['X-Rate-Limit-Type'] = 'application' if not app_ok else 'method'
+            elif server.error_rate and server.rng.random() < server.error_rate:
+                # 429 from the underlying service: not counted in any of our limits
+                server.stats['429'] += 1
+                server.stats['injected_429'] += 1
+                headers['Retry-After'] = '1'
+                headers['X-Rate-Limit-Type'] = 'service'
+            delay = server.latency + (server.rng.uniform(0, server.jitter) if server.jitter else 0)
+
+        if delay:
+            time.sleep(delay)
+        if 'Retry-After' in headers:
+            self.send_json(429, {'status': {'message': 'Rate limit exceeded', 'status_code': 429}}, headers)
+        else:
+            self.send_json(200, self.payload(method, match, parse_qs(url.query)), headers)
+
+    def payload(self, method, match, query):
+        fixtures = self.server.fixtures
+        recorded = None
+        if method == 'account-v1.getByRiotId':
+            # the client percent-encodes the riot id ('Some Name' -> 'Some%20Name'), the fixtures are keyed on it decoded
+            game_name, tag_line = (unquote(group) for group in match.groups())
+            recorded = fixtures and fixtures.account(game_name, tag_line)
+            return recorded or {'puuid': puuid_for(game_name, tag_line), 'gameName': game_name, 'tagLine': tag_line}
+        if method == 'match-v5.getMatchIdsByPUUID':
+            start = int(query.get('start', ['0'])[0])
+            count = int(query.get('count', ['20'])[0])
+            recorded = fixtures and fixtures.match_ids(match.group(1))
+            if recorded is not None:
+                # time and queue filters are not replayed: the recorded history is served as is
+                return recorded[start:start + count]
+            optional = lambda name: int(query[name][0]) if name in query else None
+            return match_ids_for(match.group(1), start, count, optional('startTime'), optional('endTime'),
+                                 optional('queue'))
+        if method == 'match-v5.getTimeline':
+            recorded = fixtures and fixtures.timeline(match.group(1))
+            return recorded or make_timeline_json(synthetic_index(match.group(1)))
+        recorded = fixtures and fixtures.match(match.group(1))
+        return recorded or make_match_json(synthetic_index(match.group(1)))
+
+
+def start_mock_server(port=0, **kwargs):
+    """Starts the mock server in a background thread.
+
+    Returns:
+        MockRiotServer: Running server, call shutdown() to stop it.
+    """
+    server = MockRiotServer(('127.0.0.1', port), **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Local mock of the Riot API.')
+    arg_parser.add_argument('--port', type=int, default=8080)
+    arg_parser.add_argument('--app-limits', default='20:1,100:120')
+    arg_parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every answer')
+    arg_parser.add_argument('--jitter', type=float, default=0.0, help='extra random latency in seconds')
+    arg_parser.add_argument('--error-rate', type=float, default=0.0, help="share of requests answered by a 'service' 429")
+    arg_parser.add_argument('--fixtures', default=None, help='directory of recorded answers')
+    args = arg_parser.parse_args()
+    server = MockRiotServer(('127.0.0.1', args.port), app_limits=args.app_limits, latency=args.latency,
+                            jitter=args.jitter, error_rate=args.error_rate, fixtures=args.fixtures)
+    print(f'Mock Riot API listening on {server.base_url}')
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
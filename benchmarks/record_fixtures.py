@@ -0,0 +1,118 @@
+"""Records Riot API answers as fixtures for the mock server and the benchmarks.
+
+Resolves the given Riot ids, walks their match history and stores every
+account, match ids, match and (optionally) timeline payload under the layout
+read by mock_riot_server.FixtureSet. Needs a valid api_key in config.ini (or
+`base_url` pointing at another server).
+
+    $ python benchmarks/record_fixtures.py "Player#EUW" "Other#EUW" --max-matches 50 --timelines
+
+Fixtures hold real players' data: keep them out of the repository.
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from riot_client import api_get_puuid, api_request, iter_match_history_ids, riot_root_url
+
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def write_fixture(root, folder, name, payload):
+    os.makedirs(os.path.join(root, folder), exist_ok=True)
+    data = json.dumps(payload).encode()
+    if name.endswith('.gz'):
+        data = gzip.compress(data)
+    with open(os.path.join(root, folder, name), 'wb') as f:
+        f.write(data)
+
+
+def fetch_json(endpoint, region, method, session):
+    response = api_request(riot_root_url(region) + endpoint, region, method, session)
+    if response.status_code != 200:
+        print(f'{endpoint}: {response.status_code}')
+        return None
+    return response.json()
+
+
+def record(nicknames, root=DEFAULT_FIXTURES, region='europe', max_matches=50, timelines=False):
+    """Records the answers needed to replay the ingestion of the given players.
+
+    Args:
+        nicknames (list): Riot ids in the format 'gameName#tagLine'.
+        root (str, optional): Fixtures directory. Defaults to benchmarks/fixtures.
+        region (str, optional): Routing value. Defaults to 'europe'.
+        max_matches (int, optional): Matches recorded per player. Defaults to 50.
+        timelines (bool, optional): Also record the timelines. Defaults to False.
+
+    Returns:
+        dict: Number of payloads recorded per kind.
+    """
+    session = requests.Session()
+    recorded = {'account': 0, 'ids': 0, 'matches': 0, 'timelines': 0}
+    match_ids = set()
+    for nickname in nicknames:
+        game_name, tag_line = nickname.split('#')
+        puuid = api_get_puuid(gameName=game_name, tagLine=tag_line, region=region)
+        if puuid is None:
+            continue
+        write_fixture(root, 'account', f'{nickname}.json', {'puuid': puuid, 'gameName': game_name, 'tagLine': tag_line})
+        ids = list(iter_match_history_ids(puuid, region, max_matches=max_matches))
+        write_fixture(root, 'ids', f'{puuid}.json', ids)
+        recorded['account'] += 1
+        recorded['ids'] += 1
+        match_ids.update(ids)
+
+    for match_id in sorted(match_ids):
+        match_json = fetch_json(f'/lol/match/v5/matches/{match_id}', region, 'match-v5.getMatch', session)
+        if match_json is not None:
+            write_fixture(root, 'matches', f'{match_id}.json.gz', match_json)
+            recorded['matches'] += 1
+        if timelines:
+            timeline_json = fetch_json(f'/lol/match/v5/matches/{match_id}/timeline', region,
+                                       'match-v5.getTimeline', session)
+            if timeline_json is not None:
+                write_fixture(root, 'timelines', f'{match_id}.json.gz', timeline_json)
+                recorded['timelines'] += 1
+    return recorded
+
+
+def load_match_fixtures(root=DEFAULT_FIXTURES):
+    """Reads every recorded match json of a fixtures directory, [] when there is none."""
+    folder = os.path.join(root, 'matches')
+    if not os.path.isdir(folder):
+        return []
+    list_match_json = []
+    for name in sorted(os.listdir(folder)):
+        with gzip.open(os.path.join(folder, name)) as f:
+            list_match_json.append(json.load(f))
+    return list_match_json
+
+
+def recorded_puuids(root=DEFAULT_FIXTURES):
+    """puuids of the players whose history was recorded."""
+    folder = os.path.join(root, 'ids')
+    if not os.path.isdir(folder):
+        return []
+    return sorted(name[:-len('.json')] for name in os.listdir(folder))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('nicknames', nargs='+', help="Riot ids, 'gameName#tagLine'")
+    arg_parser.add_argument('--output', default=DEFAULT_FIXTURES)
+    arg_parser.add_argument('--region', default='europe')
+    arg_parser.add_argument('--max-matches', type=int, default=50)
+    arg_parser.add_argument('--timelines', action='store_true')
+    args = arg_parser.parse_args()
+    recorded = record(args.nicknames, args.output, args.region, args.max_matches, args.timelines)
+    print(f'Recorded in {args.output}: ' + ', '.join(f'{n} {kind}' for kind, n in recorded.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+"""SQLite stand-in of the supabase client for the DB write benchmarks.
+
+Implements the part of the postgrest query builder used by db_writer and
+normalized_store:
+
+    supabase.table(t).select(c).order(c, desc=True).limit(n).execute().data
+    supabase.table(t).select(c).in_(c, values).gte(c, v).range(start, end).execute().data
+    supabase.table(t).select(c).contains(c, values).execute().data
+    supabase.table(t).upsert(records, on_conflict='a,b').execute()
+
+Every execute() can sleep `latency` seconds to stand for the round trip to the
+hosted database, which is what dominates a real upsert. The json bytes sent
+and received are counted to compare payload sizes.
+"""
+import json
+import sqlite3
+import threading
+import time
+
+
+def sql_value(value):
+    """Stores the list / dict values (json and array columns in postgres) as json text."""
+    return json.dumps(value) if isinstance(value, (list, dict)) else value
+
+
+class Response:
+
+    def __init__(self, data):
+        self.data = data
+
+
+class SQLiteSupabase:
+
+    """Supabase-like client writing into a SQLite database.
+
+    Args:
+        path (str, optional): Database file. Defaults to ':memory:'.
+        latency (float, optional): Seconds slept by every request. Defaults to 0.
+    """
+
+    def __init__(self, path=':memory:', latency=0.0):
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.latency = latency
+        self.requests = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def table(self, name):
+        return Query(self, name)
+
+    def create_table(self, name, columns, on_conflict):
+        """Creates the table on the first upsert with the unique key postgres would have."""
+        quoted = ', '.join(f'"{c}"' for c in columns)
+        with self.lock:
+            self.connection.execute(f'CREATE TABLE IF NOT EXISTS "{name}" ({quoted}, UNIQUE ({on_conflict}))')
+
+    def count(self, name):
+        with self.lock:
+            return self.connection.execute(f'SELECT COUNT(*) FROM "{name}"').fetchone()[0]
+
+
+class Query:
+
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+        self.columns = '*'
+        self.order_by = []
+        self.n_limit = None
+        self.n_offset = 0
+        self.filters = []
+        self.params = []
+        self.records = None
+        self.on_conflict = None
+
+    def select(self, columns='*'):
+        self.columns = columns
+        return self
+
+    def order(self, column, desc=False):
+        # chained orders sort by the first column, then the next ones, like postgrest
+        self.order_by.append(f'"{column}" {"DESC" if desc else "ASC"}')
+        return self
+
+    def limit(self, n):
+        self.n_limit = n
+        return self
+
+    def range(self, start, end):
+        self.n_offset = start
+        self.n_limit = end - start + 1
+        return self
+
+    def where(self, condition, params):
+        self.filters.append(condition)
+        self.params.extend(params)
+        return self
+
+    def eq(self, column, value):
+        return self.where(f'"{column}" = ?', [value])
+
+    def gte(self, column, value):
+        return self.where(f'"{column}" >= ?', [value])
+
+    def in_(self, column, values):
+        values = list(values)
+        return self.where(f'"{column}" IN ({", ".join("?" * len(values))})', values)
+
+    def contains(self, column, values):
+        """Rows whose array column (json text here) holds every value, postgres' @>."""
+        for value in values:
+            self.where(f'EXISTS (SELECT 1 FROM json_each("{column}") WHERE json_each.value = ?)', [value])
+        return self
+
+    def upsert(self, records, on_conflict=''):
+        self.records = records
+        self.on_conflict = on_conflict
+        return self
+
+    def execute(self):
+        client = self.client
+        if client.latency:
+            time.sleep(client.latency)
+        client.requests += 1
+        if self.records is not None:
+            client.bytes_sent += len(json.dumps(self.records))
+            return self.execute_upsert()
+        columns = ', '.join(f'"{c.strip()}"' for c in self.columns.split(',')) if self.columns != '*' else '*'
+        query = f'SELECT {columns} FROM "{self.name}"'
+        if self.filters:
+            query += ' WHERE ' + ' AND '.join(self.filters)
+        if self.order_by:
+            query += ' ORDER BY ' + ', '.join(self.order_by)
+        if self.n_limit is not None:
+            query += f' LIMIT {int(self.n_limit)} OFFSET {int(self.n_offset)}'
+        with client.lock:
+            try:
+                cursor = client.connection.execute(query, self.params)
+            except sqlite3.OperationalError:
+                # table not created yet, like an empty table
+                return Response([])
+            names = [d[0] for d in cursor.description]
+            data = [dict(zip(names, row)) for row in cursor.fetchall()]
+        client.bytes_received += len(json.dumps(data))
+        return Response(data)
+
+    def execute_upsert(self):
+        if not self.records:
+            return Response([])
+        columns = list(self.records[0])
+        self.client.create_table(self.name, columns, self.on_conflict)
+        quoted = ', '.join(f'"{c}"' for c in columns)
+        updates = ', '.join(f'"{c}" = excluded."{c}"' for c in columns)
+        query = (f'INSERT INTO "{self.name}" ({quoted}) VALUES ({", ".join("?" * len(columns))}) '
+                 f'ON CONFLICT ({self.on_conflict}) DO UPDATE SET {updates}')
+        with self.client.lock, self.client.connection:
+            self.client.connection.executemany(query, [[sql_value(record.get(c)) for c in columns]
+                                                       for record in self.records])
+        return Response(self.records)
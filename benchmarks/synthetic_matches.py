@@ -0,0 +1,128 @@
+"""Synthetic match-v5 payloads for the benchmarks.
+
+The generated jsons carry every field read by match_parser.process_match_json_reporting
+so the parser does the same amount of work as on real API answers.
+"""
+import random
+
+POSITIONS = ['TOP', 'JUNGLE', 'MIDDLE', 'BOTTOM', 'UTILITY']
+CHAMPIONS = ['Aatrox', 'Ahri', 'Akali', 'Ashe', 'Braum', 'Caitlyn', 'Darius', 'Ezreal',
+             'Gnar', 'Gragas', 'Jayce', 'Jinx', 'KSante', 'LeeSin', 'Lulu', 'Nautilus',
+             'Orianna', 'Rakan', 'Renekton', 'Sejuani', 'Syndra', 'Vi', 'Xayah', 'Zeri']
+
+
+def make_participant(rng, puuid, team_id, position, champion):
+    """Builds one participant entry of info['participants']."""
+    stat = lambda high: rng.randint(0, high)
+    return {
+        'puuid': puuid,
+        'summonerName': 'player_' + puuid[:6],
+        'riotIdGameName': 'player_' + puuid[:6],
+        'riotIdTagline': 'EUW',
+        'teamId': team_id,
+        'win': team_id == 100,
+        'championName': champion,
+        'teamPosition': position,
+        'lane': position,
+        'kills': stat(15), 'deaths': stat(10), 'assists': stat(20),
+        'summoner1Id': 4, 'summoner2Id': 12,
+        'gameEndedInEarlySurrender': False, 'gameEndedInSurrender': False,
+        'firstBloodKill': False, 'firstBloodAssist': False,
+        'firstTowerKill': False, 'firstTowerAssist': False,
+        'dragonKills': stat(3),
+        'damageDealtToBuildings': stat(10000), 'damageDealtToObjectives': stat(30000),
+        'damageSelfMitigated': stat(40000), 'goldEarned': stat(18000),
+        'largestKillingSpree': stat(8), 'longestTimeSpentLiving': stat(1500),
+        'objectivesStolen': 0, 'totalMinionsKilled': stat(300),
+        'totalAllyJungleMinionsKilled': stat(120), 'totalEnemyJungleMinionsKilled': stat(20),
+        'totalDamageDealtToChampions': stat(40000), 'totalDamageShieldedOnTeammates': stat(5000),
+        'totalHealsOnTeammates': stat(5000), 'totalDamageTaken': stat(40000),
+        'totalTimeCCDealt': stat(600), 'totalTimeSpentDead': stat(300),
+        'turretKills': stat(3), 'turretsLost': stat(11),
+        'visionScore': stat(90), 'detectorWardsPlaced': stat(10),
+        'wardsKilled': stat(20), 'wardsPlaced': stat(40),
+        'item0': 3078, 'item1': 3071, 'item2': 3053, 'item3': 3111, 'item4': 0, 'item5': 0, 'item6': 3340,
+        'perks': {
+            'statPerks': {'defense': 5001, 'flex': 5008, 'offense': 5005},
+            'styles': [
+                {'style': 8000, 'selections': [{'perk': 8010}, {'perk': 9111}, {'perk': 9104}, {'perk': 8299}]},
+                {'style': 8400, 'selections': [{'perk': 8444}, {'perk': 8242}]},
+            ],
+        },
+    }
+
+
+def match_creation(index):
+    """gameCreation (epoch ms) of synthetic match number `index`."""
+    return 1736000000000 + index * 2400000
+
+
+def make_match_json(index, seed=0):
+    """Builds a match-v5 json with 10 participants.
+
+    Args:
+        index (int): Match number, used for the match id.
+        seed (int, optional): Random seed. Defaults to 0.
+
+    Returns:
+        dict: Match JSON.
+    """
+    rng = random.Random(seed * 1000003 + index)
+    champions = rng.sample(CHAMPIONS, 10)
+    puuids = ['%078x' % rng.getrandbits(312) for _ in range(10)]
+    participants = []
+    for i, puuid in enumerate(puuids):
+        team_id = 100 if i < 5 else 200
+        participants.append(make_participant(rng, puuid, team_id, POSITIONS[i % 5], champions[i]))
+    game_creation = match_creation(index)
+    return {
+        'metadata': {'matchId': f'EUW1_{7000000000 + index}', 'participants': puuids},
+        'info': {
+            'gameCreation': game_creation,
+            'gameStartTimestamp': game_creation + 30000,
+            'gameEndTimestamp': game_creation + 30000 + rng.randint(900000, 2400000),
+            'gameMode': 'CLASSIC',
+            'gameVersion': '15.1.646.5271',
+            'platformId': 'EUW1',
+            'queueId': 420,
+            'participants': participants,
+        },
+    }
+
+
+def make_match_jsons(n_matches, seed=0):
+    """Builds a list of n_matches synthetic match jsons."""
+    return [make_match_json(i, seed) for i in range(n_matches)]
+
+
+def make_timeline_json(index, seed=0):
+    """Builds a match-v5 timeline json consistent with make_match_json(index, seed)."""
+    match_json = make_match_json(index, seed)
+    info = match_json['info']
+    rng = random.Random(seed * 1000003 + index + 1)
+    n_frames = (info['gameEndTimestamp'] - info['gameStartTimestamp']) // 60000 + 1
+    totals = [[500, 0, 0, 0, 0] for _ in range(10)]
+    frames = []
+    for f in range(n_frames):
+        participant_frames = {}
+        for p in range(10):
+            total = totals[p]
+            total[0] += rng.randint(250, 450)
+            total[1] += rng.randint(300, 500)
+            total[2] += rng.randint(4, 9)
+            total[3] += rng.randint(0, 3)
+            total[4] += rng.randint(0, 600)
+            participant_frames[str(p + 1)] = {
+                'participantId': p + 1, 'totalGold': total[0], 'currentGold': rng.randint(0, 1500),
+                'xp': total[1], 'level': min(18, 1 + total[1] // 1000), 'minionsKilled': total[2],
+                'jungleMinionsKilled': total[3], 'damageStats': {'totalDamageDoneToChampions': total[4]},
+                'position': {'x': rng.randint(0, 15000), 'y': rng.randint(0, 15000)},
+            }
+        frames.append({'timestamp': f * 60000, 'participantFrames': participant_frames, 'events': []})
+    return {
+        'metadata': {'matchId': match_json['metadata']['matchId'],
+                     'participants': match_json['metadata']['participants']},
+        'info': {'frameInterval': 60000, 'frames': frames,
+                 'participants': [{'participantId': p + 1, 'puuid': puuid}
+                                  for p, puuid in enumerate(match_json['metadata']['participants'])]},
+    }
@@ -0,0 +1,55 @@
+### Imports
+from configparser import ConfigParser
+
+DEFAULT_VERSIONS_URL = 'https://ddragon.leagueoflegends.com/api/versions.json'
+
+
+class Config:
+
+    """Settings of config.ini, read once and passed to the code that needs them.
+
+    The Riot / supabase / Data Dragon values are attributes, the optional
+    sections of the pipeline are read with get / getint / getboolean like a ConfigParser.
+
+    Args:
+        path (str, optional): Configuration file. Defaults to 'config.ini'.
+    """
+
+    def __init__(self, path='config.ini'):
+        self.path = path
+        self.parser = ConfigParser()
+        self.parser.read(path)
+        self.riot_api_key = self.get('riot_api', 'api_key', fallback='')
+        # Optional override of the Riot host, e.g. http://127.0.0.1:8080 for the mock server
+        self.riot_base_url = self.get('riot_api', 'base_url', fallback='')
+        self.supabase_url = self.get('supabase', 'SUPABASE_URL', fallback='')
+        self.supabase_key = self.get('supabase', 'SUPABASE_KEY', fallback='')
+        # Data Dragon versions endpoint, its first entry is the current patch (see ddragon.py)
+        self.url_version = self.get('url', 'url_version', fallback=DEFAULT_VERSIONS_URL)
+
+    def get(self, section, option, fallback=None):
+        return self.parser.get(section, option, fallback=fallback)
+
+    def getint(self, section, option, fallback=None):
+        return self.parser.getint(section, option, fallback=fallback)
+
+    def getboolean(self, section, option, fallback=None):
+        return self.parser.getboolean(section, option, fallback=fallback)
+
+
+config = None
+
+
+def get_config():
+    """Returns the configuration of the process, config.ini is only read on the first call."""
+    global config
+    if config is None:
+        config = Config()
+    return config
+
+
+def set_config(new_config):
+    """Makes a Config the default of every call not given one explicitly."""
+    global config
+    config = new_config
+    return config
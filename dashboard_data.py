@@ -0,0 +1,137 @@
+### Imports
+import os
+import pandas as pd
+import streamlit as st
+from supabase import create_client
+from config import get_config
+from ddragon import DataDragon
+from analytics import rollup_metrics, split_by
+
+# Only what the pick history view reads
+GAME_COLUMNS = ['puuid', 'team_position', 'champion', 'win']
+
+
+@st.cache_resource
+def get_supabase():
+    """One supabase client per server process instead of one per rerun."""
+    config = get_config()
+    return create_client(config.supabase_url, config.supabase_key)
+
+
+def query_local_store(method, *args):
+    """Runs a query on the local copy of the games kept by update.py (see local_store.py).
+
+    The file is opened for this query only: a connection kept open would stop
+    update.py from writing a DuckDB store.
+
+    Returns:
+        DataFrame: Result of LocalStore.<method>, None when there is no local store or update.py holds it.
+    """
+    path = get_config().get('local_store', 'path', fallback='')
+    if not path or not os.path.exists(path):
+        return None
+    from local_store import open_local_store
+    try:
+        with open_local_store(path, read_only=True, timeout=2) as store:
+            return getattr(store, method)(*args)
+    except Exception as e:
+        print(f"Local store not available, reading supabase: {e}")
+        return None
+
+
+@st.cache_data(ttl=3600)
+def get_team_roster(team):
+    """Active players of a team.
+
+    Returns:
+        tuple: (list of puuids, list of nicknames).
+    """
+    r = get_supabase().table('players').select('player_nickname,main_puuid').eq('current_team', team).execute()
+    return [row['main_puuid'] for row in r.data], [row['player_nickname'] for row in r.data]
+
+
+@st.cache_data(ttl=600)
+def get_team_games(team, columns=tuple(GAME_COLUMNS)):
+    """Soloq games of a team's players, only the requested columns.
+
+    Returns:
+        DataFrame: One row per player game.
+    """
+    list_puuid, _ = get_team_roster(team)
+    if not list_puuid:
+        return pd.DataFrame(columns=list(columns))
+    games = query_local_store('player_games', list_puuid, list(columns))
+    if games is not None:
+        return games
+    if get_config().get('storage', 'layout', fallback='wide') == 'normalized':
+        from normalized_store import load_player_games
+        return load_player_games(get_supabase(), list_puuid, list(columns))
+    r = get_supabase().table('games_player').select(','.join(columns)).in_('puuid', list_puuid).execute()
+    return pd.DataFrame(r.data, columns=list(columns))
+
+
+@st.cache_data(ttl=600)
+def get_team_champion_stats(team):
+    """Games and wins per player / role / champion for a team.
+
+    Aggregates the local store when there is one, else reads the
+    player_champion_stats summary maintained by update.py once it has been
+    rebuilt from the whole game table, and falls back to aggregating the games
+    otherwise: a summary enabled on an existing database misses the older games.
+
+    Returns:
+        DataFrame: puuid, team_position, champion, games, wins.
+    """
+    list_puuid, _ = get_team_roster(team)
+    if not list_puuid:
+        return pd.DataFrame(columns=['puuid', 'team_position', 'champion', 'games', 'wins'])
+    stats = query_local_store('champion_stats', list_puuid)
+    if stats is not None:
+        return stats[['puuid', 'team_position', 'champion', 'games', 'wins']]
+    from db_writer import champion_summary, champion_summary_built
+    try:
+        if champion_summary_built(get_supabase(), 'player_champion_stats'):
+            r = (get_supabase().table('player_champion_stats').select('puuid,team_position,champion,games,wins')
+                 .in_('puuid', list_puuid).execute())
+            return pd.DataFrame(r.data, columns=['puuid', 'team_position', 'champion', 'games', 'wins'])
+    except Exception as e:
+        print(f"Champion summary not available, aggregating the games: {e}")
+    return champion_summary(get_team_games(team))
+
+
+def team_win_rates(stats):
+    """W/R and games per champion for every player and role of a team, in one grouped pass.
+
+    Returns:
+        dict: (puuid, role) -> DataFrame indexed by champion with 'W/R' and 'games', most played first.
+    """
+    metrics = rollup_metrics(stats).rename(columns={'win_rate': 'W/R'})
+    return {key: table.set_index('champion')[['W/R', 'games']] for key, table in split_by(metrics).items()}
+
+
+def player_win_rates(win_rates_by_player, puuid, role):
+    """Table of one player in one role, empty if they never played it."""
+    return win_rates_by_player.get((puuid, role), pd.DataFrame(columns=['W/R', 'games']).rename_axis('champion'))
+
+
+@st.cache_resource
+def get_data_dragon():
+    """Data Dragon assets of the current patch, cached on disk (see ddragon.py)."""
+    return DataDragon(versions_url=get_config().url_version)
+
+
+@st.cache_data(ttl=24 * 3600, show_spinner=False)
+def champion_icon(champion):
+    """Champion icon inlined as a data uri, no request from the browser nor to ddragon once cached."""
+    return get_data_dragon().icon_data_uri('champion', champion)
+
+
+@st.cache_data(ttl=24 * 3600)
+def get_static_names():
+    """Id -> name maps of the current patch.
+
+    Returns:
+        dict: 'champion', 'item' and 'perk' maps.
+    """
+    dragon = get_data_dragon()
+    return {'champion': dragon.champion_names(), 'item': dragon.item_names(), 'perk': dragon.perk_names()}
@@ -0,0 +1,266 @@
+### Imports
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from metrics import get_metrics
+
+TIMESTAMP_COLUMNS = ['game_creation', 'game_start_timestamp', 'game_end_timestamp']
+
+
+def timestamps_to_iso(series):
+    """Vectorized epoch ms / datetime -> 'YYYY-MM-DDTHH:MM:SS.ffffffZ' conversion of a whole column."""
+    if pd.api.types.is_numeric_dtype(series):
+        series = pd.to_datetime(series, unit='ms')
+    else:
+        series = pd.to_datetime(series)
+    return series.dt.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+def df_to_records(df):
+    """Converts a parsed batch to the list of json rows sent to supabase, in one pass.
+
+    Args:
+        df (DataFrame): Output of api_get_match_history_puuid.
+
+    Returns:
+        list: One dict per row, NaN as None.
+    """
+    df = df.copy()
+    for column in TIMESTAMP_COLUMNS:
+        if column in df.columns:
+            df[column] = timestamps_to_iso(df[column])
+    return json.loads(df.to_json(orient='records'))
+
+
+def upsert_chunk(supabase, table, chunk, on_conflict):
+    t1 = time.perf_counter()
+    supabase.table(table).upsert(chunk, on_conflict=on_conflict).execute()
+    get_metrics().observe('db_request_seconds', time.perf_counter() - t1, table=table)
+
+
+def from_df_to_db(supabase, df: pd.DataFrame, table='game_player', batch_size=500, max_workers=4,
+                  retries=3, on_conflict='match_id,puuid', numbered=True):
+    """Bulk upserts a parsed batch into a supabase table.
+
+    Rows are numbered after the latest 'index' in the db, converted to json once
+    and sent as chunked upserts keyed on (match_id, puuid) by a pool of threads.
+    Only the chunks that failed are retried. The table needs a unique constraint
+    on the on_conflict columns. Tables without an 'index' column (see
+    normalized_store.py) are written with numbered=False.
+
+    Args:
+        supabase (Client): Supabase client.
+        df (DataFrame): Output of api_get_match_history_puuid.
+        table (str, optional): Destination table. Defaults to 'game_player'.
+        batch_size (int, optional): Rows per upsert request. Defaults to 500.
+        max_workers (int, optional): Upsert requests in flight. Defaults to 4.
+        retries (int, optional): Rounds of retries for the failed chunks. Defaults to 3.
+        on_conflict (str, optional): Upsert key. Defaults to 'match_id,puuid'.
+        numbered (bool, optional): Add the 'index' column. Defaults to True.
+
+    Returns:
+        dict: {'rows': rows written, 'failed_rows': rows still failing after the retries,
+            'failed_match_ids': matches with at least one row not written}.
+    """
+    if df.empty:
+        return {'rows': 0, 'failed_rows': 0, 'failed_match_ids': set()}
+    with get_metrics().stage('db_write'):
+        result = bulk_upsert(supabase, df, table, batch_size, max_workers, retries, on_conflict, numbered)
+    get_metrics().inc('rows_total', result['rows'], stage='db_write')
+    return result
+
+
+def bulk_upsert(supabase, df, table, batch_size, max_workers, retries, on_conflict, numbered=True):
+    metrics = get_metrics()
+    df = df.reset_index(drop=True)
+    if numbered:
+        try:
+            starting_index = supabase.table(table).select('index').order("index", desc=True).limit(1).execute().data[0]['index'] + 1 #get the latest index in db
+        except IndexError as e:
+            starting_index = 0
+        df.insert(0, 'index', range(starting_index, starting_index + len(df)))
+
+    records = df_to_records(df)
+    pending = [records[i:i + batch_size] for i in range(0, len(records), batch_size)]
+
+    for attempt in range(retries + 1):
+        if attempt:
+            print(f"Retrying {len(pending)} failed chunks (attempt {attempt}/{retries})...")
+            time.sleep(2 ** attempt)
+        failed = []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [(chunk, executor.submit(upsert_chunk, supabase, table, chunk, on_conflict)) for chunk in pending]
+            for chunk, future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"Failed to upsert {len(chunk)} rows. Reason: {str(e)}")
+                    metrics.inc('db_chunks_failed_total', table=table)
+                    failed.append(chunk)
+        pending = failed
+        if not pending:
+            break
+
+    failed_rows = sum(len(chunk) for chunk in pending)
+    print(f"{len(records) - failed_rows} rows written to {table}, {failed_rows} failed")
+    failed_match_ids = {record['match_id'] for chunk in pending for record in chunk if 'match_id' in record}
+    return {'rows': len(records) - failed_rows, 'failed_rows': failed_rows, 'failed_match_ids': failed_match_ids}
+
+
+def written_new_games(df, stored_match_ids, failed_match_ids):
+    """Rows of the matches a write added for the first time, the ones the incremental aggregates may count.
+
+    Args:
+        df (DataFrame): Batch that was written.
+        stored_match_ids (set): Matches already complete in the store before the write (batch delivered again).
+        failed_match_ids (set): Matches with a row not written, they are fetched again on the next run.
+
+    Returns:
+        DataFrame: Rows of the other matches.
+    """
+    if df.empty:
+        return df
+    return df[~df['match_id'].isin(set(stored_match_ids) | set(failed_match_ids))]
+
+
+SUMMARY_KEYS = ['puuid', 'team_position', 'champion']
+# Summary tables rebuilt from the whole game table at least once (see rebuild_champion_summary)
+SUMMARY_BUILDS_TABLE = 'summary_builds'
+
+
+def champion_summary(df):
+    """Games and wins per player / role / champion of a parsed batch.
+
+    Args:
+        df (DataFrame): Parsed matches.
+
+    Returns:
+        DataFrame: puuid, team_position, champion, games, wins.
+    """
+    from analytics import compute_rollup
+    return compute_rollup(df, SUMMARY_KEYS)[SUMMARY_KEYS + ['games', 'wins']]
+
+
+def update_champion_summary(supabase, df, table='player_champion_stats', batch_size=500):
+    """Merges a batch of new matches into the materialized champion summary read by the dashboard.
+
+    The counts are added to the stored rows, so the batch must only hold
+    matches counted for the first time: update.py passes the matches that were
+    not complete in the store before the write and whose rows were all written
+    (see written_new_games). The result is upserted on
+    (puuid, team_position, champion). The summary only covers the games stored
+    before it was enabled once rebuild_champion_summary has run.
+
+    Args:
+        supabase (Client): Supabase client.
+        df (DataFrame): Newly ingested matches.
+        table (str, optional): Summary table. Defaults to 'player_champion_stats'.
+        batch_size (int, optional): Rows per request. Defaults to 500.
+
+    Returns:
+        int: Number of summary rows upserted.
+    """
+    if df.empty:
+        return 0
+    summary = champion_summary(df)
+
+    list_puuid = summary['puuid'].unique().tolist()
+    stored = []
+    for i in range(0, len(list_puuid), 50):
+        r = (supabase.table(table).select(','.join(SUMMARY_KEYS + ['games', 'wins']))
+             .in_('puuid', list_puuid[i:i + 50]).execute())
+        stored.extend(r.data)
+    if stored:
+        summary = pd.concat([summary, pd.DataFrame(stored)]).groupby(SUMMARY_KEYS, as_index=False)[['games', 'wins']].sum()
+
+    records = json.loads(summary.to_json(orient='records'))
+    for i in range(0, len(records), batch_size):
+        supabase.table(table).upsert(records[i:i + batch_size], on_conflict=','.join(SUMMARY_KEYS)).execute()
+    print(f"{len(records)} rows of {table} updated")
+    return len(records)
+
+
+def champion_summary_built(supabase, table='player_champion_stats'):
+    """True once rebuild_champion_summary filled the summary from the whole game table."""
+    r = supabase.table(SUMMARY_BUILDS_TABLE).select('name').eq('name', table).execute()
+    return bool(r.data)
+
+
+def read_summary_games(supabase, dictionary=None, source='game_player'):
+    """match_id, puuid, team_position, champion, win of every stored game, paged.
+
+    Args:
+        supabase (Client): Supabase client.
+        dictionary (IdDictionary, optional): Reads the normalized match_participant table instead of source.
+        source (str, optional): Wide game table. Defaults to 'game_player'.
+
+    Returns:
+        DataFrame: One row per player game.
+    """
+    from normalized_store import PARTICIPANT_TABLE, denormalize, fetch_all
+    if dictionary is None:
+        rows = fetch_all(lambda: supabase.table(source).select('match_id,puuid,team_position,champion,win')
+                         .order('match_id').order('puuid'))
+        return pd.DataFrame(rows, columns=['match_id', 'puuid', 'team_position', 'champion', 'win'])
+    rows = fetch_all(lambda: supabase.table(PARTICIPANT_TABLE).select('match_id,puuid_id,team_position,champion_id,win')
+                     .order('match_id').order('puuid_id'))
+    participants = pd.DataFrame(rows, columns=['match_id', 'puuid_id', 'team_position', 'champion_id', 'win'])
+    return denormalize(pd.DataFrame(columns=['match_id']), participants, dictionary)
+
+
+def rebuild_champion_summary(supabase, dictionary=None, source='game_player', table='player_champion_stats',
+                             batch_size=500):
+    """Recomputes the champion summary from every stored game, then marks it built.
+
+    Run it once when the summary is enabled on an existing database, with no
+    update.py running: the stored counts are replaced, not added to. Until it
+    has run the dashboard aggregates the games instead of reading the summary.
+
+    Args:
+        supabase (Client): Supabase client.
+        dictionary (IdDictionary, optional): Normalized layout, decodes match_participant. Defaults to None.
+        source (str, optional): Wide game table. Defaults to 'game_player'.
+        table (str, optional): Summary table. Defaults to 'player_champion_stats'.
+        batch_size (int, optional): Rows per request. Defaults to 500.
+
+    Returns:
+        int: Number of summary rows written.
+    """
+    games = read_summary_games(supabase, dictionary, source)
+    # the insert-only writer may have stored a game twice (see migrations/002)
+    games = games.drop_duplicates(['match_id', 'puuid'])
+    records = json.loads(champion_summary(games).to_json(orient='records')) if not games.empty else []
+    for i in range(0, len(records), batch_size):
+        supabase.table(table).upsert(records[i:i + batch_size], on_conflict=','.join(SUMMARY_KEYS)).execute()
+    supabase.table(SUMMARY_BUILDS_TABLE).upsert([{'name': table, 'built_at': pd.Timestamp.now('UTC').isoformat()}],
+                                                on_conflict='name').execute()
+    print(f"{table} rebuilt from {len(games)} games: {len(records)} rows")
+    return len(records)
+
+
+def main():
+    """Rebuilds the champion summary (python db_writer.py --rebuild-champion-summary)."""
+    import argparse
+    from supabase import create_client
+    from config import get_config
+    arg_parser = argparse.ArgumentParser(description='Maintenance of the supabase tables written by update.py.')
+    arg_parser.add_argument('--rebuild-champion-summary', action='store_true',
+                            help='recompute player_champion_stats from every stored game')
+    args = arg_parser.parse_args()
+    if not args.rebuild_champion_summary:
+        arg_parser.print_help()
+        return
+
+    config = get_config()
+    supabase = create_client(config.supabase_url, config.supabase_key)
+    dictionary = None
+    if config.get('storage', 'layout', fallback='wide') == 'normalized':
+        from normalized_store import IdDictionary, sync_dictionary
+        dictionary = IdDictionary(config.get('storage', 'dictionary_path', fallback='id_dictionary.json'))
+        sync_dictionary(supabase, dictionary)
+    rebuild_champion_summary(supabase, dictionary)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+### Imports
+import argparse
+import base64
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+DDRAGON_URL = 'https://ddragon.leagueoflegends.com'
+# Patch used when the versions endpoint was never reached
+DEFAULT_VERSION = '15.1.1'
+# Stat shards are not listed in runesReforged.json
+STAT_SHARDS = {
+    5001: 'Health Scaling', 5005: 'Attack Speed', 5007: 'Ability Haste', 5008: 'Adaptive Force',
+    5010: 'Move Speed', 5011: 'Health', 5013: 'Tenacity and Slow Resist',
+}
+
+
+class DataDragon:
+
+    """Local cache of the Data Dragon static data and icons.
+
+    The current patch is resolved from the versions endpoint at most once per
+    `version_ttl`, then every json and icon is downloaded once into
+    <root>/<version>/ and served from disk. When ddragon is slow or unreachable
+    the last resolved patch and whatever is on disk keep being used.
+
+    Args:
+        root (str, optional): Cache directory. Defaults to 'ddragon'.
+        versions_url (str, optional): Versions endpoint, the [url] url_version of config.ini.
+        language (str, optional): Locale of the names. Defaults to 'en_US'.
+        base_url (str, optional): Data Dragon host. Defaults to DDRAGON_URL.
+        version_ttl (int, optional): Seconds before the patch is resolved again. Defaults to 1 day.
+        timeout (float, optional): Seconds before a download is given up. Defaults to 5.
+        offline_cooldown (float, optional): Seconds without any download after ddragon could not be
+            reached. Defaults to 300.
+    """
+
+    def __init__(self, root='ddragon', versions_url=None, language='en_US', base_url=DDRAGON_URL,
+                 version_ttl=24 * 3600, timeout=5, offline_cooldown=300):
+        self.root = root
+        self.base_url = base_url.rstrip('/')
+        self.versions_url = versions_url or f'{self.base_url}/api/versions.json'
+        self.language = language
+        self.version_ttl = version_ttl
+        self.timeout = timeout
+        self.offline_cooldown = offline_cooldown
+        self.offline_until = 0
+        self.session = requests.Session()
+        self._version = None
+        self._data = {}
+        self._unreachable = set()
+
+    def _download(self, url):
+        if url in self._unreachable or time.monotonic() < self.offline_until:
+            return None
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+        except requests.RequestException as e:
+            # ddragon slow or offline: serve what is on disk instead of waiting on every asset
+            print(f'Data Dragon unreachable, offline for {self.offline_cooldown}s: {e}')
+            self.offline_until = time.monotonic() + self.offline_cooldown
+            return None
+        if response.status_code != 200:
+            print(f'Data Dragon {url}: {response.status_code}')
+            self._unreachable.add(url)
+            return None
+        return response.content
+
+    def _write(self, path, data):
+        """Writes a file atomically so a crash never leaves a truncated asset."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _cached_file(self, path, url):
+        """Returns the bytes of a cached file, downloading it on a miss (None if unreachable)."""
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                return f.read()
+        data = self._download(url)
+        if data is not None:
+            self._write(path, data)
+        return data
+
+    def version(self):
+        """Current patch, e.g. '15.1.1'."""
+        if self._version is not None:
+            return self._version
+        path = os.path.join(self.root, 'version.json')
+        cached = None
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                cached = json.load(f)
+            if time.time() - cached['resolved_at'] < self.version_ttl:
+                self._version = cached['version']
+                return self._version
+        data = self._download(self.versions_url)
+        if data is not None:
+            self._version = json.loads(data)[0]
+            self._write(path, json.dumps({'version': self._version, 'resolved_at': int(time.time())}).encode())
+        else:
+            self._version = cached['version'] if cached else DEFAULT_VERSION
+        return self._version
+
+    def data(self, kind):
+        """Static data json of the current patch: 'champion', 'item' or 'runesReforged'."""
+        if kind not in self._data:
+            version = self.version()
+            data = self._cached_file(os.path.join(self.root, version, 'data', f'{kind}.json'),
+                                     f'{self.base_url}/cdn/{version}/data/{self.language}/{kind}.json')
+            self._data[kind] = json.loads(data) if data is not None else None
+        return self._data[kind]
+
+    def champion_names(self):
+        """Champion id as in the match data ('KSante') -> display name ("K'Sante")."""
+        data = self.data('champion')
+        return {champion_id: champion['name'] for champion_id, champion in (data or {}).get('data', {}).items()}
+
+    def item_names(self):
+        """Item id -> name."""
+        data = self.data('item')
+        return {int(item_id): item['name'] for item_id, item in (data or {}).get('data', {}).items()}
+
+    def perk_names(self):
+        """Rune, rune style and stat shard id -> name."""
+        names = dict(STAT_SHARDS)
+        for style in self.data('runesReforged') or []:
+            names[style['id']] = style['name']
+            for slot in style['slots']:
+                for rune in slot['runes']:
+                    names[rune['id']] = rune['name']
+        return names
+
+    def _perk_icons(self):
+        icons = {}
+        for style in self.data('runesReforged') or []:
+            icons[style['id']] = style['icon']
+            for slot in style['slots']:
+                for rune in slot['runes']:
+                    icons[rune['id']] = rune['icon']
+        return icons
+
+    def icon_url(self, kind, key):
+        """Remote url of a 'champion', 'item' or 'perk' icon."""
+        version = self.version()
+        if kind == 'champion':
+            return f'{self.base_url}/cdn/{version}/img/champion/{key}.png'
+        if kind == 'item':
+            return f'{self.base_url}/cdn/{version}/img/item/{key}.png'
+        icon = self._perk_icons().get(int(key))
+        return f'{self.base_url}/cdn/img/{icon}' if icon else None
+
+    def icon_path(self, kind, key):
+        """Local path of an icon, downloaded on the first use. None if it could not be fetched."""
+        path = os.path.join(self.root, self.version(), 'img', kind, f'{key}.png')
+        url = self.icon_url(kind, key)
+        if url is None or self._cached_file(path, url) is None:
+            return None
+        return path
+
+    def icon_data_uri(self, kind, key):
+        """Icon inlined as a base64 data uri for html tables, the remote url when it is not cached."""
+        path = self.icon_path(kind, key)
+        if path is None:
+            return self.icon_url(kind, key)
+        with open(path, 'rb') as f:
+            return 'data:image/png;base64,' + base64.b64encode(f.read()).decode()
+
+    def prefetch(self, kinds=('champion', 'item', 'perk'), max_workers=16):
+        """Downloads every icon of the current patch not cached yet.
+
+        Returns:
+            int: Number of icons available on disk.
+        """
+        keys = {
+            'champion': lambda: list(self.champion_names()),
+            'item': lambda: list(self.item_names()),
+            'perk': lambda: list(self._perk_icons()),
+        }
+        tasks = [(kind, key) for kind in kinds for key in keys[kind]()]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            paths = list(executor.map(lambda task: self.icon_path(*task), tasks))
+        return sum(path is not None for path in paths)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Downloads the Data Dragon data and icons of the current patch.')
+    arg_parser.add_argument('--root', default='ddragon', help='cache directory')
+    arg_parser.add_argument('--versions-url', default=None, help='defaults to [url] url_version of config.ini')
+    args = arg_parser.parse_args()
+    versions_url = args.versions_url
+    if versions_url is None:
+        from config import get_config
+        versions_url = get_config().url_version
+    dragon = DataDragon(args.root, versions_url)
+    print(f'Patch {dragon.version()}: {dragon.prefetch()} icons in {args.root}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,290 @@
+### Imports
+import json
+import os
+import sqlite3
+import threading
+import time
+import pandas as pd
+import pyarrow as pa
+from parquet_store import MATCH_SCHEMA, table_from_dataframe
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+TABLE = 'player_games'
+INDEXED_COLUMNS = ['puuid', 'champion', 'team_position', 'game_creation']
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+# Raised when another process holds the file: duckdb locks it for a single writer or several readers
+LOCK_ERRORS = (sqlite3.OperationalError,) + ((duckdb.IOException,) if duckdb is not None else ())
+
+
+def sql_type(field, engine):
+    """Column type of a MATCH_SCHEMA field, the participants list is json text in SQLite."""
+    if pa.types.is_list(field.type):
+        return 'VARCHAR[]' if engine == 'duckdb' else 'TEXT'
+    if pa.types.is_boolean(field.type):
+        return 'BOOLEAN'
+    if pa.types.is_integer(field.type):
+        return 'INTEGER'
+    if pa.types.is_floating(field.type):
+        return 'DOUBLE'
+    if pa.types.is_timestamp(field.type):
+        return 'TIMESTAMP'
+    return 'VARCHAR'
+
+
+def detect_engine(path):
+    """Engine of an existing database file from its header, None for a new file."""
+    if path == ':memory:' or not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    with open(path, 'rb') as f:
+        header = f.read(16)
+    return 'sqlite' if header.startswith(b'SQLite format 3') else 'duckdb'
+
+
+class LocalStore:
+
+    """Local analytical copy of the parsed matches, queried without any network round trip.
+
+    One player_games table in the MATCH_COLUMNS layout, indexed on puuid,
+    champion, team_position and game_creation. DuckDB (columnar) is used when
+    installed, the standard library SQLite otherwise. update.py ingests every
+    batch it writes to supabase, the dashboard and the notebooks read it with
+    player_games / champion_stats / query. A DuckDB file is either open for
+    writing by one process or for reading by several, so both sides open it
+    with open_local_store for one batch / query and close it right after.
+
+    Args:
+        path (str, optional): Database file. Defaults to 'local_store.db'.
+        engine (str, optional): 'duckdb' or 'sqlite'. Defaults to the engine of the file, duckdb if available.
+        read_only (bool, optional): Open an existing file for reading only. Defaults to False.
+    """
+
+    def __init__(self, path='local_store.db', engine=None, read_only=False):
+        self.path = path
+        self.engine = engine or detect_engine(path) or ('duckdb' if duckdb is not None else 'sqlite')
+        if self.engine == 'duckdb' and duckdb is None:
+            raise ImportError('duckdb is required to open a duckdb local store')
+        # Shared by the threads of update.py, serialized by the lock
+        self.lock = threading.Lock()
+        if self.engine == 'duckdb':
+            self.connection = duckdb.connect(path, read_only=read_only)
+        else:
+            uri = f'file:{path}?mode=ro' if read_only else path
+            self.connection = sqlite3.connect(uri, uri=read_only, check_same_thread=False)
+        if not read_only:
+            self.create_table()
+
+    def create_table(self):
+        columns = ', '.join(f'"{field.name}" {sql_type(field, self.engine)}' for field in MATCH_SCHEMA)
+        with self.lock:
+            self.connection.execute(f'CREATE TABLE IF NOT EXISTS {TABLE} ({columns})')
+            for column in INDEXED_COLUMNS:
+                self.connection.execute(f'CREATE INDEX IF NOT EXISTS idx_{TABLE}_{column} ON {TABLE} ("{column}")')
+            if self.engine == 'sqlite':
+                self.connection.execute(f'CREATE INDEX IF NOT EXISTS idx_{TABLE}_match_id ON {TABLE} (match_id)')
+                self.connection.commit()
+
+    def ingest(self, df):
+        """Adds a parsed batch, the matches already stored are replaced.
+
+        Args:
+            df (DataFrame): Output of api_get_match_history_puuid.
+
+        Returns:
+            int: Number of rows written.
+        """
+        if df.empty:
+            return 0
+        columns = [field.name for field in MATCH_SCHEMA]
+        quoted = ', '.join(f'"{c}"' for c in columns)
+        match_ids = df['match_id'].unique().tolist()
+        with self.lock:
+            if self.engine == 'duckdb':
+                # columnar insert of the typed arrow table, no row-by-row conversion
+                self.connection.register('batch', table_from_dataframe(df))
+                self.connection.execute('BEGIN TRANSACTION')
+                self.connection.execute(f'DELETE FROM {TABLE} WHERE match_id IN (SELECT DISTINCT match_id FROM batch)')
+                self.connection.execute(f'INSERT INTO {TABLE} ({quoted}) SELECT {quoted} FROM batch')
+                self.connection.execute('COMMIT')
+                self.connection.unregister('batch')
+            else:
+                rows = sqlite_rows(df, columns)
+                with self.connection:
+                    for i in range(0, len(match_ids), 500):
+                        chunk = match_ids[i:i + 500]
+                        self.connection.execute(f'DELETE FROM {TABLE} WHERE match_id IN ({", ".join("?" * len(chunk))})',
+                                                chunk)
+                    self.connection.executemany(f'INSERT INTO {TABLE} ({quoted}) VALUES ({", ".join("?" * len(columns))})',
+                                                rows)
+        return len(df)
+
+    def query(self, sql, params=None):
+        """Runs a SQL query on the store.
+
+        Args:
+            sql (str): Query, with ? placeholders. The table is player_games.
+            params (list, optional): Values of the placeholders.
+
+        Returns:
+            DataFrame: Result, timestamps / booleans / participants restored for SQLite.
+        """
+        with self.lock:
+            if self.engine == 'duckdb':
+                return self.connection.execute(sql, params or []).df()
+            df = pd.read_sql_query(sql, self.connection, params=params or [])
+        return restore_types(df)
+
+    def timestamp_param(self, value):
+        value = pd.Timestamp(value)
+        return value.to_pydatetime() if self.engine == 'duckdb' else value.strftime(TIMESTAMP_FORMAT)
+
+    def where(self, list_puuid=None, champion=None, team_position=None, since=None, until=None, queue_id=None):
+        """WHERE clause and parameters of the filters of player_games / champion_stats."""
+        conditions, params = [], []
+        for column, values in [('puuid', list_puuid), ('champion', champion), ('team_position', team_position),
+                               ('queue_id', queue_id)]:
+            if values is None:
+                continue
+            values = [values] if isinstance(values, (str, int)) else list(values)
+            conditions.append(f'"{column}" IN ({", ".join("?" * len(values))})' if values else 'FALSE')
+            params.extend(values)
+        if since is not None:
+            conditions.append('game_creation >= ?')
+            params.append(self.timestamp_param(since))
+        if until is not None:
+            conditions.append('game_creation < ?')
+            params.append(self.timestamp_param(until))
+        return (' WHERE ' + ' AND '.join(conditions) if conditions else ''), params
+
+    def player_games(self, list_puuid=None, columns=None, champion=None, team_position=None, since=None,
+                     until=None, queue_id=None):
+        """Stored games, filtered on the indexed columns.
+
+        Args:
+            list_puuid (list, optional): Players' puuids. Defaults to every player.
+            columns (list, optional): Columns to return. Defaults to all of them.
+            champion (str | list, optional): Champion name(s).
+            team_position (str | list, optional): Role(s), e.g. 'MIDDLE'.
+            since (str | datetime, optional): First game_creation included.
+            until (str | datetime, optional): First game_creation excluded.
+            queue_id (int | list, optional): Queue(s), e.g. 420 for soloq.
+
+        Returns:
+            DataFrame: One row per player game, most recent first.
+        """
+        where, params = self.where(list_puuid, champion, team_position, since, until, queue_id)
+        selected = ', '.join(f'"{c}"' for c in columns) if columns else '*'
+        return self.query(f'SELECT {selected} FROM {TABLE}{where} ORDER BY game_creation DESC', params)
+
+    def champion_stats(self, list_puuid=None, by=('puuid', 'team_position', 'champion'), since=None, until=None,
+                       queue_id=None):
+        """Games, wins and averages per group, aggregated in the database.
+
+        Args:
+            list_puuid (list, optional): Players' puuids. Defaults to every player.
+            by (tuple, optional): Grouping columns. Defaults to ('puuid', 'team_position', 'champion').
+            since (str | datetime, optional): First game_creation included.
+            until (str | datetime, optional): First game_creation excluded.
+            queue_id (int | list, optional): Queue(s).
+
+        Returns:
+            DataFrame: by columns, games, wins, kills, deaths, assists (means), most played first.
+        """
+        where, params = self.where(list_puuid, since=since, until=until, queue_id=queue_id)
+        keys = ', '.join(f'"{c}"' for c in by)
+        sql = (f'SELECT {keys}, COUNT(*) AS games, SUM(CASE WHEN win THEN 1 ELSE 0 END) AS wins, '
+               f'AVG(kills) AS kills, AVG(deaths) AS deaths, AVG(assists) AS assists '
+               f'FROM {TABLE}{where} GROUP BY {keys} ORDER BY games DESC')
+        return self.query(sql, params)
+
+    def count(self):
+        return int(self.query(f'SELECT COUNT(*) AS n FROM {TABLE}')['n'].iloc[0])
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def open_local_store(path, engine=None, read_only=False, timeout=30.0):
+    """Opens a LocalStore, waiting while another process holds the file.
+
+    Args:
+        path (str): Database file.
+        engine (str, optional): 'duckdb' or 'sqlite'. Defaults to the engine of the file.
+        read_only (bool, optional): Open for reading only. Defaults to False.
+        timeout (float, optional): Seconds to wait for the lock. Defaults to 30.
+
+    Returns:
+        LocalStore: The open store, to close (or use as a context manager).
+
+    Raises:
+        duckdb.IOException | sqlite3.OperationalError: The file was still locked after timeout seconds.
+    """
+    deadline = time.monotonic() + timeout
+    delay = 0.05
+    while True:
+        try:
+            return LocalStore(path, engine, read_only)
+        except LOCK_ERRORS:
+            if time.monotonic() + delay > deadline:
+                raise
+            time.sleep(delay)
+            delay = min(2 * delay, 1.0)
+
+
+def sqlite_rows(df, columns):
+    """Rows of a parsed batch as SQLite values: ISO timestamps, json participants, NULL for NaN."""
+    df = df.reindex(columns=columns).copy()
+    for field in MATCH_SCHEMA:
+        if pa.types.is_timestamp(field.type):
+            df[field.name] = pd.to_datetime(df[field.name]).dt.strftime(TIMESTAMP_FORMAT)
+    df['participants'] = [json.dumps(list(value)) if value is not None else None for value in df['participants']]
+    df = df.astype(object).where(df.notna(), None)
+    # missing perks are '' in the parser output, NULL in the typed stores
+    for column in [field.name for field in MATCH_SCHEMA if field.name.startswith('perk_')]:
+        df[column] = df[column].replace('', None)
+    return list(df.itertuples(index=False, name=None))
+
+
+def restore_types(df):
+    """Gives back the dtypes SQLite does not keep to the MATCH_SCHEMA columns of a result."""
+    for field in MATCH_SCHEMA:
+        if field.name not in df.columns:
+            continue
+        if pa.types.is_timestamp(field.type):
+            df[field.name] = pd.to_datetime(df[field.name])
+        elif pa.types.is_boolean(field.type):
+            df[field.name] = df[field.name].astype('boolean')
+        elif pa.types.is_list(field.type):
+            df[field.name] = [json.loads(value) if value is not None else None for value in df[field.name]]
+    return df
+
+
+def main():
+    """Fills a local store from the Parquet dataset (python local_store.py --from-parquet parquet)."""
+    import argparse
+    from parquet_store import read_parquet_dataset
+    arg_parser = argparse.ArgumentParser(description='Builds the local analytical store.')
+    arg_parser.add_argument('--path', default='local_store.db')
+    arg_parser.add_argument('--engine', choices=['duckdb', 'sqlite'], default=None)
+    arg_parser.add_argument('--from-parquet', default='parquet', help='Parquet dataset written by update.py')
+    args = arg_parser.parse_args()
+
+    store = LocalStore(args.path, args.engine)
+    df = read_parquet_dataset(args.from_parquet, columns=[field.name for field in MATCH_SCHEMA])
+    store.ingest(df)
+    print(f'{store.count()} rows in {args.path} ({store.engine})')
+    store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+### Imports
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class MatchCache:
+
+    """Persistent on-disk cache of raw match-v5 jsons, keyed by match id.
+
+    Match payloads never change once the game is over, so a match is only ever
+    downloaded once. Files are compressed (zstd when `zstandard` is installed,
+    gzip otherwise) and sharded by a hash of the match id:
+    <root>/<platform>/<2 hex chars>/<match_id>.json.<ext>
+
+    Args:
+        root (str, optional): Cache directory. Defaults to 'match_cache'.
+        max_bytes (int, optional): Size above which the least recently used matches are evicted. Defaults to 2 GB.
+        compression (str, optional): 'zstd' or 'gzip', defaults to zstd if available.
+    """
+
+    def __init__(self, root='match_cache', max_bytes=2 * 1024 ** 3, compression=None):
+        self.root = root
+        self.max_bytes = max_bytes
+        if compression is None:
+            compression = 'zstd' if zstandard is not None else 'gzip'
+        if compression == 'zstd' and zstandard is None:
+            raise ImportError('zstandard is required for zstd compression')
+        self.compression = compression
+        self.extension = '.json.zst' if compression == 'zstd' else '.json.gz'
+
+    def path(self, matchId, extension=None):
+        platform = matchId.split('_')[0]
+        shard = hashlib.sha1(matchId.encode()).hexdigest()[:2]
+        return os.path.join(self.root, platform, shard, matchId + (extension or self.extension))
+
+    def _compress(self, data):
+        if self.compression == 'zstd':
+            return zstandard.ZstdCompressor(level=9).compress(data)
+        return gzip.compress(data, compresslevel=6)
+
+    @staticmethod
+    def _decompress(path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        if path.endswith('.zst'):
+            return zstandard.ZstdDecompressor().decompress(data)
+        return gzip.decompress(data)
+
+    def _find(self, matchId):
+        for extension in (self.extension, '.json.gz', '.json.zst'):
+            if extension == '.json.zst' and zstandard is None:
+                # written by an install with zstandard, a miss here: the match is downloaded again
+                continue
+            path = self.path(matchId, extension)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def __contains__(self, matchId):
+        return self._find(matchId) is not None
+
+    def get(self, matchId):
+        """Returns the cached match json, None on a miss.
+
+        The file modification time is refreshed so eviction drops the least recently used matches.
+        """
+        path = self._find(matchId)
+        if path is None:
+            return None
+        try:
+            match_json = json.loads(self._decompress(path))
+        except (OSError, ValueError, EOFError) as e:
+            print(f'Corrupted cache entry {path}: {e}')
+            os.remove(path)
+            return None
+        os.utime(path)
+        return match_json
+
+    def put(self, matchId, match_json):
+        """Stores a match json, written atomically so a crash never leaves a truncated file."""
+        path = self.path(matchId)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = self._compress(json.dumps(match_json, separators=(',', ':')).encode())
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def split(self, list_matchIds):
+        """Splits match ids between cached jsons and ids to download.
+
+        Returns:
+            tuple: (list of cached match jsons, list of missing match ids).
+        """
+        cached, missing = [], []
+        for matchId in list_matchIds:
+            match_json = self.get(matchId)
+            if match_json is None:
+                missing.append(matchId)
+            else:
+                cached.append(match_json)
+        return cached, missing
+
+    def _files(self):
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.endswith(('.json.gz', '.json.zst')):
+                    yield os.path.join(dirpath, filename)
+
+    def match_ids(self):
+        """Lists every cached match id."""
+        return [os.path.basename(path).split('.json')[0] for path in self._files()]
+
+    def iter_match_jsons(self):
+        """Yields every cached match json, e.g. to re-parse offline after a schema change."""
+        for path in self._files():
+            if path.endswith('.zst') and zstandard is None:
+                print(f'Skipping {path}: zstandard is not installed')
+                continue
+            try:
+                yield json.loads(self._decompress(path))
+            except (OSError, ValueError, EOFError) as e:
+                print(f'Skipping corrupted cache entry {path}: {e}')
+
+    def size(self):
+        """Total size of the cache in bytes."""
+        return sum(os.path.getsize(path) for path in self._files())
+
+    def evict(self, max_bytes=None):
+        """Deletes the least recently used matches until the cache fits in max_bytes.
+
+        Returns:
+            int: Number of matches evicted.
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = [(os.path.getmtime(path), os.path.getsize(path), path) for path in self._files()]
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        for mtime, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            os.remove(path)
+            total -= size
+            evicted += 1
+        if evicted:
+            print(f'Evicted {evicted} matches from the cache')
+        return evicted
+
+
+def reparse_cache(cache):
+    """Rebuilds the flattened dataframe from every cached match, without any API call.
+
+    Args:
+        cache (MatchCache): Cache to read.
+
+    Returns:
+        DataFrame: Same schema as riot_functions.api_get_match_history_puuid.
+    """
+    from match_parser import MatchBatchBuilder, format_match_dataframe
+    builder = MatchBatchBuilder()
+    builder.extend(cache.iter_match_jsons())
+    return format_match_dataframe(builder.to_dataframe())
@@ -0,0 +1,397 @@
+### Imports
+from metrics import get_metrics
+
+# Column schema of the flattened match data (one row per participant). The rows are upserted
+# as is into supabase game_player: a new column needs its migration in migrations/
+MATCH_COLUMNS = [
+    'match_id',
+    'participants',
+    'game_creation',
+    'game_start_timestamp',
+    'game_end_timestamp',
+    'game_version',
+    'queue_id',
+    'game_mode',
+    'platform_id',
+    'puuid',
+    'riot_id',
+    'riot_tag',
+    'time_played',
+    'side',
+    'win',
+    'team_position',
+    'lane',
+    'champion',
+    'kills',
+    'deaths',
+    'assists',
+    'summoner1_id',
+    'summoner2_id',
+    'gold_earned',
+    'total_minions_killed',
+    'total_neutral_minions_killed',
+    'total_ally_jungle_minions_killed',
+    'total_enemy_jungle_minions_killed',
+    'early_surrender',
+    'surrender',
+    'first_blood',
+    'first_blood_assist',
+    'first_tower',
+    'first_tower_assist',
+    'damage_dealt_to_buildings',
+    'turret_kills',
+    'turrets_lost',
+    'damage_dealt_to_objectives',
+    'dragonKills',
+    'objectives_stolen',
+    'longest_time_spent_living',
+    'largest_killing_spree',
+    'total_damage_dealt_champions',
+    'total_damage_taken',
+    'total_damage_self_mitigated',
+    'total_damage_shielded_teammates',
+    'total_heals_teammates',
+    'total_time_crowd_controlled',
+    'total_time_spent_dead',
+    'vision_score',
+    'wards_killed',
+    'wards_placed',
+    'control_wards_placed',
+    'item0',
+    'item1',
+    'item2',
+    'item3',
+    'item4',
+    'item5',
+    'item6',
+    'perk_keystone',
+    'perk_primary_row_1',
+    'perk_primary_row_2',
+    'perk_primary_row_3',
+    'perk_secondary_row_1',
+    'perk_secondary_row_2',
+    'perk_primary_style',
+    'perk_secondary_style',
+    'perk_shard_defense',
+    'perk_shard_flex',
+    'perk_shard_offense',
+    'opp_champion',
+    'opp_puuid',
+    'gold_diff_opp',
+    'team_kills',
+    'kill_participation',
+]
+
+
+def new_match_columns():
+    """Creates empty per-column buffers following MATCH_COLUMNS.
+
+    Returns:
+        dict: Column name -> empty list.
+    """
+    return {column: [] for column in MATCH_COLUMNS}
+
+def append_match_json_reporting(columns, match_json):
+
+    """Flattens a match json into per-column buffers, one row per participant.
+
+    Args:
+        columns (dict): Column name -> list of values, as built by new_match_columns().
+        match_json (dict): Match JSON.
+
+    Returns:
+        int: Number of rows appended.
+    """
+    side_dict = {
+        100:'blue',
+        200:'red'
+    }
+    info = match_json['info']
+    metadata = match_json['metadata']
+    matchId = metadata['matchId']
+    participants = metadata['participants']
+
+    # index the match once: (teamId, teamPosition) -> participant, and kills per team
+    by_slot = {}
+    team_kills_dict = {}
+    for other_player in info['participants']:
+        if other_player['teamPosition']:
+            by_slot[(other_player['teamId'], other_player['teamPosition'])] = other_player
+        team_kills_dict[other_player['teamId']] = team_kills_dict.get(other_player['teamId'], 0) + other_player['kills']
+    
+    for player in info['participants']:
+
+        #get lane opponent (same position in the other team, none in modes without positions)
+        opponent = None
+        if player['teamPosition']:
+            for teamId in team_kills_dict:
+                if teamId != player['teamId']:
+                    opponent = by_slot.get((teamId, player['teamPosition']))
+        opp_champion = opponent['championName'] if opponent else None
+        opp_puuid = opponent['puuid'] if opponent else None
+        goldDiffOpp = player['goldEarned'] - opponent['goldEarned'] if opponent else None
+
+        teamKills = team_kills_dict[player['teamId']]
+        killParticipation = round((player['kills'] + player['assists']) / teamKills, 4) if teamKills else 0.0
+
+        gameCreation = info['gameCreation']
+        gameStartTimestamp = info['gameStartTimestamp']
+        gameEndTimestamp = info['gameEndTimestamp']
+        timePlayed = gameEndTimestamp-gameStartTimestamp
+        gameMode = info['gameMode']
+        gameVersion = info['gameVersion']
+        platformId = info['platformId']
+        queueId = info['queueId']
+        puuid = player['puuid']
+        riotIdGameName = player['summonerName']
+        try:
+            riotIdTagLine = player['riotIdTagline']
+        except:
+            riotIdTagLine = ''
+        side = side_dict[player['teamId']]
+        win = player['win']
+
+        champion = player['championName']
+        kills = player['kills']
+        deaths = player['deaths']
+        assists = player['assists']
+        summOne = player['summoner1Id']
+        summTwo = player['summoner2Id']
+        earlySurrender = player['gameEndedInEarlySurrender']
+        surrender = player['gameEndedInSurrender']
+        firstBlood = player['firstBloodKill']
+        firstBloodAssist = player['firstBloodAssist']
+        firstTower = player['firstTowerKill']
+        firstTowerAssist = player['firstTowerAssist']
+        dragonKills = player['dragonKills']
+
+        damageDealtToBuildings = player['damageDealtToBuildings']
+        damageDealtToObjectives = player['damageDealtToObjectives']
+        damageSelfMitigated = player['damageSelfMitigated']
+        goldEarned = player['goldEarned']
+        teamPosition = player['teamPosition']
+        lane = player['lane']
+        largestKillingSpree = player['largestKillingSpree']
+        longestTimeSpentLiving = player['longestTimeSpentLiving']
+        objectivesStolen = player['objectivesStolen']
+        totalMinionsKilled = player['totalMinionsKilled']
+        totalAllyJungleMinionsKilled = player['totalAllyJungleMinionsKilled']
+        totalEnemyJungleMinionsKilled = player['totalEnemyJungleMinionsKilled']
+        totalNeutralMinionsKilled = totalAllyJungleMinionsKilled + totalEnemyJungleMinionsKilled
+        totalDamageDealtToChampions = player['totalDamageDealtToChampions']
+        totalDamageShieldedOnTeammates = player['totalDamageShieldedOnTeammates']
+        totalHealsOnTeammates = player['totalHealsOnTeammates']
+        totalDamageTaken = player['totalDamageTaken']
+        totalTimeCCDealt = player['totalTimeCCDealt']
+        totalTimeSpentDead = player['totalTimeSpentDead']
+        turretKills = player['turretKills']
+        turretsLost = player['turretsLost']
+        visionScore = player['visionScore']
+        controlWardsPlaced = player['detectorWardsPlaced']
+        wardsKilled = player['wardsKilled']
+        wardsPlaced = player['wardsPlaced']
+
+        item0 = player['item0']
+        item1 = player['item1']
+        item2 = player['item2']
+        item3 = player['item3']
+        item4 = player['item4']
+        item5 = player['item5']
+        item6 = player['item6']
+        try:
+            perks = player['perks']
+
+            perkKeystone = perks['styles'][0]['selections'][0]['perk']
+            perkPrimaryRow1 = perks['styles'][0]['selections'][1]['perk']
+            perkPrimaryRow2 = perks['styles'][0]['selections'][2]['perk']
+            perkPrimaryRow3 = perks['styles'][0]['selections'][3]['perk']
+            perkPrimaryStyle = perks['styles'][0]['style']
+            perkSecondaryRow1 = perks['styles'][1]['selections'][0]['perk']
+            perkSecondaryRow2 = perks['styles'][1]['selections'][1]['perk']
+            perkSecondaryStyle = perks['styles'][1]['style']
+            perkShardDefense = perks['statPerks']['defense']
+            perkShardFlex = perks['statPerks']['flex']
+            perkShardOffense = perks['statPerks']['offense']
+        except:
+            perkKeystone = ''
+            perkPrimaryRow1 = ''
+            perkPrimaryRow2 = ''
+            perkPrimaryRow3 = ''
+            perkPrimaryStyle = ''
+            perkSecondaryRow1 = ''
+            perkSecondaryRow2 = ''
+            perkSecondaryStyle = ''
+            perkShardDefense = ''
+            perkShardFlex = ''
+            perkShardOffense = ''
+
+
+        row = {
+            'match_id': matchId,
+            'participants': participants,
+            'game_creation': gameCreation,
+            'game_start_timestamp': gameStartTimestamp,
+            'game_end_timestamp': gameEndTimestamp,
+            'game_version': gameVersion,
+            'queue_id': queueId,
+            'game_mode': gameMode,
+            'platform_id': platformId,
+            'puuid': puuid,
+            'riot_id': riotIdGameName,
+            'riot_tag': riotIdTagLine,
+            'time_played': timePlayed,
+            'side': side,
+            'win': win,
+            'team_position': teamPosition,
+            'lane': lane,
+            'champion': champion,
+            'kills': kills,
+            'deaths': deaths,
+            'assists': assists,
+            'summoner1_id': summOne,
+            'summoner2_id': summTwo,
+            'gold_earned': goldEarned,
+            'total_minions_killed': totalMinionsKilled,
+            'total_neutral_minions_killed': totalNeutralMinionsKilled,
+            'total_ally_jungle_minions_killed': totalAllyJungleMinionsKilled,
+            'total_enemy_jungle_minions_killed': totalEnemyJungleMinionsKilled,
+            'early_surrender': earlySurrender,
+            'surrender': surrender,
+            'first_blood': firstBlood,
+            'first_blood_assist': firstBloodAssist,
+            'first_tower': firstTower,
+            'first_tower_assist': firstTowerAssist,
+            'damage_dealt_to_buildings': damageDealtToBuildings,
+            'turret_kills': turretKills,
+            'turrets_lost': turretsLost,
+            'damage_dealt_to_objectives': damageDealtToObjectives,
+            'dragonKills': dragonKills,
+            'objectives_stolen': objectivesStolen,
+            'longest_time_spent_living': longestTimeSpentLiving,
+            'largest_killing_spree': largestKillingSpree,
+            'total_damage_dealt_champions': totalDamageDealtToChampions,
+            'total_damage_taken': totalDamageTaken,
+            'total_damage_self_mitigated': damageSelfMitigated,
+            'total_damage_shielded_teammates': totalDamageShieldedOnTeammates,
+            'total_heals_teammates': totalHealsOnTeammates,
+            'total_time_crowd_controlled': totalTimeCCDealt,
+            'total_time_spent_dead': totalTimeSpentDead,
+            'vision_score': visionScore,
+            'wards_killed': wardsKilled,
+            'wards_placed': wardsPlaced,
+            'control_wards_placed': controlWardsPlaced,
+            'item0': item0,
+            'item1': item1,
+            'item2': item2,
+            'item3': item3,
+            'item4': item4,
+            'item5': item5,
+            'item6': item6,
+            'perk_keystone': perkKeystone,
+            'perk_primary_row_1': perkPrimaryRow1,
+            'perk_primary_row_2': perkPrimaryRow2,
+            'perk_primary_row_3': perkPrimaryRow3,
+            'perk_secondary_row_1': perkSecondaryRow1,
+            'perk_secondary_row_2': perkSecondaryRow2,
+            'perk_primary_style': perkPrimaryStyle,
+            'perk_secondary_style': perkSecondaryStyle,
+            'perk_shard_defense': perkShardDefense,
+            'perk_shard_flex': perkShardFlex,
+            'perk_shard_offense': perkShardOffense,
+            'opp_champion': opp_champion,
+            'opp_puuid': opp_puuid,
+            'gold_diff_opp': goldDiffOpp,
+            'team_kills': teamKills,
+            'kill_participation': killParticipation,
+        }
+        for column, value in row.items():
+            columns[column].append(value)
+    return len(info['participants'])
+
+def process_match_json_reporting(match_json):
+
+    """Processes the match json into a dataframe.
+
+    Args:
+        match_json (dict): Match JSON.
+
+    Returns:
+        dataframe: Dataframe of the processed match data.
+    """
+    builder = MatchBatchBuilder()
+    builder.add(match_json)
+    return builder.to_dataframe()
+
+class MatchBatchBuilder:
+
+    """Flattens a batch of match jsons into column buffers and builds the dataframe once.
+
+    Appending a match only extends python lists, so the cost of a batch grows
+    linearly with the number of matches instead of copying a growing dataframe
+    on every pd.concat.
+    """
+
+    def __init__(self):
+        self.columns = new_match_columns()
+        self.n_matches = 0
+
+    def __len__(self):
+        return len(self.columns['match_id'])
+
+    def add(self, match_json):
+        """Appends the 10 participant rows of a match json.
+
+        Args:
+            match_json (dict): Match JSON.
+
+        Returns:
+            int: Number of rows appended.
+        """
+        metrics = get_metrics()
+        with metrics.stage('parse'):
+            n_rows = append_match_json_reporting(self.columns, match_json)
+        metrics.inc('rows_total', n_rows, stage='parse')
+        self.n_matches += 1
+        return n_rows
+
+    def extend(self, list_match_json):
+        """Appends every match json of an iterable."""
+        for match_json in list_match_json:
+            self.add(match_json)
+
+    def to_dataframe(self):
+        """Materializes the buffers into a single dataframe with the MATCH_COLUMNS schema.
+
+        Returns:
+            DataFrame: One row per participant.
+        """
+        import pandas as pd
+        return pd.DataFrame(self.columns, columns=MATCH_COLUMNS)
+
+    def to_arrow(self):
+        """Materializes the buffers into a typed pyarrow table (see parquet_store.MATCH_SCHEMA).
+
+        Returns:
+            pyarrow.Table: One row per participant, plus the patch/date partition columns.
+        """
+        from parquet_store import table_from_columns
+        return table_from_columns(self.columns)
+
+def format_match_dataframe(df):
+    """Converts the epoch columns of a parsed batch to datetimes and time_played to minutes.
+
+    Args:
+        df (DataFrame): Output of MatchBatchBuilder.to_dataframe().
+
+    Returns:
+        DataFrame: Same dataframe, converted in place.
+    """
+    import pandas as pd
+    try:
+        df['game_creation'] = pd.to_datetime(df['game_creation'], unit='ms')
+        df['game_start_timestamp'] = pd.to_datetime(df['game_start_timestamp'], unit='ms')
+        df['game_end_timestamp'] = pd.to_datetime(df['game_end_timestamp'], unit='ms')
+        df['time_played'] = df['time_played']/60000
+    except: 
+        None
+    return df
@@ -0,0 +1,179 @@
+### Imports
+import sqlite3
+import threading
+
+# A match is complete in the db once every participant row is stored
+PLAYERS_PER_MATCH = 10
+
+
+def to_epoch_seconds(value):
+    """Converts a stored game_creation (ISO string, datetime or epoch ms) to epoch seconds."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value // 1000)
+    import pandas as pd
+    return int(pd.Timestamp(value).timestamp())
+
+
+def chunks(items, size):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def mark_below_incomplete(rows, complete):
+    """High-water mark among a player's latest games, most recent first.
+
+    The mark is the latest complete match older than every incomplete one: a
+    partially inserted match (failed chunk) must stay above the bound so the
+    walk reaches it and it is fetched again.
+
+    Args:
+        rows (list): {'match_id', 'game_creation'} rows, most recent first.
+        complete (set): Match ids of the rows that are fully stored.
+
+    Returns:
+        dict: {'match_id', 'start_time'} with start_time in epoch seconds, None if no such match.
+    """
+    incomplete = [i for i, row in enumerate(rows) if row['match_id'] not in complete]
+    below = incomplete[-1] + 1 if incomplete else 0
+    if below >= len(rows):
+        return None
+    return {'match_id': rows[below]['match_id'], 'start_time': to_epoch_seconds(rows[below]['game_creation'])}
+
+
+class SupabaseMatchStore:
+
+    """Reads what the supabase game_player table already holds, for incremental ingestion.
+
+    Args:
+        supabase (Client): Supabase client.
+        table (str, optional): Table of the flattened matches. Defaults to 'game_player'.
+        chunk_size (int, optional): Match ids per `in` query. Defaults to 50.
+    """
+
+    def __init__(self, supabase, table='game_player', chunk_size=50):
+        self.supabase = supabase
+        self.table = table
+        self.chunk_size = chunk_size
+
+    def stored_match_ids(self, list_matchIds):
+        """Returns the match ids of the list that are fully stored (10 participant rows).
+
+        Args:
+            list_matchIds (list): Candidate match ids.
+
+        Returns:
+            set: Match ids already stored.
+        """
+        row_counts = {}
+        for chunk in chunks(set(list_matchIds), self.chunk_size):
+            r = self.supabase.table(self.table).select('match_id').in_('match_id', chunk).execute()
+            for row in r.data:
+                row_counts[row['match_id']] = row_counts.get(row['match_id'], 0) + 1
+        return {matchId for matchId, n in row_counts.items() if n >= PLAYERS_PER_MATCH}
+
+    def high_water_mark(self, puuid, candidates=20):
+        """Returns the latest fully stored game of a player older than their partially stored ones.
+
+        Args:
+            puuid (str): Player's puuid.
+            candidates (int, optional): Latest games checked for completeness. Defaults to 20.
+
+        Returns:
+            dict: {'match_id', 'start_time'} with start_time in epoch seconds, None if there is no such game
+                among the latest candidates (see mark_below_incomplete).
+        """
+        r = (self.supabase.table(self.table).select('match_id,game_creation').eq('puuid', puuid)
+             .order('game_creation', desc=True).limit(candidates).execute())
+        complete = self.stored_match_ids([row['match_id'] for row in r.data]) if r.data else set()
+        return mark_below_incomplete(r.data, complete)
+
+
+class SQLiteMatchStore:
+
+    """Local SQLite stand-in of the game_player table with the same interface as SupabaseMatchStore.
+
+    Args:
+        path (str, optional): Database file. Defaults to ':memory:'.
+        table (str, optional): Table name. Defaults to 'game_player'.
+    """
+
+    def __init__(self, path=':memory:', table='game_player'):
+        # Shared by the history walkers' threads, serialized by the lock
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.table = table
+        self.connection.execute(f'CREATE TABLE IF NOT EXISTS {self.table} '
+                                '(match_id TEXT, puuid TEXT, game_creation TEXT)')
+        self.connection.execute(f'CREATE INDEX IF NOT EXISTS {self.table}_puuid ON {self.table} (puuid, game_creation)')
+        self.connection.execute(f'CREATE INDEX IF NOT EXISTS {self.table}_match_id ON {self.table} (match_id)')
+
+    def insert_df(self, df):
+        """Stores the match_id / puuid / game_creation columns of a parsed batch."""
+        import pandas as pd
+        rows = df[['match_id', 'puuid', 'game_creation']].copy()
+        rows['game_creation'] = pd.to_datetime(rows['game_creation']).map(lambda t: t.isoformat())
+        with self.lock, self.connection:
+            self.connection.executemany(f'INSERT INTO {self.table} VALUES (?, ?, ?)',
+                                        rows.itertuples(index=False, name=None))
+
+    def stored_match_ids(self, list_matchIds):
+        stored = set()
+        for chunk in chunks(set(list_matchIds), 500):
+            query = (f'SELECT match_id FROM {self.table} WHERE match_id IN ({",".join("?" * len(chunk))}) '
+                     'GROUP BY match_id HAVING COUNT(*) >= ?')
+            with self.lock:
+                stored.update(row[0] for row in self.connection.execute(query, chunk + [PLAYERS_PER_MATCH]))
+        return stored
+
+    def high_water_mark(self, puuid, candidates=20):
+        # same rule as SupabaseMatchStore, see mark_below_incomplete
+        with self.lock:
+            rows = self.connection.execute(f'SELECT match_id, game_creation, (SELECT COUNT(*) FROM {self.table} '
+                                           f'WHERE match_id = game.match_id) FROM {self.table} AS game WHERE puuid = ? '
+                                           'ORDER BY game_creation DESC LIMIT ?', (puuid, candidates)).fetchall()
+        complete = {match_id for match_id, _, n in rows if n >= PLAYERS_PER_MATCH}
+        return mark_below_incomplete([{'match_id': match_id, 'game_creation': game_creation}
+                                      for match_id, game_creation, _ in rows], complete)
+
+
+def history_bounds_for(store, puuid, start_time=None):
+    """Where to stop walking a player's history: after their latest fully stored game.
+
+    The mark is a complete match (10 rows) older than every partially stored
+    one among the player's latest games, so a match whose insert partially
+    failed stays within the walk and is fetched again.
+
+    Args:
+        store (SupabaseMatchStore | SQLiteMatchStore): Store to check, None for no bound.
+        puuid (str): Player's puuid.
+        start_time (int, optional): Requested lower bound in epoch seconds. Defaults to None.
+
+    Returns:
+        tuple: (startTime to request, set of match ids to stop at).
+    """
+    if store is None:
+        return start_time, set()
+    mark = store.high_water_mark(puuid)
+    if mark is None:
+        return start_time, set()
+    return max(start_time or 0, mark['start_time']), {mark['match_id']}
+
+
+def filter_new_match_ids(store, list_matchIds):
+    """Drops the match ids already stored before any match download.
+
+    Args:
+        store (SupabaseMatchStore | SQLiteMatchStore): Store to check, None to keep every id.
+        list_matchIds (list): Deduplicated match ids.
+
+    Returns:
+        list: Match ids to fetch.
+    """
+    if store is None or not list_matchIds:
+        return list_matchIds
+    stored = store.stored_match_ids(list_matchIds)
+    print('Nombre de matchs déjà en base:', len(stored))
+    return [matchId for matchId in list_matchIds if matchId not in stored]
@@ -0,0 +1,231 @@
+### Imports
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+
+from riot_client import api_request, get_match_history_ids_many, new_riot_session, riot_root_url
+from match_parser import MatchBatchBuilder, format_match_dataframe
+from match_store import filter_new_match_ids
+from metrics import get_metrics
+
+
+class IngestCheckpoint:
+
+    """Progress of a streamed ingestion, saved to disk after every batch.
+
+    Holds the match ids still to ingest and the ones that could not be
+    downloaded. A run finding pending ids resumes from them instead of walking
+    the histories again; otherwise it walks the histories and adds the failed
+    ids of the previous runs to the new ones. An id is retried at most
+    max_retries times. The file is removed once every match went through.
+
+    Args:
+        path (str, optional): Checkpoint file. Defaults to 'ingest_checkpoint.json'.
+        max_retries (int, optional): Runs a failed match is retried in. Defaults to 3.
+    """
+
+    def __init__(self, path='ingest_checkpoint.json', max_retries=3):
+        self.path = path
+        self.max_retries = max_retries
+        self.pending = []
+        self.failed = []
+        # failed downloads per match id, over the runs
+        self.attempts = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                state = json.load(f)
+            self.pending = state['pending']
+            self.attempts = state.get('attempts', {})
+            self.failed = [matchId for matchId in state.get('failed', []) if self.retryable(matchId)]
+
+    @property
+    def resuming(self):
+        return bool(self.pending)
+
+    def retryable(self, matchId):
+        if self.attempts.get(matchId, 0) < self.max_retries:
+            return True
+        print(f'Match {matchId} failed {self.max_retries} times, given up')
+        self.attempts.pop(matchId, None)
+        return False
+
+    def match_ids(self, list_matchIds=()):
+        """Ids of the run: the pending ones when resuming, else list_matchIds, plus the failed ones to retry."""
+        base = self.pending if self.resuming else list(list_matchIds)
+        return list(dict.fromkeys(base + self.failed))
+
+    def start(self, list_matchIds):
+        """Records the match ids of a run."""
+        self.pending = list(list_matchIds)
+        self.failed = []
+        self.save()
+
+    def done(self, list_matchIds):
+        """Marks the ids of a handled batch (and the failed ones) as no longer pending."""
+        handled = set(list_matchIds) | set(self.failed)
+        self.pending = [matchId for matchId in self.pending if matchId not in handled]
+        for matchId in list_matchIds:
+            self.attempts.pop(matchId, None)
+        self.save()
+
+    def fail(self, matchId):
+        self.failed.append(matchId)
+        self.attempts[matchId] = self.attempts.get(matchId, 0) + 1
+
+    def finish(self):
+        """Removes the checkpoint, or keeps only the failed ids for the next runs."""
+        self.pending = []
+        self.failed = [matchId for matchId in self.failed if self.retryable(matchId)]
+        self.attempts = {matchId: self.attempts[matchId] for matchId in self.failed}
+        if self.failed:
+            self.save()
+        elif os.path.exists(self.path):
+            os.remove(self.path)
+
+    def save(self):
+        """Writes the checkpoint atomically."""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'pending': self.pending, 'failed': self.failed, 'attempts': self.attempts,
+                       'updated_at': int(time.time())}, f)
+        os.replace(tmp_path, self.path)
+
+
+def fetch_match_json(matchId, region='europe', session=None, cache=None, config=None):
+    """Gets a match json from the cache or the API.
+
+    Returns:
+        dict: Match JSON, None if the call failed or the answer is not a match.
+    """
+    if cache is not None:
+        match_json = cache.get(matchId)
+        if match_json is not None:
+            return match_json
+    response = api_request(riot_root_url(region, config) + f'/lol/match/v5/matches/{matchId}', region,
+                           'match-v5.getMatch', session, config=config)
+    try:
+        match_json = response.json()
+        match_json['metadata']['matchId']
+    except (ValueError, KeyError, TypeError):
+        print(f'Match {matchId} not retrieved: {response.status_code}')
+        return None
+    if cache is not None:
+        cache.put(matchId, match_json)
+    return match_json
+
+
+def iter_match_history_batches(list_puuid, region='europe', batch_size=100, max_in_flight=30, store=None,
+                               cache=None, checkpoint=None, queue=None, start_time=None, end_time=None,
+                               max_matches=100, timelines=None, max_workers=15, config=None):
+    """Streams the new matches of the players as DataFrames of batch_size matches.
+
+    Streaming counterpart of api_get_match_history_puuid for large backfills.
+    At most max_in_flight match requests are outstanding and a single batch is
+    parsed at a time, so memory stays flat whatever the number of matches. A
+    batch is marked done in the checkpoint when the next one is requested,
+    i.e. once the caller has written it: an interrupted run resumes at the
+    first batch not handled. The last batch of an interrupted run may be
+    delivered again; the caller must only append the matches it did not
+    store yet (update.py keeps the games new to the store for the Parquet
+    dataset, the rollups and the champion summary).
+
+    Args:
+        list_puuid (list): Players' puuids.
+        region (str, optional): Routing value. Defaults to 'europe'.
+        batch_size (int, optional): Matches per yielded DataFrame. Defaults to 100.
+        max_in_flight (int, optional): Match requests submitted but not handled yet. Defaults to 30.
+        store (SupabaseMatchStore, optional): Skips the matches already stored. Defaults to None.
+        cache (MatchCache, optional): On-disk cache of raw match jsons. Defaults to None.
+        checkpoint (IngestCheckpoint, optional): Progress file to resume from. Defaults to None.
+        queue (int, optional): Queue id filter. Defaults to None.
+        start_time (int, optional): Epoch seconds, only matches played after it. Defaults to None.
+        end_time (int, optional): Epoch seconds, only matches played before it. Defaults to None.
+        max_matches (int, optional): Most recent matches per player, None for the whole history. Defaults to 100.
+        timelines (TimelineStore, optional): Also fetches the timelines of each batch. Defaults to None.
+        max_workers (int, optional): Worker threads. Defaults to 15.
+        config (Config, optional): Api key and base url to use. Defaults to the process configuration.
+
+    Yields:
+        DataFrame: Formatted match rows of one batch, as returned by api_get_match_history_puuid.
+    """
+    metrics = get_metrics()
+    if checkpoint is not None and checkpoint.resuming:
+        list_matchIds = checkpoint.match_ids()
+        print(f'Resuming from {checkpoint.path}: {len(list_matchIds)} matches left')
+    else:
+        with metrics.stage('match_ids'):
+            history_ids = get_match_history_ids_many(list_puuid, region, store=store, queue=queue,
+                                                     start_time=start_time, end_time=end_time,
+                                                     max_matches=max_matches, config=config)
+        list_matchIds = list(dict.fromkeys(matchId for matchIds in history_ids.values() for matchId in matchIds))
+        if checkpoint is not None:
+            # the failures of the previous runs are retried with the new matches
+            list_matchIds = checkpoint.match_ids(list_matchIds)
+    # the batch an interrupted run wrote before saving its progress is stored already
+    with metrics.stage('store_lookup'):
+        list_matchIds = filter_new_match_ids(store, list_matchIds)
+    if checkpoint is not None:
+        checkpoint.start(list_matchIds)
+    print('Nombre de matchs à traiter:', len(list_matchIds))
+
+    session = new_riot_session(pool_maxsize=max_workers)
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    remaining = iter(list_matchIds)
+    in_flight = {}
+    batch = {'builder': MatchBatchBuilder(), 'ids': [], 'started': metrics.start_stage('fetch_matches')}
+
+    def emit():
+        if timelines is not None:
+            from timeline import fetch_timelines
+            with metrics.stage('fetch_timelines'):
+                fetch_timelines(batch['ids'], timelines, region, session, executor, config=config)
+        df = format_match_dataframe(batch['builder'].to_dataframe())
+        metrics.end_stage('fetch_matches', batch.pop('started'))
+        metrics.inc('rows_total', len(df), stage='fetch_matches')
+        yield df
+        # the caller came back for more: the batch is handled
+        if checkpoint is not None:
+            checkpoint.done(batch['ids'])
+        batch.update(builder=MatchBatchBuilder(), ids=[], started=metrics.start_stage('fetch_matches'))
+
+    try:
+        while True:
+            # backpressure: the window is only refilled as requests complete
+            while len(in_flight) < max_in_flight:
+                matchId = next(remaining, None)
+                if matchId is None:
+                    break
+                in_flight[executor.submit(fetch_match_json, matchId, region, session, cache, config)] = matchId
+            if not in_flight:
+                break
+            completed, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in completed:
+                matchId = in_flight.pop(future)
+                try:
+                    match_json = future.result()
+                except requests.RequestException as e:
+                    print(f'Match {matchId} not retrieved: {e}')
+                    match_json = None
+                if match_json is None:
+                    if checkpoint is not None:
+                        checkpoint.fail(matchId)
+                    continue
+                batch['builder'].add(match_json)
+                batch['ids'].append(matchId)
+                if len(batch['ids']) >= batch_size:
+                    yield from emit()
+        if batch['ids']:
+            yield from emit()
+    finally:
+        if 'started' in batch:
+            metrics.end_stage('fetch_matches', batch.pop('started'))
+        executor.shutdown(wait=False, cancel_futures=True)
+        if cache is not None:
+            cache.evict()
+    if checkpoint is not None:
+        checkpoint.finish()
@@ -0,0 +1,199 @@
+### Imports
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = [0.01, 0.025, 0.05, 0.075, 0.1, 0.15, 0.25, 0.35, 0.5, 0.75, 1, 1.5, 2.5, 5, 10, 30, 60, 120]
+
+
+class Histogram:
+
+    """Bucket counts of the observed values, constant memory whatever the number of observations."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q):
+        """Estimate of the q-quantile, interpolated linearly inside its bucket (as histogram_quantile does)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            if count and cumulative + count >= rank:
+                lower = max(self.buckets[i - 1] if i > 0 else self.min, self.min)
+                upper = min(self.buckets[i] if i < len(self.buckets) else self.max, self.max)
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.max
+
+    def summary(self):
+        return {'count': self.count, 'sum': round(self.sum, 4),
+                'p50': self.quantile(0.5), 'p95': self.quantile(0.95), 'max': self.max}
+
+
+def label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def format_labels(key):
+    return ','.join(f'{name}="{value}"' for name, value in key)
+
+
+class Metrics:
+
+    """Counters, latency histograms and stage timers of one run, shared by every thread.
+
+    Names follow the Prometheus conventions (riot_requests_total,
+    riot_request_seconds, ...), labels are passed as keyword arguments.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.counters = {}
+            self.histograms = {}
+            self.stages = {}
+            self.stage_walls = {}
+            self.active_stages = {}
+            self.started_at = time.time()
+
+    def inc(self, name, value=1, **labels):
+        with self.lock:
+            key = (name, label_key(labels))
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        with self.lock:
+            key = (name, label_key(labels))
+            if key not in self.histograms:
+                self.histograms[key] = Histogram()
+            self.histograms[key].observe(value)
+
+    def start_stage(self, name):
+        """Marks a thread entering a stage.
+
+        Args:
+            name (str): Stage name.
+
+        Returns:
+            float: Start time, to give back to end_stage.
+        """
+        started = time.perf_counter()
+        with self.lock:
+            active, since = self.active_stages.get(name, (0, started))
+            self.active_stages[name] = (active + 1, since)
+        return started
+
+    def end_stage(self, name, started):
+        """Marks a thread leaving a stage entered with start_stage.
+
+        The stage's seconds add up the time of every thread in it, its wall
+        seconds only count the time during which at least one thread was:
+        four region threads fetching for 10s make 40 seconds and 10 wall seconds.
+        """
+        ended = time.perf_counter()
+        with self.lock:
+            self.stages[name] = self.stages.get(name, 0.0) + ended - started
+            active, since = self.active_stages.pop(name, (1, started))
+            if active > 1:
+                self.active_stages[name] = (active - 1, since)
+            else:
+                self.stage_walls[name] = self.stage_walls.get(name, 0.0) + ended - since
+
+    @contextmanager
+    def stage(self, name):
+        """Times a stage of the job (may be entered several times and by several threads)."""
+        started = self.start_stage(name)
+        try:
+            yield
+        finally:
+            self.end_stage(name, started)
+
+    def counter(self, name, **labels):
+        """Total of a counter over the label sets matching the given labels."""
+        with self.lock:
+            return sum(value for (counter_name, key), value in self.counters.items()
+                       if counter_name == name and set(label_key(labels)) <= set(key))
+
+    def run_summary(self):
+        """JSON-serializable summary of the run.
+
+        Returns:
+            dict: duration, stages (seconds summed over the threads, wall seconds and rows/s where rows
+            were counted), counters, histograms.
+        """
+        with self.lock:
+            counters = {}
+            for (name, key), value in sorted(self.counters.items()):
+                counters.setdefault(name, {})[format_labels(key) or 'total'] = value
+            histograms = {}
+            for (name, key), histogram in sorted(self.histograms.items()):
+                histograms.setdefault(name, {})[format_labels(key) or 'total'] = histogram.summary()
+            stages = {name: {'seconds': round(seconds, 4), 'wall_seconds': round(self.stage_walls.get(name, 0.0), 4)}
+                      for name, seconds in self.stages.items()}
+        for name, stage in stages.items():
+            rows = counters.get('rows_total', {}).get(f'stage="{name}"', 0)
+            if rows and stage['wall_seconds']:
+                stage['rows'] = rows
+                stage['rows_per_second'] = round(rows / stage['wall_seconds'], 1)
+        return {'started_at': self.started_at, 'duration_seconds': round(time.time() - self.started_at, 4),
+                'stages': stages, 'counters': counters, 'histograms': histograms}
+
+    def write_run_summary(self, path='run_summary.json'):
+        with open(path, 'w') as f:
+            json.dump(self.run_summary(), f, indent=2)
+
+    def prometheus_text(self, prefix='zerance_'):
+        """Prometheus text exposition of every metric (for the node_exporter textfile collector)."""
+        lines = []
+        with self.lock:
+            for (name, key), value in sorted(self.counters.items()):
+                lines.append(f'{prefix}{name}{{{format_labels(key)}}} {value}')
+            for (name, key), histogram in sorted(self.histograms.items()):
+                labels = format_labels(key)
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + ['+Inf'], histogram.counts):
+                    cumulative += count
+                    bucket_labels = ','.join(filter(None, [labels, f'le="{bound}"']))
+                    lines.append(f'{prefix}{name}_bucket{{{bucket_labels}}} {cumulative}')
+                lines.append(f'{prefix}{name}_sum{{{labels}}} {histogram.sum}')
+                lines.append(f'{prefix}{name}_count{{{labels}}} {histogram.count}')
+            for name, seconds in sorted(self.stages.items()):
+                lines.append(f'{prefix}stage_seconds{{stage="{name}"}} {seconds}')
+                lines.append(f'{prefix}stage_wall_seconds{{stage="{name}"}} {self.stage_walls.get(name, 0.0)}')
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus_textfile(self, path):
+        """Writes the textfile atomically, the collector may read it at any time."""
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+
+
+metrics = Metrics()
+
+
+def get_metrics():
+    """Returns the metrics registry shared by the whole process."""
+    return metrics
@@ -0,0 +1,7 @@
+-- Lane opponent and team features added to the parsed rows (match_parser.MATCH_COLUMNS).
+-- Apply in the supabase SQL editor before running update.py with this version:
+-- PostgREST rejects the upserts of rows holding unknown columns.
+alter table game_player add column if not exists opp_puuid text;
+alter table game_player add column if not exists gold_diff_opp integer;
+alter table game_player add column if not exists team_kills integer;
+alter table game_player add column if not exists kill_participation double precision;
@@ -0,0 +1,20 @@
+-- Upsert key of db_writer.from_df_to_db: PostgREST's on_conflict=match_id,puuid needs a
+-- unique constraint on these columns, without it every write of update.py fails.
+-- The former insert-only writer may have stored a game twice: the duplicates are removed
+-- first (the oldest row of each (match_id, puuid) is kept), else the constraint cannot be added.
+begin;
+
+delete from game_player as duplicate
+using game_player as kept
+where duplicate.match_id = kept.match_id
+  and duplicate.puuid = kept.puuid
+  and duplicate.ctid > kept.ctid;
+
+do $$
+begin
+  if not exists (select 1 from pg_constraint where conname = 'game_player_match_id_puuid_key') then
+    alter table game_player add constraint game_player_match_id_puuid_key unique (match_id, puuid);
+  end if;
+end $$;
+
+commit;
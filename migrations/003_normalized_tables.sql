@@ -0,0 +1,110 @@
+-- Tables of the normalized layout ([storage] layout = normalized or both, see normalized_store.py).
+-- normalized_store upserts the dictionary tables on id, match_participant on (match_id, puuid_id)
+-- and matches on match_id: the keys below are the on_conflict targets PostgREST requires.
+-- There is no foreign key from match_participant to matches: the participant rows are written
+-- first, a match row only exists once all of them are (NormalizedMatchStore relies on it).
+begin;
+
+-- IdDictionary entries, the ids are given by the client (see sync_dictionary)
+create table if not exists puuid_ids (
+  id integer primary key,
+  puuid text not null unique
+);
+
+create table if not exists champion_ids (
+  id integer primary key,
+  champion text not null unique
+);
+
+-- one row per match, participants holds the 10 puuid ids
+create table if not exists matches (
+  match_id text primary key,
+  participants integer[] not null,
+  game_creation timestamptz,
+  game_start_timestamp timestamptz,
+  game_end_timestamp timestamptz,
+  game_version text,
+  queue_id integer,
+  game_mode text,
+  platform_id text,
+  time_played double precision
+);
+-- high_water_mark: participants @> array[puuid_id], latest game_creation first
+create index if not exists matches_participants_idx on matches using gin (participants);
+create index if not exists matches_game_creation_idx on matches (game_creation desc);
+
+-- one row per player of a match, puuids and champions as dictionary ids
+create table if not exists match_participant (
+  match_id text not null,
+  puuid_id integer not null,
+  riot_id text,
+  riot_tag text,
+  side text,
+  win boolean,
+  team_position text,
+  lane text,
+  champion_id integer,
+  kills integer,
+  deaths integer,
+  assists integer,
+  summoner1_id integer,
+  summoner2_id integer,
+  gold_earned integer,
+  total_minions_killed integer,
+  total_neutral_minions_killed integer,
+  total_ally_jungle_minions_killed integer,
+  total_enemy_jungle_minions_killed integer,
+  early_surrender boolean,
+  surrender boolean,
+  first_blood boolean,
+  first_blood_assist boolean,
+  first_tower boolean,
+  first_tower_assist boolean,
+  damage_dealt_to_buildings integer,
+  turret_kills integer,
+  turrets_lost integer,
+  damage_dealt_to_objectives integer,
+  "dragonKills" integer,
+  objectives_stolen integer,
+  longest_time_spent_living integer,
+  largest_killing_spree integer,
+  total_damage_dealt_champions integer,
+  total_damage_taken integer,
+  total_damage_self_mitigated integer,
+  total_damage_shielded_teammates integer,
+  total_heals_teammates integer,
+  total_time_crowd_controlled integer,
+  total_time_spent_dead integer,
+  vision_score integer,
+  wards_killed integer,
+  wards_placed integer,
+  control_wards_placed integer,
+  item0 integer,
+  item1 integer,
+  item2 integer,
+  item3 integer,
+  item4 integer,
+  item5 integer,
+  item6 integer,
+  perk_keystone integer,
+  perk_primary_row_1 integer,
+  perk_primary_row_2 integer,
+  perk_primary_row_3 integer,
+  perk_secondary_row_1 integer,
+  perk_secondary_row_2 integer,
+  perk_primary_style integer,
+  perk_secondary_style integer,
+  perk_shard_defense integer,
+  perk_shard_flex integer,
+  perk_shard_offense integer,
+  opp_champion_id integer,
+  opp_puuid_id integer,
+  gold_diff_opp integer,
+  team_kills integer,
+  kill_participation double precision,
+  primary key (match_id, puuid_id)
+);
+-- load_player_games: puuid_id in (...)
+create index if not exists match_participant_puuid_id_idx on match_participant (puuid_id);
+
+commit;
@@ -0,0 +1,22 @@
+-- Champion summary read by the dashboard ([supabase] champion_summary = true, see
+-- db_writer.update_champion_summary), upserted on db_writer.SUMMARY_KEYS.
+-- update.py only adds the games it ingests: on an existing database, fill it once with
+--   $ python db_writer.py --rebuild-champion-summary
+-- which records the build in summary_builds. The dashboard aggregates the games until then.
+begin;
+
+create table if not exists player_champion_stats (
+  puuid text not null,
+  team_position text not null,
+  champion text not null,
+  games integer not null default 0,
+  wins integer not null default 0,
+  unique (puuid, team_position, champion)
+);
+
+create table if not exists summary_builds (
+  name text primary key,
+  built_at timestamptz not null
+);
+
+commit;
@@ -0,0 +1,364 @@
+### Imports
+import json
+import os
+import tempfile
+import threading
+from match_parser import MATCH_COLUMNS
+from match_store import chunks, to_epoch_seconds
+
+# Fields shared by the 10 rows of a match, written once in the matches table
+MATCH_LEVEL_COLUMNS = ['match_id', 'participants', 'game_creation', 'game_start_timestamp', 'game_end_timestamp',
+                       'game_version', 'queue_id', 'game_mode', 'platform_id', 'time_played']
+# Columns of the participant table replaced by an integer id: column -> dictionary kind
+INTERNED_COLUMNS = {'puuid': 'puuid', 'opp_puuid': 'puuid', 'champion': 'champion', 'opp_champion': 'champion'}
+# Columns of the participant table (one row per player of a match)
+PARTICIPANT_COLUMNS = ['match_id'] + [f'{column}_id' if column in INTERNED_COLUMNS else column
+                                      for column in MATCH_COLUMNS if column not in MATCH_LEVEL_COLUMNS]
+TIMESTAMP_COLUMNS = ['game_creation', 'game_start_timestamp', 'game_end_timestamp']
+# '' in the parser output when a player has no runes, NULL in the integer columns of match_participant
+PERK_COLUMNS = [column for column in MATCH_COLUMNS if column.startswith('perk_')]
+
+MATCH_TABLE = 'matches'
+PARTICIPANT_TABLE = 'match_participant'
+# Dictionary kind -> supabase table of (id, value) rows
+DICTIONARY_TABLES = {'puuid': 'puuid_ids', 'champion': 'champion_ids'}
+
+
+class IdDictionary:
+
+    """Persistent value -> integer id dictionary of the interned puuids and champions.
+
+    Ids are positions in an append-only list per kind, so they never change once
+    given. The file is the reference of the ids written by update.py and must be
+    kept with the database: sync_dictionary mirrors it in the dictionary tables
+    and restores the entries missing locally.
+
+    Args:
+        path (str, optional): JSON file, None for an in-memory dictionary. Defaults to 'id_dictionary.json'.
+    """
+
+    def __init__(self, path='id_dictionary.json'):
+        self.path = path
+        self.lock = threading.Lock()
+        self.values = {kind: [] for kind in DICTIONARY_TABLES}
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.values.update(json.load(f))
+        # None marks an id missing from the dictionary tables (see set_entries)
+        self.ids = {kind: {value: i for i, value in enumerate(values) if value is not None}
+                    for kind, values in self.values.items()}
+
+    def __len__(self):
+        return sum(len(values) for values in self.values.values())
+
+    def extend(self, kind, values):
+        """Appends values not interned yet, in order."""
+        with self.lock:
+            ids = self.ids[kind]
+            for value in values:
+                if value is not None and value == value and value not in ids:
+                    ids[value] = len(self.values[kind])
+                    self.values[kind].append(value)
+
+    def set_entries(self, kind, entries):
+        """Places {id: value} entries read from a dictionary table, the ids not given stay unknown."""
+        with self.lock:
+            values = self.values[kind]
+            values.extend([None] * (max(entries, default=-1) + 1 - len(values)))
+            for i, value in entries.items():
+                values[i] = value
+                self.ids[kind][value] = i
+
+    def encode(self, kind, series):
+        """Ids of a column of values, new values are interned. None / NaN stay missing.
+
+        Args:
+            kind (str): 'puuid' or 'champion'.
+            series (Series): Values.
+
+        Returns:
+            Series: Nullable Int64 ids.
+        """
+        self.extend(kind, series.unique())
+        return series.map(self.ids[kind]).astype('Int64')
+
+    def decode(self, kind, series):
+        """Values of a column of ids, missing ids give None."""
+        import numpy as np
+        import pandas as pd
+        lookup = np.array(self.values[kind] + [None], dtype=object)
+        positions = series.astype('Int64').fillna(-1).to_numpy(dtype='int64')
+        return pd.Series(lookup[positions], index=series.index, dtype=object)
+
+    def save(self):
+        """Writes the dictionary atomically, nothing to do for an in-memory dictionary."""
+        if not self.path:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with self.lock, os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(self.values, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+
+def normalize(df, dictionary):
+    """Splits a parsed batch into one row per match and one slim row per participant.
+
+    The match-level fields and the 10-puuid participants list are kept once per
+    match (participants as puuid ids), the puuids and champions of the
+    participant rows are replaced by their ids.
+
+    Args:
+        df (DataFrame): Output of api_get_match_history_puuid.
+        dictionary (IdDictionary): Ids of the puuids and champions.
+
+    Returns:
+        tuple: (matches DataFrame, participants DataFrame).
+    """
+    matches = df.drop_duplicates('match_id')[[c for c in MATCH_LEVEL_COLUMNS if c in df.columns]].reset_index(drop=True)
+    if 'participants' in matches.columns:
+        for participants in matches['participants']:
+            dictionary.extend('puuid', participants)
+        puuid_ids = dictionary.ids['puuid']
+        matches['participants'] = [[puuid_ids[puuid] for puuid in participants] for participants in matches['participants']]
+
+    participants = df[[c for c in df.columns if c not in MATCH_LEVEL_COLUMNS or c == 'match_id']].reset_index(drop=True)
+    for column, kind in INTERNED_COLUMNS.items():
+        if column in participants.columns:
+            participants[column] = dictionary.encode(kind, participants[column])
+    participants = participants.rename(columns={column: f'{column}_id' for column in INTERNED_COLUMNS})
+    for column in PERK_COLUMNS:
+        if column in participants.columns:
+            participants[column] = participants[column].replace('', None)
+    return matches, participants
+
+
+def participant_ids(value):
+    """puuid ids of a participants cell, an array or its json text."""
+    return json.loads(value) if isinstance(value, str) else value
+
+
+def denormalize(matches, participants, dictionary, columns=None):
+    """Rebuilds the wide one-row-per-participant DataFrame of the parser.
+
+    Args:
+        matches (DataFrame): Rows of the matches table (every match of the participants).
+        participants (DataFrame): Rows of the participant table.
+        dictionary (IdDictionary): Ids of the puuids and champions.
+        columns (list, optional): Columns to keep. Defaults to all of them, in MATCH_COLUMNS order.
+
+    Returns:
+        DataFrame: Same layout as api_get_match_history_puuid.
+    """
+    import pandas as pd
+    participants = participants.rename(columns={f'{column}_id': column for column in INTERNED_COLUMNS})
+    for column, kind in INTERNED_COLUMNS.items():
+        if column in participants.columns:
+            participants[column] = dictionary.decode(kind, participants[column])
+    for column in PERK_COLUMNS:
+        if column in participants.columns and participants[column].isna().any():
+            participants[column] = participants[column].astype(object).where(participants[column].notna(), '')
+
+    matches = matches.copy()
+    if 'participants' in matches.columns:
+        puuids = dictionary.values['puuid']
+        matches['participants'] = [[puuids[i] for i in participant_ids(ids)] for ids in matches['participants']]
+    for column in TIMESTAMP_COLUMNS:
+        if column in matches.columns and not pd.api.types.is_datetime64_any_dtype(matches[column]):
+            matches[column] = pd.to_datetime(matches[column], utc=True).dt.tz_localize(None)
+
+    df = participants.merge(matches, on='match_id', how='left') if len(matches.columns) > 1 else participants
+    order = [c for c in (columns or MATCH_COLUMNS) if c in df.columns]
+    return df[order + [c for c in df.columns if c not in MATCH_COLUMNS and columns is None]]
+
+
+def fetch_all(query_factory, page_size=1000):
+    """Pages through a select ordered by a unique column, postgrest caps the rows of a response."""
+    rows = []
+    while True:
+        page = query_factory().range(len(rows), len(rows) + page_size - 1).execute().data
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+
+
+def sync_dictionary(supabase, dictionary):
+    """Mirrors the local dictionary in the dictionary tables, in both directions.
+
+    Entries the tables hold beyond the local file (file lost, other machine) are
+    pulled first so the ids stay those of the database, the local entries not
+    uploaded yet are then upserted.
+
+    Args:
+        supabase (Client): Supabase client.
+        dictionary (IdDictionary): Local dictionary, saved when entries were pulled.
+
+    Returns:
+        dict: Entries pushed per kind.
+    """
+    pushed = {}
+    pulled = False
+    for kind, table in DICTIONARY_TABLES.items():
+        r = supabase.table(table).select('id').order('id', desc=True).limit(1).execute()
+        stored = r.data[0]['id'] + 1 if r.data else 0
+        local = len(dictionary.values[kind])
+        if stored > local:
+            rows = fetch_all(lambda: supabase.table(table).select(f'id,{kind}').gte('id', local).order('id'))
+            # the ids are the table's, a missing id must not shift the following ones
+            dictionary.set_entries(kind, {row['id']: row[kind] for row in rows})
+            pulled = True
+        records = [{'id': i, kind: value} for i, value in enumerate(dictionary.values[kind][stored:], start=stored)]
+        for i in range(0, len(records), 1000):
+            supabase.table(table).upsert(records[i:i + 1000], on_conflict='id').execute()
+        pushed[kind] = len(records)
+    if pulled:
+        dictionary.save()
+    return pushed
+
+
+def from_df_to_normalized_db(supabase, df, dictionary, batch_size=500, max_workers=4, retries=3):
+    """Writes a parsed batch as matches + participant rows.
+
+    The participant rows are written before the match rows: a match present in
+    the matches table is complete (see NormalizedMatchStore).
+
+    Args:
+        supabase (Client): Supabase client.
+        df (DataFrame): Output of api_get_match_history_puuid.
+        dictionary (IdDictionary): Ids of the puuids and champions, saved after the batch.
+        batch_size (int, optional): Rows per upsert request. Defaults to 500.
+        max_workers (int, optional): Upsert requests in flight. Defaults to 4.
+        retries (int, optional): Rounds of retries for the failed chunks. Defaults to 3.
+
+    Returns:
+        dict: {'matches': rows written, 'participants': rows written, 'failed_rows': rows still failing,
+            'failed_match_ids': matches not complete in the tables}.
+    """
+    from db_writer import from_df_to_db
+    if df.empty:
+        return {'matches': 0, 'participants': 0, 'failed_rows': 0, 'failed_match_ids': set()}
+    sync_dictionary(supabase, dictionary)
+    matches, participants = normalize(df, dictionary)
+    dictionary.save()
+    sync_dictionary(supabase, dictionary)
+
+    written = from_df_to_db(supabase, participants, PARTICIPANT_TABLE, batch_size, max_workers, retries,
+                            on_conflict='match_id,puuid_id', numbered=False)
+    # a match with a participant row missing is left out so the next run fetches it again, the upserts are idempotent
+    failed_match_ids = set(written['failed_match_ids'])
+    matches = matches[~matches['match_id'].isin(failed_match_ids)]
+    match_written = from_df_to_db(supabase, matches, MATCH_TABLE, batch_size, max_workers, retries,
+                                  on_conflict='match_id', numbered=False)
+    failed_match_ids |= match_written['failed_match_ids']
+    return {'matches': match_written['rows'], 'participants': written['rows'],
+            'failed_rows': written['failed_rows'] + match_written['failed_rows'], 'failed_match_ids': failed_match_ids}
+
+
+def puuid_ids_of(supabase, list_puuid, dictionary=None):
+    """puuid -> id of the given players, from the local dictionary or the puuid table."""
+    if dictionary is not None:
+        return {puuid: dictionary.ids['puuid'][puuid] for puuid in list_puuid if puuid in dictionary.ids['puuid']}
+    ids = {}
+    for chunk in chunks(set(list_puuid), 50):
+        r = supabase.table(DICTIONARY_TABLES['puuid']).select('id,puuid').in_('puuid', chunk).execute()
+        ids.update({row['puuid']: row['id'] for row in r.data})
+    return ids
+
+
+def load_player_games(supabase, list_puuid, columns=None, dictionary=None):
+    """Games of some players read from the normalized tables, in the wide layout.
+
+    Only the requested columns travel: participant columns are selected as ids,
+    the matches table is only read when a match-level column is requested and
+    the dictionary entries are fetched for the ids of the answer.
+
+    Args:
+        supabase (Client): Supabase client.
+        list_puuid (list): Players' puuids.
+        columns (list, optional): Wide columns to return. Defaults to all of them.
+        dictionary (IdDictionary, optional): Local dictionary. Defaults to reading the dictionary tables.
+
+    Returns:
+        DataFrame: One row per player game.
+    """
+    import pandas as pd
+    columns = list(columns or MATCH_COLUMNS)
+    match_columns = [c for c in columns if c in MATCH_LEVEL_COLUMNS and c != 'match_id']
+    participant_columns = ['match_id'] if match_columns or 'match_id' in columns else []
+    participant_columns += ['puuid_id'] + [f'{c}_id' if c in INTERNED_COLUMNS else c for c in columns
+                                           if c not in MATCH_LEVEL_COLUMNS and c != 'puuid']
+
+    puuid_ids = puuid_ids_of(supabase, list_puuid, dictionary)
+    rows = []
+    for chunk in chunks(puuid_ids.values(), 50):
+        r = (supabase.table(PARTICIPANT_TABLE).select(','.join(participant_columns))
+             .in_('puuid_id', chunk).execute())
+        rows.extend(r.data)
+    participants = pd.DataFrame(rows, columns=participant_columns)
+
+    match_rows = []
+    if match_columns:
+        for chunk in chunks(participants['match_id'].unique(), 50):
+            r = (supabase.table(MATCH_TABLE).select(','.join(['match_id'] + match_columns))
+                 .in_('match_id', chunk).execute())
+            match_rows.extend(r.data)
+    matches = pd.DataFrame(match_rows, columns=['match_id'] + match_columns)
+
+    if dictionary is None:
+        dictionary = IdDictionary(path=None)
+        needed = {'puuid': {i for c in ['puuid_id', 'opp_puuid_id'] if c in participants for i in participants[c].dropna()},
+                  'champion': {i for c in ['champion_id', 'opp_champion_id'] if c in participants
+                               for i in participants[c].dropna()}}
+        if 'participants' in matches.columns:
+            needed['puuid'].update(i for ids in matches['participants'] for i in participant_ids(ids))
+        for kind, ids in needed.items():
+            if not ids:
+                continue
+            values = {}
+            for chunk in chunks(sorted(int(i) for i in ids), 200):
+                r = supabase.table(DICTIONARY_TABLES[kind]).select(f'id,{kind}').in_('id', chunk).execute()
+                values.update({row['id']: row[kind] for row in r.data})
+            dictionary.set_entries(kind, values)
+    return denormalize(matches, participants, dictionary, columns)
+
+
+class NormalizedMatchStore:
+
+    """Incremental ingestion store over the normalized tables, same interface as SupabaseMatchStore.
+
+    Args:
+        supabase (Client): Supabase client.
+        dictionary (IdDictionary): Ids of the puuids.
+        chunk_size (int, optional): Match ids per `in` query. Defaults to 50.
+    """
+
+    def __init__(self, supabase, dictionary, chunk_size=50):
+        self.supabase = supabase
+        self.dictionary = dictionary
+        self.chunk_size = chunk_size
+
+    def stored_match_ids(self, list_matchIds):
+        """Returns the match ids of the list present in the matches table."""
+        stored = set()
+        for chunk in chunks(set(list_matchIds), self.chunk_size):
+            r = self.supabase.table(MATCH_TABLE).select('match_id').in_('match_id', chunk).execute()
+            stored.update(row['match_id'] for row in r.data)
+        return stored
+
+    def high_water_mark(self, puuid):
+        """Returns the latest stored game of a player.
+
+        Args:
+            puuid (str): Player's puuid.
+
+        Returns:
+            dict: {'match_id', 'start_time'} with start_time in epoch seconds, None if the player has no game stored.
+        """
+        puuid_id = self.dictionary.ids['puuid'].get(puuid)
+        if puuid_id is None:
+            return None
+        r = (self.supabase.table(MATCH_TABLE).select('match_id,game_creation').contains('participants', [puuid_id])
+             .order('game_creation', desc=True).limit(1).execute())
+        if not r.data:
+            return None
+        return {'match_id': r.data[0]['match_id'], 'start_time': to_epoch_seconds(r.data[0]['game_creation'])}
@@ -0,0 +1,203 @@
+### Imports
+import uuid
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+CATEGORY = pa.dictionary(pa.int32(), pa.string())
+
+# Typed schema of the flattened match data, in MATCH_COLUMNS order
+MATCH_SCHEMA = pa.schema([
+    ('match_id', pa.string()),
+    ('participants', pa.list_(pa.string())),
+    ('game_creation', pa.timestamp('ms')),
+    ('game_start_timestamp', pa.timestamp('ms')),
+    ('game_end_timestamp', pa.timestamp('ms')),
+    ('game_version', CATEGORY),
+    ('queue_id', pa.int32()),
+    ('game_mode', CATEGORY),
+    ('platform_id', CATEGORY),
+    ('puuid', pa.string()),
+    ('riot_id', pa.string()),
+    ('riot_tag', pa.string()),
+    ('time_played', pa.float64()),
+    ('side', CATEGORY),
+    ('win', pa.bool_()),
+    ('team_position', CATEGORY),
+    ('lane', CATEGORY),
+    ('champion', CATEGORY),
+    ('kills', pa.int32()),
+    ('deaths', pa.int32()),
+    ('assists', pa.int32()),
+    ('summoner1_id', pa.int32()),
+    ('summoner2_id', pa.int32()),
+    ('gold_earned', pa.int32()),
+    ('total_minions_killed', pa.int32()),
+    ('total_neutral_minions_killed', pa.int32()),
+    ('total_ally_jungle_minions_killed', pa.int32()),
+    ('total_enemy_jungle_minions_killed', pa.int32()),
+    ('early_surrender', pa.bool_()),
+    ('surrender', pa.bool_()),
+    ('first_blood', pa.bool_()),
+    ('first_blood_assist', pa.bool_()),
+    ('first_tower', pa.bool_()),
+    ('first_tower_assist', pa.bool_()),
+    ('damage_dealt_to_buildings', pa.int32()),
+    ('turret_kills', pa.int32()),
+    ('turrets_lost', pa.int32()),
+    ('damage_dealt_to_objectives', pa.int32()),
+    ('dragonKills', pa.int32()),
+    ('objectives_stolen', pa.int32()),
+    ('longest_time_spent_living', pa.int32()),
+    ('largest_killing_spree', pa.int32()),
+    ('total_damage_dealt_champions', pa.int32()),
+    ('total_damage_taken', pa.int32()),
+    ('total_damage_self_mitigated', pa.int32()),
+    ('total_damage_shielded_teammates', pa.int32()),
+    ('total_heals_teammates', pa.int32()),
+    ('total_time_crowd_controlled', pa.int32()),
+    ('total_time_spent_dead', pa.int32()),
+    ('vision_score', pa.int32()),
+    ('wards_killed', pa.int32()),
+    ('wards_placed', pa.int32()),
+    ('control_wards_placed', pa.int32()),
+    ('item0', pa.int32()),
+    ('item1', pa.int32()),
+    ('item2', pa.int32()),
+    ('item3', pa.int32()),
+    ('item4', pa.int32()),
+    ('item5', pa.int32()),
+    ('item6', pa.int32()),
+    ('perk_keystone', pa.int32()),
+    ('perk_primary_row_1', pa.int32()),
+    ('perk_primary_row_2', pa.int32()),
+    ('perk_primary_row_3', pa.int32()),
+    ('perk_secondary_row_1', pa.int32()),
+    ('perk_secondary_row_2', pa.int32()),
+    ('perk_primary_style', pa.int32()),
+    ('perk_secondary_style', pa.int32()),
+    ('perk_shard_defense', pa.int32()),
+    ('perk_shard_flex', pa.int32()),
+    ('perk_shard_offense', pa.int32()),
+    ('opp_champion', CATEGORY),
+    ('opp_puuid', pa.string()),
+    ('gold_diff_opp', pa.int32()),
+    ('team_kills', pa.int32()),
+    ('kill_participation', pa.float64()),
+])
+
+PERK_COLUMNS = [field.name for field in MATCH_SCHEMA if field.name.startswith('perk_')]
+TIMESTAMP_COLUMNS = ['game_creation', 'game_start_timestamp', 'game_end_timestamp']
+PARTITION_COLUMNS = ['patch', 'date']
+
+
+def column_array(field, values):
+    """Converts one column of the parser buffers to an arrow array of the schema type."""
+    if field.name in PERK_COLUMNS:
+        # missing perks are stored as '' by the parser, they become nulls
+        values = [None if value == '' else value for value in values]
+    if pa.types.is_dictionary(field.type):
+        return pa.array(values, pa.string()).dictionary_encode()
+    return pa.array(values, field.type)
+
+
+def table_from_columns(columns):
+    """Builds a typed arrow table straight from MatchBatchBuilder buffers (epoch ms, time_played in ms).
+
+    Args:
+        columns (dict): Column name -> list of values.
+
+    Returns:
+        pyarrow.Table: Table with MATCH_SCHEMA plus the partition columns.
+    """
+    arrays = []
+    for field in MATCH_SCHEMA:
+        values = columns[field.name]
+        if field.name in TIMESTAMP_COLUMNS:
+            arrays.append(pa.array(values, pa.int64()).cast(field.type))
+        elif field.name == 'time_played':
+            arrays.append(pc.divide(pa.array(values, pa.float64()), 60000.0))
+        else:
+            arrays.append(column_array(field, values))
+    return add_partition_columns(pa.Table.from_arrays(arrays, schema=MATCH_SCHEMA))
+
+
+def table_from_dataframe(df):
+    """Builds a typed arrow table from the output of api_get_match_history_puuid.
+
+    Args:
+        df (DataFrame): Parsed matches, timestamps already converted to datetimes.
+
+    Returns:
+        pyarrow.Table: Table with MATCH_SCHEMA plus the partition columns.
+    """
+    arrays = []
+    for field in MATCH_SCHEMA:
+        series = df[field.name]
+        if field.name in TIMESTAMP_COLUMNS:
+            arrays.append(pa.array(pd.to_datetime(series)).cast(field.type))
+        else:
+            values = [None if value is None or (isinstance(value, float) and pd.isna(value)) else value
+                      for value in series.tolist()]
+            arrays.append(column_array(field, values))
+    return add_partition_columns(pa.Table.from_arrays(arrays, schema=MATCH_SCHEMA))
+
+
+def add_partition_columns(table):
+    """Adds 'patch' (major.minor of game_version) and 'date' (UTC day of game_creation)."""
+    versions = pc.cast(table['game_version'], pa.string())
+    patch = pc.binary_join_element_wise(pc.list_element(pc.split_pattern(versions, '.'), 0),
+                                        pc.list_element(pc.split_pattern(versions, '.'), 1), '.')
+    date = pc.strftime(table['game_creation'], format='%Y-%m-%d')
+    return table.append_column('patch', patch).append_column('date', date)
+
+
+def write_parquet_dataset(data, root='parquet', partition_cols=None):
+    """Appends parsed matches to a hive-partitioned Parquet dataset (patch=15.1/date=2025-01-04/...).
+
+    Args:
+        data (DataFrame | pyarrow.Table | dict): Output of api_get_match_history_puuid, a table from
+            table_from_columns, or MatchBatchBuilder buffers.
+        root (str, optional): Dataset directory. Defaults to 'parquet'.
+        partition_cols (list, optional): Defaults to ['patch', 'date'].
+
+    Returns:
+        int: Number of rows written.
+    """
+    if isinstance(data, pd.DataFrame):
+        table = table_from_dataframe(data)
+    elif isinstance(data, dict):
+        table = table_from_columns(data)
+    else:
+        table = data
+    if table.num_rows == 0:
+        return 0
+    ds.write_dataset(table, root, format='parquet',
+                     partitioning=partition_cols or PARTITION_COLUMNS, partitioning_flavor='hive',
+                     basename_template=f'part-{uuid.uuid4().hex}-{{i}}.parquet',
+                     existing_data_behavior='overwrite_or_ignore')
+    return table.num_rows
+
+
+def read_parquet_dataset(root='parquet', columns=None, filters=None):
+    """Loads parsed matches from the Parquet dataset.
+
+    Only the requested columns are read, and the filters are pushed down: whole
+    partitions are skipped on patch/date and row groups on their statistics.
+
+    Args:
+        root (str, optional): Dataset directory. Defaults to 'parquet'.
+        columns (list, optional): Columns to load. Defaults to None (all).
+        filters (list, optional): pyarrow filters, e.g. [('patch', '=', '15.1'), ('queue_id', '=', 420)].
+
+    Returns:
+        DataFrame: Categorical columns for the dictionary-encoded fields, nullable Int32 for the perks.
+    """
+    table = pq.read_table(root, columns=columns, filters=filters, partitioning='hive')
+    df = table.to_pandas()
+    for column in PERK_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype('Int32')
+    return df
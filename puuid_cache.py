@@ -0,0 +1,100 @@
+### Imports
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from riot_client import api_get_puuid
+from metrics import get_metrics
+
+
+class PuuidCache:
+
+    """Persistent 'gameName#tagLine' -> puuid cache with a time to live.
+
+    A puuid never changes for an account, the TTL only exists to notice renamed
+    Riot IDs. Expired entries are still kept as a fallback when a lookup fails.
+
+    Args:
+        path (str, optional): JSON file. Defaults to 'puuid_cache.json'.
+        ttl (int, optional): Seconds before an entry is looked up again. Defaults to 30 days.
+    """
+
+    def __init__(self, path='puuid_cache.json', ttl=30 * 24 * 3600):
+        self.path = path
+        self.ttl = ttl
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.entries = json.load(f)
+
+    @staticmethod
+    def key(nickname):
+        return nickname.strip().lower()
+
+    def get(self, nickname, allow_expired=False):
+        """Returns the cached puuid, None if missing (or expired unless allow_expired)."""
+        entry = self.entries.get(self.key(nickname))
+        if entry is None:
+            return None
+        if not allow_expired and time.time() - entry['resolved_at'] > self.ttl:
+            return None
+        return entry['puuid']
+
+    def set(self, nickname, puuid):
+        self.entries[self.key(nickname)] = {'puuid': puuid, 'resolved_at': time.time()}
+
+    def save(self):
+        """Writes the cache atomically."""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+
+
+def resolve_puuids(list_nicknames, region='europe', cache=None, max_workers=10, config=None):
+    """Resolves many 'gameName#tagLine' Riot IDs to puuids.
+
+    Fresh cache entries are returned without any call, the others are looked up
+    concurrently (paced by the shared rate limiter). When a lookup fails the
+    expired cached puuid is returned instead of None.
+
+    Args:
+        list_nicknames (list): Nicknames in the format 'gameName#tagLine'.
+        region (str, optional): Routing value. Defaults to 'europe'.
+        cache (PuuidCache, optional): Defaults to a PuuidCache on 'puuid_cache.json'.
+        max_workers (int, optional): Lookups in flight. Defaults to 10.
+        config (Config, optional): Api key and base url to use. Defaults to the process configuration.
+
+    Returns:
+        list: puuids in the order of list_nicknames, None for the unresolved ones.
+    """
+    cache = cache if cache is not None else PuuidCache()
+    # roster entries are free text: a nickname that is not 'gameName#tagLine' resolves to None
+    valid = dict.fromkeys(nickname for nickname in list_nicknames
+                          if isinstance(nickname, str) and nickname.count('#') == 1)
+    for nickname in dict.fromkeys(list_nicknames):
+        if nickname not in valid:
+            print(f"Invalid Riot ID {nickname!r}, expected 'gameName#tagLine'")
+    to_resolve = [nickname for nickname in valid if cache.get(nickname) is None]
+
+    def lookup(nickname):
+        gameName, tagLine = nickname.split('#')
+        try:
+            return api_get_puuid(gameName=gameName, tagLine=tagLine, region=region, config=config)
+        except Exception as e:
+            print(f'Lookup failed for {nickname}: {e}')
+            return None
+
+    get_metrics().inc('puuid_cache_hits_total', len(valid) - len(to_resolve))
+    if to_resolve:
+        with get_metrics().stage('resolve_puuids'), ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for nickname, puuid in zip(to_resolve, executor.map(lookup, to_resolve)):
+                if puuid is not None:
+                    cache.set(nickname, puuid)
+                elif cache.get(nickname, allow_expired=True) is not None:
+                    print(f'Using the cached puuid of {nickname}')
+        cache.save()
+
+    return [cache.get(nickname, allow_expired=True) if nickname in valid else None for nickname in list_nicknames]
@@ -0,0 +1,200 @@
+### Imports
+import bisect
+import math
+import threading
+import time
+
+# Limits of a development key, used until the first answer tells us the real ones
+DEFAULT_APP_LIMITS = '20:1,100:120'
+
+
+def parse_rate_limit_header(value):
+    """Parses a Riot rate limit header such as '20:1,100:120'.
+
+    Args:
+        value (str): Header value, 'count:seconds' pairs separated by commas.
+
+    Returns:
+        list: List of (count, seconds) tuples.
+    """
+    limits = []
+    if not value:
+        return limits
+    for pair in value.split(','):
+        count, seconds = pair.strip().split(':')
+        limits.append((int(count), int(seconds)))
+    return limits
+
+
+class RateLimitBucket:
+
+    """Sliding window of request timestamps for one 'count:seconds' limit.
+
+    A slot is only handed out if no window of `seconds` would ever contain more
+    than `capacity` requests, reservations made for the future included.
+    """
+
+    def __init__(self, limit, seconds, headroom=0.95, margin=0.1):
+        self.limit = limit
+        self.seconds = seconds
+        self.margin = margin
+        self.capacity = max(1, int(math.floor(limit * headroom)))
+        self.timestamps = []
+
+    def prune(self, now):
+        cutoff = now - self.seconds
+        index = bisect.bisect_right(self.timestamps, cutoff)
+        if index:
+            del self.timestamps[:index]
+
+    def earliest(self, now):
+        """Earliest time at which one more request fits in every window."""
+        if len(self.timestamps) < self.capacity:
+            return now
+        return max(now, self.timestamps[-self.capacity] + self.seconds + self.margin)
+
+    def record(self, timestamp):
+        bisect.insort(self.timestamps, timestamp)
+
+    def count(self, now):
+        """Requests counted in the window ending now."""
+        return bisect.bisect_right(self.timestamps, now) - bisect.bisect_right(self.timestamps, now - self.seconds)
+
+    def sync(self, server_count, now):
+        """Pads the window when the server counted more requests than we did (other clients, restarts)."""
+        missing = server_count - self.count(now)
+        for _ in range(missing):
+            self.record(now)
+
+
+class RateLimiter:
+
+    """Paces Riot API calls below the application and method rate limits.
+
+    One instance is shared by every call of the process: each routing region
+    ('europe', 'euw1', ...) has its own application buckets and each
+    (region, method) pair its own method buckets. Limits are learnt from the
+    X-App-Rate-Limit / X-Method-Rate-Limit headers and the windows are resynced
+    from the matching -Count headers.
+
+    Args:
+        app_limits (str, optional): Application limits assumed before the first answer.
+        headroom (float, optional): Fraction of each limit actually used. Defaults to 0.95.
+        margin (float, optional): Seconds added to each window to absorb the network
+            jitter between our clock and Riot's window boundaries. Defaults to 0.1.
+    """
+
+    def __init__(self, app_limits=DEFAULT_APP_LIMITS, headroom=0.95, margin=0.1):
+        self.default_app_limits = parse_rate_limit_header(app_limits)
+        self.headroom = headroom
+        self.margin = margin
+        self.app_buckets = {}
+        self.method_buckets = {}
+        self.blocked_until = {}
+        self.lock = threading.Lock()
+
+    def _buckets(self, region, method):
+        if region not in self.app_buckets:
+            self.app_buckets[region] = [RateLimitBucket(limit, seconds, self.headroom, self.margin)
+                                        for limit, seconds in self.default_app_limits]
+        return self.app_buckets[region] + self.method_buckets.get((region, method), [])
+
+    def reserve(self, region, method):
+        """Books the next free slot for a request.
+
+        Args:
+            region (str): Routing value of the call.
+            method (str): Riot API method name, e.g. 'match-v5.getMatch'.
+
+        Returns:
+            float: Seconds to wait before sending the request.
+        """
+        with self.lock:
+            now = time.monotonic()
+            buckets = self._buckets(region, method)
+            start = max([now,
+                         self.blocked_until.get(region, 0),
+                         self.blocked_until.get((region, method), 0)])
+            for bucket in buckets:
+                bucket.prune(now)
+                start = max(start, bucket.earliest(now))
+            for bucket in buckets:
+                bucket.record(start)
+            return start - now
+
+    def acquire(self, region, method):
+        """Blocks until a request can be sent without exceeding any limit.
+
+        Returns:
+            float: Seconds slept.
+        """
+        wait = self.reserve(region, method)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def _update_buckets(self, buckets, limits_header, counts_header, now):
+        limits = parse_rate_limit_header(limits_header)
+        if not limits:
+            return buckets
+        by_window = {bucket.seconds: bucket for bucket in buckets}
+        updated = []
+        for limit, seconds in limits:
+            bucket = by_window.get(seconds)
+            if bucket is None:
+                bucket = RateLimitBucket(limit, seconds, self.headroom, self.margin)
+            elif bucket.limit != limit:
+                bucket.limit = limit
+                bucket.capacity = max(1, int(math.floor(limit * self.headroom)))
+            updated.append(bucket)
+        counts = dict((seconds, count) for count, seconds in parse_rate_limit_header(counts_header))
+        for bucket in updated:
+            if bucket.seconds in counts:
+                bucket.sync(counts[bucket.seconds], now)
+        return updated
+
+    def update_from_headers(self, region, method, headers):
+        """Learns the limits and current counts from a Riot API answer.
+
+        Args:
+            region (str): Routing value of the call.
+            method (str): Riot API method name.
+            headers (Mapping): Response headers.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self._buckets(region, method)
+            self.app_buckets[region] = self._update_buckets(
+                self.app_buckets[region],
+                headers.get('X-App-Rate-Limit'), headers.get('X-App-Rate-Limit-Count'), now)
+            self.method_buckets[(region, method)] = self._update_buckets(
+                self.method_buckets.get((region, method), []),
+                headers.get('X-Method-Rate-Limit'), headers.get('X-Method-Rate-Limit-Count'), now)
+
+    def penalize(self, region, method, headers, default_retry_after=10):
+        """Blocks the limited scope after a 429.
+
+        Args:
+            region (str): Routing value of the call.
+            method (str): Riot API method name.
+            headers (Mapping): Headers of the 429 answer.
+            default_retry_after (int, optional): Seconds to wait without a Retry-After header. Defaults to 10.
+
+        Returns:
+            float: Seconds the scope is blocked for.
+        """
+        retry_after = float(headers.get('Retry-After', default_retry_after))
+        limit_type = headers.get('X-Rate-Limit-Type', 'application')
+        scope = region if limit_type == 'application' else (region, method)
+        with self.lock:
+            self.blocked_until[scope] = max(self.blocked_until.get(scope, 0), time.monotonic() + retry_after)
+        self.update_from_headers(region, method, headers)
+        return retry_after
+
+
+rate_limiter = RateLimiter()
+
+
+def get_rate_limiter():
+    """Returns the rate limiter shared by every Riot API call of the process."""
+    return rate_limiter
@@ -0,0 +1,227 @@
+"""Rebuilds the flattened match data from archived raw match jsons, on every core.
+
+Sources can be a directory of one-match files (.json, .json.gz, .json.zst, e.g.
+the match_cache/ directory), newline-delimited files (.ndjson/.jsonl, optionally
+.gz), or a .zip/.tar(.gz) archive of either.
+
+    $ python reparse.py match_cache --output parquet --workers 8
+"""
+### Imports
+import argparse
+import gzip
+import json
+import os
+import shutil
+import tarfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MATCH_SUFFIXES = ('.json', '.json.gz', '.json.zst')
+NDJSON_SUFFIXES = ('.ndjson', '.jsonl', '.ndjson.gz', '.jsonl.gz')
+
+
+def decompress(name, data):
+    """Decompresses raw bytes according to the file name."""
+    if name.endswith('.gz'):
+        return gzip.decompress(data)
+    if name.endswith('.zst'):
+        if zstandard is None:
+            raise ImportError('zstandard is required to read .zst files')
+        return zstandard.ZstdDecompressor().decompress(data)
+    return data
+
+
+def iter_ndjson(name, data=None):
+    """Yields the non-empty lines of an ndjson file, streamed from disk when data is None."""
+    if data is not None:
+        lines = decompress(name, data).splitlines()
+    elif name.endswith('.gz'):
+        lines = gzip.open(name, 'rb')
+    else:
+        lines = open(name, 'rb')
+    for line in lines:
+        if line.strip():
+            yield line
+    if data is None:
+        lines.close()
+
+
+def iter_payloads(source):
+    """Yields (name, bytes) for every file of a directory or archive."""
+    if os.path.isdir(source):
+        for dirpath, dirnames, filenames in os.walk(source):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                path = os.path.join(dirpath, filename)
+                yield path, None
+    elif zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            for info in archive.infolist():
+                if not info.is_dir():
+                    yield info.filename, archive.read(info)
+    elif tarfile.is_tarfile(source):
+        with tarfile.open(source) as archive:
+            for member in archive:
+                if member.isfile():
+                    yield member.name, archive.extractfile(member).read()
+    else:
+        yield source, None
+
+
+def iter_tasks(source, chunk_size):
+    """Groups the source into chunks of work for the pool.
+
+    Files on disk are sent as paths so workers read them in parallel, archive
+    members and ndjson lines are sent as raw bytes.
+
+    Yields:
+        list: Up to chunk_size ('path', path) or ('raw', name, bytes) items.
+    """
+    chunk = []
+    for name, data in iter_payloads(source):
+        if name.endswith(NDJSON_SUFFIXES):
+            items = (('raw', '.json', line) for line in iter_ndjson(name, data))
+        elif name.endswith(MATCH_SUFFIXES):
+            items = [('path', name)] if data is None else [('raw', name, data)]
+        else:
+            continue
+        for item in items:
+            chunk.append(item)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def parse_chunk(chunk):
+    """Worker: parses a chunk of raw match jsons into column buffers.
+
+    Returns:
+        tuple: (columns dict of lists, number of matches, bytes read, number of failures).
+    """
+    from match_parser import new_match_columns, append_match_json_reporting
+    columns = new_match_columns()
+    n_matches = n_bytes = n_failed = 0
+    for item in chunk:
+        try:
+            if item[0] == 'path':
+                with open(item[1], 'rb') as f:
+                    data = f.read()
+                name = item[1]
+            else:
+                name, data = item[1], item[2]
+            n_bytes += len(data)
+            append_match_json_reporting(columns, json.loads(decompress(name, data)))
+            n_matches += 1
+        except Exception as e:
+            print(f'Failed to parse {item[1]}: {e}')
+            n_failed += 1
+    return columns, n_matches, n_bytes, n_failed
+
+
+class BatchWriter:
+
+    """Writes each parsed batch as it arrives, so memory does not grow with the source.
+
+    A rebuild replaces its output: the CSV file is rewritten, and a non-empty
+    Parquet directory is refused unless overwrite is set (appending to it would
+    duplicate every row of the previous run).
+    """
+
+    def __init__(self, output, output_format, overwrite=False):
+        self.output = output
+        self.output_format = output_format
+        self.header = True
+        if output_format == 'parquet' and os.path.isdir(output) and os.listdir(output):
+            if not overwrite:
+                raise FileExistsError(f'{output} is not empty, pass overwrite=True (--overwrite) to replace it')
+            shutil.rmtree(output)
+
+    def write(self, columns):
+        if not columns['match_id']:
+            return
+        if self.output_format == 'parquet':
+            from parquet_store import write_parquet_dataset
+            write_parquet_dataset(columns, self.output)
+        else:
+            import pandas as pd
+            from match_parser import MATCH_COLUMNS, format_match_dataframe
+            df = format_match_dataframe(pd.DataFrame(columns, columns=MATCH_COLUMNS))
+            df.to_csv(self.output, mode='w' if self.header else 'a', header=self.header, index=False)
+            self.header = False
+
+
+def reparse(source, output='parquet', output_format='parquet', workers=None, chunk_size=500, report_every=5.0,
+            overwrite=False):
+    """Reparses every raw match json of a source across a process pool.
+
+    Args:
+        source (str): Directory, ndjson file or archive.
+        output (str, optional): Parquet dataset directory or CSV file. Defaults to 'parquet'.
+        output_format (str, optional): 'parquet' or 'csv'. Defaults to 'parquet'.
+        workers (int, optional): Processes. Defaults to every core.
+        chunk_size (int, optional): Matches per task. Defaults to 500.
+        report_every (float, optional): Seconds between progress lines. Defaults to 5.
+        overwrite (bool, optional): Replace a non-empty Parquet output directory. Defaults to False.
+
+    Returns:
+        dict: matches, failed, bytes and seconds.
+    """
+    workers = workers or os.cpu_count()
+    writer = BatchWriter(output, output_format, overwrite)
+    totals = {'matches': 0, 'failed': 0, 'bytes': 0}
+    t_start = last_report = time.time()
+
+    def report(final=False):
+        elapsed = max(time.time() - t_start, 1e-9)
+        print(f"{'Done' if final else 'Progress'}: {totals['matches']} matches ({totals['failed']} failed), "
+              f"{totals['matches'] / elapsed:.0f} matches/s, {totals['bytes'] / elapsed / 1e6:.1f} MB/s")
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        tasks = iter_tasks(source, chunk_size)
+        in_flight = set()
+        while True:
+            # keep every worker busy without reading the whole source ahead
+            for chunk in tasks:
+                in_flight.add(executor.submit(parse_chunk, chunk))
+                if len(in_flight) >= 2 * workers:
+                    break
+            if not in_flight:
+                break
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                columns, n_matches, n_bytes, n_failed = future.result()
+                writer.write(columns)
+                totals['matches'] += n_matches
+                totals['bytes'] += n_bytes
+                totals['failed'] += n_failed
+            if time.time() - last_report >= report_every:
+                report()
+                last_report = time.time()
+
+    report(final=True)
+    totals['seconds'] = time.time() - t_start
+    return totals
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Rebuilds the flattened match data from raw match jsons.')
+    arg_parser.add_argument('source', help='directory, ndjson file or archive of raw match jsons')
+    arg_parser.add_argument('--output', default='parquet', help='parquet dataset directory or csv file')
+    arg_parser.add_argument('--format', dest='output_format', choices=['parquet', 'csv'], default='parquet')
+    arg_parser.add_argument('--workers', type=int, default=None, help='processes, defaults to every core')
+    arg_parser.add_argument('--chunk-size', type=int, default=500, help='matches per task')
+    arg_parser.add_argument('--overwrite', action='store_true', help='replace a non-empty parquet output directory')
+    args = arg_parser.parse_args()
+    reparse(args.source, args.output, args.output_format, args.workers, args.chunk_size, overwrite=args.overwrite)
+
+
+if __name__ == '__main__':
+    main()
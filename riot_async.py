@@ -0,0 +1,284 @@
+### Imports
+import asyncio
+import json
+import time
+import pandas as pd
+import aiohttp
+from config import get_config
+from riot_client import riot_root_url, match_history_query
+from match_parser import MatchBatchBuilder, format_match_dataframe
+from rate_limiter import get_rate_limiter
+from metrics import get_metrics
+from match_store import history_bounds_for, filter_new_match_ids
+
+
+async def async_api_request(http, url, region, method, limiter=None, max_retries=5):
+    """Async counterpart of riot_client.api_request.
+
+    Waits for a slot of the shared rate limiter without blocking the event loop.
+
+    Args:
+        http (aiohttp.ClientSession): Pooled keep-alive client.
+        url (str): Full url, the api key is a header of the client session.
+        region (str): Routing value of the call.
+        method (str): Riot API method name, e.g. 'match-v5.getMatch'.
+        limiter (RateLimiter, optional): Defaults to the process-wide limiter.
+        max_retries (int, optional): How many 429 answers to retry. Defaults to 5.
+
+    Returns:
+        tuple: (status code, decoded json or None).
+    """
+    limiter = limiter or get_rate_limiter()
+    metrics = get_metrics()
+    for attempt in range(max_retries + 1):
+        wait = limiter.reserve(region, method)
+        if wait > 0:
+            metrics.inc('rate_limit_sleep_seconds_total', wait, method=method)
+            await asyncio.sleep(wait)
+        t1 = time.perf_counter()
+        async with http.get(url) as response:
+            body = await response.read()
+            metrics.observe('riot_request_seconds', time.perf_counter() - t1, method=method)
+            metrics.inc('riot_requests_total', method=method, status=response.status)
+            metrics.inc('riot_response_bytes_total', len(body), method=method)
+            if response.status == 429:
+                metrics.inc('riot_429_total', method=method, type=response.headers.get('X-Rate-Limit-Type', 'application'))
+                retry_after = limiter.penalize(region, method, response.headers)
+                print(f"Rate limit exceeded. Retrying after {retry_after} seconds...")
+                continue
+            limiter.update_from_headers(region, method, response.headers)
+            try:
+                payload = json.loads(body)
+            except ValueError:
+                payload = None
+            return response.status, payload
+    return response.status, None
+
+
+async def async_get_match_history_ids(http, puuid, region='europe', start=0, count=100, start_time=None,
+                                      end_time=None, queue=None, max_retries=3, config=None):
+    """Gets the match history ids for a given puuid.
+
+    A failed page is retried with a backoff: returning an empty page would end
+    the walk and silently cut off the rest of the player's history. config
+    gives the base url (the api key is a header of the client session).
+
+    Returns:
+        list: List of match ids.
+
+    Raises:
+        RuntimeError: The page still failed after max_retries retries.
+    """
+    query_params = match_history_query(start, count, start_time, end_time, queue)
+    url = riot_root_url(region, config) + f'/lol/match/v5/matches/by-puuid/{puuid}/ids' + query_params
+    for attempt in range(max_retries + 1):
+        if attempt:
+            await asyncio.sleep(2 ** attempt)
+        try:
+            status, payload = await async_api_request(http, url, region, 'match-v5.getMatchIdsByPUUID')
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            status, payload = None, None
+            print(f"Failed to fetch the history of {puuid}: {e!r}")
+        if status == 200 and isinstance(payload, list):
+            return payload
+        print(f"Unexpected status code: {status} for {puuid}, attempt {attempt + 1}/{max_retries + 1}")
+    raise RuntimeError(f'History page of {puuid} (start={start}) failed with status {status}')
+
+
+async def async_walk_match_history_ids(http, puuid, region='europe', start_time=None, end_time=None, queue=None,
+                                       max_matches=None, stop_at=None, page_size=100, config=None):
+    """Async counterpart of riot_client.iter_match_history_ids, collected into a list."""
+    list_matchIds = []
+    start = 0
+    while True:
+        count = page_size if max_matches is None else min(page_size, max_matches - len(list_matchIds))
+        if count <= 0:
+            return list_matchIds
+        page = await async_get_match_history_ids(http, puuid, region, start, count, start_time, end_time, queue,
+                                                 config=config)
+        for matchId in page:
+            if stop_at and matchId in stop_at:
+                return list_matchIds
+            list_matchIds.append(matchId)
+        if len(page) < count:
+            return list_matchIds
+        start += count
+
+
+async def async_iter_match_jsons(http, list_matchIds, region='europe', concurrency=20,
+                                 endpoint='/lol/match/v5/matches/{matchId}', method='match-v5.getMatch', config=None):
+    """Yields match jsons as they arrive, with at most `concurrency` requests in flight.
+
+    Args:
+        http (aiohttp.ClientSession): Pooled keep-alive client.
+        list_matchIds (list): Match ids to fetch.
+        region (str, optional): Routing value. Defaults to 'europe'.
+        concurrency (int, optional): Maximum requests in flight. Defaults to 20.
+        endpoint (str, optional): Path template, e.g. '/lol/match/v5/matches/{matchId}/timeline'.
+        method (str, optional): Riot API method name of the endpoint. Defaults to 'match-v5.getMatch'.
+        config (Config, optional): Base url to use. Defaults to the process configuration.
+
+    Yields:
+        dict: Match JSON.
+    """
+    queue = asyncio.Queue()
+    for matchId in list_matchIds:
+        queue.put_nowait(matchId)
+    results = asyncio.Queue()
+
+    async def worker():
+        while True:
+            try:
+                matchId = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            url = riot_root_url(region, config) + endpoint.format(matchId=matchId)
+            status, payload = None, None
+            try:
+                status, payload = await async_api_request(http, url, region, method)
+            except Exception as e:
+                # aiohttp errors, the ClientTimeout's asyncio.TimeoutError, an undecodable answer...
+                print(f"Failed to fetch {matchId}: {e!r}")
+            if status != 200 or not isinstance(payload, dict) or 'metadata' not in payload:
+                if status is not None:
+                    print('Answer :', matchId, status, payload)
+                payload = None
+            # every id gets a result, the consumer waits for exactly one per id
+            results.put_nowait((matchId, payload))
+
+    workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, len(list_matchIds)))]
+    try:
+        for _ in range(len(list_matchIds)):
+            matchId, match_json = await results.get()
+            if match_json is not None:
+                yield match_json
+    finally:
+        for task in workers:
+            task.cancel()
+
+
+def new_client_session(concurrency=20, config=None):
+    """Creates the pooled keep-alive HTTP client shared by a whole run, sending the api key of config."""
+    connector = aiohttp.TCPConnector(limit=concurrency, keepalive_timeout=60)
+    return aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=60),
+                                 headers={'X-Riot-Token': (config or get_config()).riot_api_key})
+
+
+async def async_fetch_timelines(http, list_matchIds, store, region='europe', concurrency=20, config=None):
+    """Fetches the timelines not stored yet and stores their extracted arrays (see timeline.py).
+
+    Returns:
+        int: Number of timelines stored.
+    """
+    from timeline import extract_timeline_arrays
+    n_stored = 0
+    async for timeline_json in async_iter_match_jsons(http, store.missing(list_matchIds), region, concurrency,
+                                                      '/lol/match/v5/matches/{matchId}/timeline', 'match-v5.getTimeline',
+                                                      config):
+        store.put(timeline_json['metadata']['matchId'], extract_timeline_arrays(timeline_json))
+        n_stored += 1
+    print('Nombre de timelines:', n_stored)
+    return n_stored
+
+
+async def async_match_history_puuid(list_puuid, region='europe', concurrency=20, http=None, store=None, cache=None,
+                                    queue=None, start_time=None, end_time=None, max_matches=100, timelines=None,
+                                    config=None):
+    """Fetches and parses the match history of several players on one event loop.
+
+    Match jsons are parsed as soon as they arrive, so parsing overlaps with the
+    requests still in flight.
+
+    Args:
+        list_puuid (list): Players' puuids.
+        region (str, optional): Routing value. Defaults to 'europe'.
+        concurrency (int, optional): Maximum match requests in flight. Defaults to 20.
+        http (aiohttp.ClientSession, optional): Client to reuse across calls. Defaults to None.
+        store (SupabaseMatchStore, optional): Incremental mode, skips the stored matches. Defaults to None.
+        cache (MatchCache, optional): On-disk cache of raw match jsons checked before any download. Defaults to None.
+        queue, start_time, end_time, max_matches: History filters, see riot_client.iter_match_history_ids.
+        timelines (TimelineStore, optional): Also fetches the timelines of the matches into this store. Defaults to None.
+        config (Config, optional): Api key and base url to use. Defaults to the process configuration.
+
+    Returns:
+        DataFrame: Same schema as riot_functions.api_get_match_history_puuid.
+    """
+    own_session = http is None
+    if own_session:
+        http = new_client_session(concurrency, config)
+    try:
+        metrics = get_metrics()
+        with metrics.stage('match_ids'):
+            bounds = [history_bounds_for(store, puuid, start_time) for puuid in list_puuid]
+            list_ids = await asyncio.gather(*[async_walk_match_history_ids(http, puuid, region, player_start_time, end_time,
+                                                                           queue, max_matches, stop_at,
+                                                                           config=config)
+                                              for puuid, (player_start_time, stop_at) in zip(list_puuid, bounds)],
+                                            return_exceptions=True)
+        # a player whose walk failed is left out of the run rather than ingested with a truncated history
+        for puuid, matchIds in zip(list_puuid, list_ids):
+            if isinstance(matchIds, Exception):
+                print(f'Skipping {puuid}: {matchIds}')
+        list_matchIds = [matchId for matchIds in list_ids if not isinstance(matchIds, Exception) for matchId in matchIds]
+        print('Nombre de matchs avec doublons:', len(list_matchIds))
+        list_matchIds = list(dict.fromkeys(list_matchIds))
+        print('Nombre de matchs sans doublons:', len(list_matchIds))
+        with metrics.stage('store_lookup'):
+            list_matchIds = filter_new_match_ids(store, list_matchIds)
+        if not list_matchIds:
+            print('No matches')
+            return pd.DataFrame()
+
+        t_fetch = metrics.start_stage('fetch_matches')
+        builder = MatchBatchBuilder()
+        list_matchIds_to_fetch = list_matchIds
+        if cache is not None:
+            cached_jsons, list_matchIds_to_fetch = cache.split(list_matchIds)
+            builder.extend(cached_jsons)
+            print('Nombre de matchs en cache:', len(cached_jsons))
+        async for match_json in async_iter_match_jsons(http, list_matchIds_to_fetch, region, concurrency,
+                                                       config=config):
+            builder.add(match_json)
+            if cache is not None:
+                cache.put(match_json['metadata']['matchId'], match_json)
+        metrics.end_stage('fetch_matches', t_fetch)
+        metrics.inc('rows_total', len(builder), stage='fetch_matches')
+        if cache is not None:
+            cache.evict()
+        if timelines is not None:
+            with metrics.stage('fetch_timelines'):
+                await async_fetch_timelines(http, list_matchIds, timelines, region, concurrency, config)
+        return format_match_dataframe(builder.to_dataframe())
+    finally:
+        if own_session:
+            await http.close()
+
+
+async def async_match_history_teams(teams, region='europe', concurrency=20, config=None):
+    """Fetches several teams in one process, sharing the client and the rate limiter.
+
+    Args:
+        teams (dict): Team name -> list of puuids.
+        region (str, optional): Routing value. Defaults to 'europe'.
+        concurrency (int, optional): Maximum match requests in flight. Defaults to 20.
+        config (Config, optional): Api key and base url to use. Defaults to the process configuration.
+
+    Returns:
+        dict: Team name -> DataFrame.
+    """
+    async with new_client_session(concurrency, config) as http:
+        list_df = await asyncio.gather(*[async_match_history_puuid(list_puuid, region, concurrency, http, config=config)
+                                         for list_puuid in teams.values()])
+    return dict(zip(teams.keys(), list_df))
+
+
+def run_match_history_puuid(list_puuid, region='europe', concurrency=20, store=None, cache=None, config=None,
+                            **filters):
+    """Synchronous entry point for async_match_history_puuid."""
+    return asyncio.run(async_match_history_puuid(list_puuid, region, concurrency, store=store, cache=cache,
+                                                 config=config, **filters))
+
+
+def run_match_history_teams(teams, region='europe', concurrency=20, config=None):
+    """Synchronous entry point for async_match_history_teams."""
+    return asyncio.run(async_match_history_teams(teams, region, concurrency, config))
@@ -0,0 +1,228 @@
+### Imports
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from config import get_config
+from rate_limiter import get_rate_limiter
+from metrics import get_metrics
+from match_store import history_bounds_for
+
+
+def riot_root_url(region, config=None):
+    """Returns the root url of the Riot API for a routing region (without trailing slash)."""
+    config = config or get_config()
+    if config.riot_base_url:
+        return config.riot_base_url.rstrip('/')
+    return f'https://{region}.api.riotgames.com'
+
+def api_request(url, region, method, session=None, limiter=None, max_retries=5, config=None):
+    """Sends a GET to the Riot API paced by the shared rate limiter.
+
+    The limiter learns the app and method limits from the answer headers. A 429
+    blocks the limited scope for Retry-After seconds and the request is retried.
+    The api key is sent in the X-Riot-Token header.
+
+    Args:
+        url (str): Full url.
+        region (str): Routing value of the call, each one has its own limits.
+        method (str): Riot API method name, e.g. 'match-v5.getMatch'.
+        session (requests.Session, optional): Session to reuse connections. Defaults to None.
+        limiter (RateLimiter, optional): Defaults to the process-wide limiter.
+        max_retries (int, optional): How many 429 answers to retry. Defaults to 5.
+        config (Config, optional): Api key to use. Defaults to the process configuration.
+
+    Returns:
+        Response: Last response received.
+    """
+    headers = {'X-Riot-Token': (config or get_config()).riot_api_key}
+    limiter = limiter or get_rate_limiter()
+    metrics = get_metrics()
+    http = session or requests
+    for attempt in range(max_retries + 1):
+        slept = limiter.acquire(region, method)
+        if slept:
+            metrics.inc('rate_limit_sleep_seconds_total', slept, method=method)
+        t1 = time.perf_counter()
+        response = http.get(url, headers=headers)
+        metrics.observe('riot_request_seconds', time.perf_counter() - t1, method=method)
+        metrics.inc('riot_requests_total', method=method, status=response.status_code)
+        metrics.inc('riot_response_bytes_total', len(response.content), method=method)
+        if response.status_code == 429:
+            metrics.inc('riot_429_total', method=method, type=response.headers.get('X-Rate-Limit-Type', 'application'))
+            retry_after = limiter.penalize(region, method, response.headers)
+            print(f"Rate limit exceeded. Retrying after {retry_after} seconds...")
+            continue
+        limiter.update_from_headers(region, method, response.headers)
+        return response
+    return response
+
+def api_get_puuid(summonerId=None, gameName=None, tagLine=None, region='europe', config=None):
+    """Gets the puuid from a summonerId or riot_id and riot_tag
+
+    Args:
+        summonerId (str, optional): Summoner ID. Defaults to None.
+        gameName (str, optional): Riot ID. Defaults to None.
+        tagLine (str, optional): Riot Tag. Defaults to None.
+        region (str, optional): Region. Defaults to 'americas'.
+        config (Config, optional): Api key and base url to use. Defaults to the process configuration.
+
+    Returns:
+        str: puuid
+    """
+    print('Retrieving for:',gameName)
+
+    root_url = riot_root_url(region, config)
+    endpoint = f'/riot/account/v1/accounts/by-riot-id/{gameName}/{tagLine}'
+
+    response = api_request(root_url+endpoint, region, 'account-v1.getByRiotId', config=config)
+    try:               
+        return response.json()['puuid']
+    except KeyError as e:
+        print('Puuid not retrieved, nickname must have changed')
+        return None
+ 
+def match_history_query(start=0, count=100, start_time=None, end_time=None, queue=None):
+    """Builds the query string of the match ids endpoint."""
+    query_params = f'?&start={start}&count={count}'
+    if start_time is not None:
+        query_params += f'&startTime={start_time}'
+    if end_time is not None:
+        query_params += f'&endTime={end_time}'
+    if queue is not None:
+        query_params += f'&queue={queue}'
+    return query_params
+
+def api_get_match_history_ids(puuid=None, region='europe', start=0, count=100, start_time=None, end_time=None, queue=None,
+                              max_retries=3, config=None):
+
+    """Gets the match history ids for a given puuid.
+
+    A failed page is retried with a backoff, then raises: returning an empty
+    page would end the walk and silently cut off the rest of the player's
+    history (same rule as riot_async.async_get_match_history_ids).
+
+    Args:
+        puuid (str, optional): Player's puuid. Defaults to None.
+        region (str, optional): Player's region. Defaults to 'americas'.
+        start (int, optional): Match # start (for pagination). Defaults to 0.
+        count (int, optional): How many matches per page. Defaults to 100.
+        start_time (int, optional): Epoch seconds, only matches played after it. Defaults to None.
+        end_time (int, optional): Epoch seconds, only matches played before it. Defaults to None.
+        queue (int, optional): Queue id filter, e.g. 420 for ranked solo. Defaults to None.
+        max_retries (int, optional): Retries of a failed page. Defaults to 3.
+        config (Config, optional): Api key and base url to use. Defaults to the process configuration.
+
+    Returns:
+        list: List of match ids.
+
+    Raises:
+        RuntimeError: The page still failed after max_retries retries.
+    """
+    root_url = riot_root_url(region, config)
+    endpoint = f'/lol/match/v5/matches/by-puuid/{puuid}/ids'
+    query_params = match_history_query(start, count, start_time, end_time, queue)
+
+    status = None
+    for attempt in range(max_retries + 1):
+        if attempt:
+            time.sleep(2 ** attempt)
+        try:
+            response = api_request(root_url+endpoint+query_params, region, 'match-v5.getMatchIdsByPUUID', config=config)
+            status = response.status_code
+            payload = response.json() if status == 200 else None
+        except (requests.RequestException, ValueError) as e:
+            status, payload = None, None
+            print(f"Failed to fetch the history of {puuid}: {e!r}")
+        if isinstance(payload, list):  # Request successful
+            return payload
+        print(f"Unexpected status code: {status} for {puuid}, attempt {attempt + 1}/{max_retries + 1}")
+    raise RuntimeError(f'History page of {puuid} (start={start}) failed with status {status}')
+
+def iter_match_history_ids(puuid, region='europe', start_time=None, end_time=None, queue=None,
+                           max_matches=None, stop_at=None, page_size=100, config=None):
+    """Walks a player's match history page by page, newest match first.
+
+    Pages are only requested while they are needed, so stopping early (max_matches
+    reached, or an already ingested match met) saves the remaining calls.
+
+    Args:
+        puuid (str): Player's puuid.
+        region (str, optional): Routing value. Defaults to 'europe'.
+        start_time (int, optional): Epoch seconds, only matches played after it. Defaults to None.
+        end_time (int, optional): Epoch seconds, only matches played before it. Defaults to None.
+        queue (int, optional): Queue id filter, e.g. 420 for ranked solo. Defaults to None.
+        max_matches (int, optional): Stop after this many ids. Defaults to None (whole history).
+        stop_at (set, optional): Stop when one of these ids is reached (it is not yielded). Defaults to None.
+        page_size (int, optional): Ids per call, 100 at most. Defaults to 100.
+        config (Config, optional): Api key and base url to use. Defaults to the process configuration.
+
+    Yields:
+        str: Match id.
+    """
+    start = 0
+    n_yielded = 0
+    while True:
+        count = page_size if max_matches is None else min(page_size, max_matches - n_yielded)
+        if count <= 0:
+            return
+        page = api_get_match_history_ids(puuid=puuid, region=region, start=start, count=count,
+                                         start_time=start_time, end_time=end_time, queue=queue, config=config)
+        if not page:
+            return
+        for matchId in page:
+            if stop_at and matchId in stop_at:
+                return
+            yield matchId
+            n_yielded += 1
+        if len(page) < count:
+            return
+        start += count
+
+def get_match_history_ids_many(list_puuid, region='europe', store=None, max_workers=10, start_time=None, config=None,
+                               **filters):
+    """Walks the match history of many players concurrently.
+
+    A player whose walk failed is left out of the result rather than ingested
+    with a truncated history, like in riot_async.async_match_history_puuid.
+
+    Args:
+        list_puuid (list): Players' puuids.
+        region (str, optional): Routing value. Defaults to 'europe'.
+        store (SupabaseMatchStore, optional): Stops each walk at the player's latest stored game. Defaults to None.
+        max_workers (int, optional): Players walked in parallel. Defaults to 10.
+        start_time (int, optional): Epoch seconds, only matches played after it. Defaults to None.
+        config (Config, optional): Api key and base url to use. Defaults to the process configuration.
+        **filters: end_time, queue, max_matches, page_size of iter_match_history_ids.
+
+    Returns:
+        dict: puuid -> list of match ids, for the players walked successfully.
+    """
+    def walk(puuid):
+        player_start_time, stop_at = history_bounds_for(store, puuid, start_time)
+        return list(iter_match_history_ids(puuid, region, start_time=player_start_time, stop_at=stop_at, config=config,
+                                           **filters))
+
+    history_ids = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [(puuid, executor.submit(walk, puuid)) for puuid in list_puuid]
+        for puuid, future in futures:
+            try:
+                history_ids[puuid] = future.result()
+            except Exception as e:
+                print(f'Skipping {puuid}: {e}')
+    return history_ids
+
+def new_riot_session(pool_maxsize=15, retries=5):
+    """Session with retries on network errors, 429s are paced by the shared rate limiter."""
+    session = requests.Session()
+    retry = Retry(
+        total=retries,
+        read=retries,
+        connect=retries,
+    )
+    adapter = HTTPAdapter(max_retries=retry, pool_maxsize=pool_maxsize)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
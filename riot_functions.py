@@ -1,299 +1,44 @@
-### Imports 
-from multiprocessing import freeze_support
-import requests
-import pandas as pd
-from concurrent.futures import as_completed, ProcessPoolExecutor
-from requests_futures.sessions import FuturesSession
-from requests.adapters import HTTPAdapter
+"""Match history ingestion: walks the players' histories and builds the match DataFrame.
+
+The Riot API client lives in riot_client.py, the match json parser in
+match_parser.py and the DB writer in db_writer.py; their names stay importable
+from here and are only loaded on first use. Importing this module reads no
+configuration: config.ini is read by the first call that needs it (see config.py).
+"""
+### Imports
+import importlib
 import time
-from urllib3.util.retry import Retry
-from datetime import datetime
-import concurrent.futures
-from multiprocessing import freeze_support
-import json
-import traceback
-from supabase import create_client, Client
-from configparser import ConfigParser
-parser = ConfigParser()
-parser.read('config.ini')
-
-# from supabase import create_client
-url = str(parser.get('supabase', 'SUPABASE_URL'))
-key= str(parser.get('supabase', 'SUPABASE_KEY'))
-api_key = str(parser.get('riot_api', 'api_key'))
-api_key = "api_key="+api_key
-# supabase = create_client(url, key)
-
-
-
-
-def api_get_puuid(summonerId=None, gameName=None, tagLine=None, region='europe'):
-    """Gets the puuid from a summonerId or riot_id and riot_tag
-
-    Args:
-        summonerId (str, optional): Summoner ID. Defaults to None.
-        gameName (str, optional): Riot ID. Defaults to None.
-        tagLine (str, optional): Riot Tag. Defaults to None.
-        region (str, optional): Region. Defaults to 'americas'.
-
-    Returns:
-        str: puuid
-    """
-    print('Retrieving for:',gameName)
-
-    root_url = f'https://{region}.api.riotgames.com/'
-    endpoint = f'riot/account/v1/accounts/by-riot-id/{gameName}/{tagLine}'
-
-    response = requests.get(root_url+endpoint+'?'+api_key)
-    if response.status_code == 429:
-        print("Sleeping...")
-        time.sleep(121)
-        response = requests.get(root_url+endpoint+'?'+api_key)   
-    try:               
-        return response.json()['puuid']
-    except KeyError as e:
-        print('Puuid not retrieved, nickname must have changed')
-        return None
- 
-def api_get_match_history_ids(puuid=None, region='europe', start=0, count=100):
-
-    """Gets the match history ids for a given puuid.
-
-    Args:
-        puuid (str, optional): Player's puuid. Defaults to None.
-        region (str, optional): Player's region. Defaults to 'americas'.
-        start (int, optional): Match # start (for pagination). Defaults to 0.
-        count (int, optional): How many matches per page. Defaults to 100.
-
-    Returns:
-        list: List of match ids.
-    """
-
-    try:
-        root_url = f'https://{region}.api.riotgames.com'
-        endpoint = f'/lol/match/v5/matches/by-puuid/{puuid}/ids'
-        query_params = f'?&start={start}&count={count}'
-
-        
-        while True:
-            response = requests.get(root_url+endpoint+query_params+'&'+api_key)
-            if response.status_code == 429:  # Rate limit exceeded
-                retry_after = int(response.headers.get('Retry-After', 10))  # Default to 10 seconds
-                print(f"Rate limit exceeded. Retrying after {retry_after} seconds...")
-                time.sleep(retry_after)
-            elif response.status_code == 200:  # Request successful
-                return response.json()
-            else:
-                print(f"Unexpected status code: {response.status_code}. Retrying...")
-                time.sleep(5)  # Wait for 5 seconds before retrying
-    except Exception as e:
-        print(f"An error occurred: {e}")
-        return False
-    
-def process_match_json_reporting(match_json):
-
-    """Processes the match json into a dataframe.
-
-    Args:
-        match_json (dict): Match JSON.
-        puuid (str): Player's puuid.
-
-    Returns:
-        dataframe: Dataframe of the processed match data.
-    """
-    side_dict = {
-        100:'blue',
-        200:'red'
-    }
-    info = match_json['info']
-    metadata = match_json['metadata']
-    matchId = metadata['matchId']
-    participants = metadata['participants']
-    
-    matchDFs = pd.DataFrame()
-    
-    for player_puuid in participants:
-             
-        player = info['participants'][participants.index(player_puuid)]
-
-        #get opponent champion 
-        for other_player in info['participants']:
-            if other_player['teamPosition'] == player['teamPosition'] and other_player['championName'] != player['championName']:
-                opp_champion = other_player['championName']
-            else:
-                opp_champion = None 
-
-        gameCreation = info['gameCreation']
-        gameStartTimestamp = info['gameStartTimestamp']
-        gameEndTimestamp = info['gameEndTimestamp']
-        timePlayed = gameEndTimestamp-gameStartTimestamp
-        gameMode = info['gameMode']
-        gameVersion = info['gameVersion']
-        platformId = info['platformId']
-        queueId = info['queueId']
-        puuid = player['puuid']
-        riotIdGameName = player['summonerName']
-        try:
-            riotIdTagLine = player['riotIdTagline']
-        except:
-            riotIdTagLine = ''
-        side = side_dict[player['teamId']]
-        win = player['win']
-
-        champion = player['championName']
-        kills = player['kills']
-        deaths = player['deaths']
-        assists = player['assists']
-        summOne = player['summoner1Id']
-        summTwo = player['summoner2Id']
-        earlySurrender = player['gameEndedInEarlySurrender']
-        surrender = player['gameEndedInSurrender']
-        firstBlood = player['firstBloodKill']
-        firstBloodAssist = player['firstBloodAssist']
-        firstTower = player['firstTowerKill']
-        firstTowerAssist = player['firstTowerAssist']
-        dragonKills = player['dragonKills']
-
-        damageDealtToBuildings = player['damageDealtToBuildings']
-        damageDealtToObjectives = player['damageDealtToObjectives']
-        damageSelfMitigated = player['damageSelfMitigated']
-        goldEarned = player['goldEarned']
-        teamPosition = player['teamPosition']
-        lane = player['lane']
-        largestKillingSpree = player['largestKillingSpree']
-        longestTimeSpentLiving = player['longestTimeSpentLiving']
-        objectivesStolen = player['objectivesStolen']
-        totalMinionsKilled = player['totalMinionsKilled']
-        totalAllyJungleMinionsKilled = player['totalAllyJungleMinionsKilled']
-        totalEnemyJungleMinionsKilled = player['totalEnemyJungleMinionsKilled']
-        totalNeutralMinionsKilled = totalAllyJungleMinionsKilled + totalEnemyJungleMinionsKilled
-        totalDamageDealtToChampions = player['totalDamageDealtToChampions']
-        totalDamageShieldedOnTeammates = player['totalDamageShieldedOnTeammates']
-        totalHealsOnTeammates = player['totalHealsOnTeammates']
-        totalDamageTaken = player['totalDamageTaken']
-        totalTimeCCDealt = player['totalTimeCCDealt']
-        totalTimeSpentDead = player['totalTimeSpentDead']
-        turretKills = player['turretKills']
-        turretsLost = player['turretsLost']
-        visionScore = player['visionScore']
-        controlWardsPlaced = player['detectorWardsPlaced']
-        wardsKilled = player['wardsKilled']
-        wardsPlaced = player['wardsPlaced']
-
-        item0 = player['item0']
-        item1 = player['item1']
-        item2 = player['item2']
-        item3 = player['item3']
-        item4 = player['item4']
-        item5 = player['item5']
-        item6 = player['item6']
-        try:
-            perks = player['perks']
-
-            perkKeystone = perks['styles'][0]['selections'][0]['perk']
-            perkPrimaryRow1 = perks['styles'][0]['selections'][1]['perk']
-            perkPrimaryRow2 = perks['styles'][0]['selections'][2]['perk']
-            perkPrimaryRow3 = perks['styles'][0]['selections'][3]['perk']
-            perkPrimaryStyle = perks['styles'][0]['style']
-            perkSecondaryRow1 = perks['styles'][1]['selections'][0]['perk']
-            perkSecondaryRow2 = perks['styles'][1]['selections'][1]['perk']
-            perkSecondaryStyle = perks['styles'][1]['style']
-            perkShardDefense = perks['statPerks']['defense']
-            perkShardFlex = perks['statPerks']['flex']
-            perkShardOffense = perks['statPerks']['offense']
-        except:
-            perkKeystone = ''
-            perkPrimaryRow1 = ''
-            perkPrimaryRow2 = ''
-            perkPrimaryRow3 = ''
-            perkPrimaryStyle = ''
-            perkSecondaryRow1 = ''
-            perkSecondaryRow2 = ''
-            perkSecondaryStyle = ''
-            perkShardDefense = ''
-            perkShardFlex = ''
-            perkShardOffense = ''
-
-
-        matchDF = pd.DataFrame({
-            'match_id': [matchId],
-            'participants': [participants],
-            'game_creation': [gameCreation],
-            'game_start_timestamp': [gameStartTimestamp],
-            'game_end_timestamp': [gameEndTimestamp],
-            'game_version': [gameVersion],
-            'queue_id': [queueId],
-            'game_mode': [gameMode],
-            'platform_id': [platformId],
-            'puuid': [puuid],
-            'riot_id': [riotIdGameName],
-            'riot_tag': [riotIdTagLine],
-            'time_played': [timePlayed],
-            'side': [side],
-            'win': [win],
-            'team_position': [teamPosition],
-            'lane': [lane],
-            'champion': [champion],
-            'kills': [kills],
-            'deaths': [deaths],
-            'assists': [assists],
-            'summoner1_id': [summOne],
-            'summoner2_id': [summTwo],
-            'gold_earned': [goldEarned],
-            'total_minions_killed': [totalMinionsKilled],
-            'total_neutral_minions_killed': [totalNeutralMinionsKilled],
-            'total_ally_jungle_minions_killed': [totalAllyJungleMinionsKilled],
-            'total_enemy_jungle_minions_killed': [totalEnemyJungleMinionsKilled],
-            'early_surrender': [earlySurrender],
-            'surrender': [surrender],
-            'first_blood': [firstBlood],
-            'first_blood_assist': [firstBloodAssist],
-            'first_tower': [firstTower],
-            'first_tower_assist': [firstTowerAssist],
-            'damage_dealt_to_buildings': [damageDealtToBuildings],
-            'turret_kills': [turretKills],
-            'turrets_lost': [turretsLost],
-            'damage_dealt_to_objectives': [damageDealtToObjectives],
-            'dragonKills': [dragonKills],
-            'objectives_stolen': [objectivesStolen],
-            'longest_time_spent_living': [longestTimeSpentLiving],
-            'largest_killing_spree': [largestKillingSpree],
-            'total_damage_dealt_champions': [totalDamageDealtToChampions],
-            'total_damage_taken': [totalDamageTaken],
-            'total_damage_self_mitigated': [damageSelfMitigated],
-            'total_damage_shielded_teammates': [totalDamageShieldedOnTeammates],
-            'total_heals_teammates': [totalHealsOnTeammates],
-            'total_time_crowd_controlled': [totalTimeCCDealt],
-            'total_time_spent_dead': [totalTimeSpentDead],
-            'vision_score': [visionScore],
-            'wards_killed': [wardsKilled],
-            'wards_placed': [wardsPlaced],
-            'control_wards_placed': [controlWardsPlaced],
-            'item0': [item0],
-            'item1': [item1],
-            'item2': [item2],
-            'item3': [item3],
-            'item4': [item4],
-            'item5': [item5],
-            'item6': [item6],
-            'perk_keystone': [perkKeystone],
-            'perk_primary_row_1': [perkPrimaryRow1],
-            'perk_primary_row_2': [perkPrimaryRow2],
-            'perk_primary_row_3': [perkPrimaryRow3],
-            'perk_secondary_row_1': [perkSecondaryRow1],
-            'perk_secondary_row_2': [perkSecondaryRow2],
-            'perk_primary_style': [perkPrimaryStyle],
-            'perk_secondary_style': [perkSecondaryStyle],
-            'perk_shard_defense': [perkShardDefense],
-            'perk_shard_flex': [perkShardFlex],
-            'perk_shard_offense': [perkShardOffense],
-            'opp_champion': [opp_champion],
-
-        })
-        matchDFs = pd.concat([matchDFs,matchDF]) 
-    return matchDFs
-
-def api_get_match_history_puuid(list_puuid, region='europe', debug=False, reporting_focus = False):
+from concurrent.futures import as_completed, ThreadPoolExecutor
+
+# Names that moved out of this module -> module now defining them
+MOVED = {name: 'riot_client' for name in ['riot_root_url', 'api_request', 'api_get_puuid', 'match_history_query',
+                                           'api_get_match_history_ids', 'iter_match_history_ids',
+                                           'get_match_history_ids_many', 'new_riot_session']}
+MOVED.update({name: 'match_parser' for name in ['MATCH_COLUMNS', 'new_match_columns', 'append_match_json_reporting',
+                                                'process_match_json_reporting', 'MatchBatchBuilder',
+                                                'format_match_dataframe']})
+MOVED.update({name: 'db_writer' for name in ['from_df_to_db', 'update_champion_summary']})
+# Former module globals read from config.ini -> Config attribute
+CONFIG_NAMES = {'url': 'supabase_url', 'key': 'supabase_key', 'riot_base_url': 'riot_base_url',
+                'url_version': 'url_version'}
+
+__all__ = ['api_get_match_history_puuid'] + list(MOVED)
+
+
+def __getattr__(name):
+    if name in MOVED:
+        return getattr(importlib.import_module(MOVED[name]), name)
+    if name in CONFIG_NAMES:
+        from config import get_config
+        return getattr(get_config(), CONFIG_NAMES[name])
+    if name == 'api_key':
+        from config import get_config
+        return 'api_key=' + get_config().riot_api_key
+    raise AttributeError(f"module 'riot_functions' has no attribute '{name}'")
+
+
+def api_get_match_history_puuid(list_puuid, region='europe', debug=False, reporting_focus = False, asynchronous=False, store=None, cache=None,
+                                queue=None, start_time=None, end_time=None, max_matches=100, timelines=None, config=None):
     
     """Gets the match history for a given riot_id and riot_tag.
 
@@ -302,81 +47,113 @@ def api_get_match_history_puuid(list_puuid, region='europe', debug=False, report
         region (str, optional): Player's region. Defaults to 'americas'.
         debug (bool, optional): Whether or not to print out matchIds as they are processed. Defaults to False.
         reporting_focus (bool, optional): Whether or not to focus on only picks and winrate. Defaults to False.
+        asynchronous (bool, optional): Fetch on a single asyncio event loop (see riot_async.py). Defaults to False.
+        store (SupabaseMatchStore, optional): Incremental mode, only fetches the matches not stored yet
+            (see match_store.py). Defaults to None.
+        cache (MatchCache, optional): On-disk cache of raw match jsons checked before any download
+            (see match_cache.py). Defaults to None.
+        queue (int, optional): Queue id filter, e.g. 420 for ranked solo. Defaults to None.
+        start_time (int, optional): Epoch seconds, only matches played after it. Defaults to None.
+        end_time (int, optional): Epoch seconds, only matches played before it. Defaults to None.
+        max_matches (int, optional): Most recent matches per player, None for the whole history. Defaults to 100.
+        timelines (TimelineStore, optional): Also fetches the timelines of the matches into this store,
+            with the same session and rate limiter (see timeline.py). Defaults to None.
+        config (Config, optional): Api key and base url to use. Defaults to the process configuration.
 
     Returns:
         DataFrame: DataFrame of all matches.
     """
 
-    # Set up a session with retry mechanisms
-    session = FuturesSession(executor=ProcessPoolExecutor(max_workers=15))
-    retries = 5
-    status_forcelist = [429]
-    retry = Retry(
-        total=retries,
-        read=retries,
-        connect=retries,
-        respect_retry_after_header=True,
-        status_forcelist=status_forcelist,
-    )
-
-    adapter = HTTPAdapter(max_retries=retry)
-    session.mount('http://', adapter)
-    session.mount('https://', adapter)
-
-    list_matchIds = []
-    for player_puuid in list_puuid:
-        matchIds = api_get_match_history_ids(puuid=player_puuid)
-        for id in matchIds: #append the value to the list_matchIds and not lists
-            list_matchIds.append(id)
-
-    print('Nombre de matchs avec doublons:',len(list_matchIds))
-    print('Nombre de matchs sans doublons:',len(list(set(list_matchIds))))
-
-    df = pd.DataFrame()
-    list_matchIds = list(set(list_matchIds))
-
-    if len(list_matchIds) > 0:
+    if asynchronous:
+        from riot_async import run_match_history_puuid
+        return run_match_history_puuid(list_puuid, region=region, store=store, cache=cache, queue=queue,
+                                       start_time=start_time, end_time=end_time, max_matches=max_matches,
+                                       timelines=timelines, config=config)
+    from riot_client import api_request, riot_root_url, get_match_history_ids_many, new_riot_session
+    from match_parser import MatchBatchBuilder, format_match_dataframe
+    from metrics import get_metrics
+    from match_store import filter_new_match_ids
+
+    import requests
+    from match_stream import fetch_match_json
+
+    session = new_riot_session()
+    executor = ThreadPoolExecutor(max_workers=15)
+    try:
+        list_matchIds = []
+        with get_metrics().stage('match_ids'):
+            history_ids = get_match_history_ids_many(list_puuid, region, store=store, queue=queue,
+                                                     start_time=start_time, end_time=end_time,
+                                                     max_matches=max_matches, config=config)
+        for matchIds in history_ids.values():
+            for id in matchIds: #append the value to the list_matchIds and not lists
+                list_matchIds.append(id)
+
+        print('Nombre de matchs avec doublons:',len(list_matchIds))
+        print('Nombre de matchs sans doublons:',len(list(set(list_matchIds))))
+
+        builder = MatchBatchBuilder()
+        with get_metrics().stage('store_lookup'):
+            list_matchIds = filter_new_match_ids(store, list(dict.fromkeys(list_matchIds)))
+
+        if len(list_matchIds) == 0:
+            # If there are no new matches to process, print a message and return an empty DataFrame
+            print(f'No matches')
+            import pandas as pd
+            return pd.DataFrame()
+
+        t_fetch = get_metrics().start_stage('fetch_matches')
+
+        # Matches already downloaded once are read from the disk cache
+        list_matchIds_to_fetch = list_matchIds
+        if cache is not None:
+            cached_jsons, list_matchIds_to_fetch = cache.split(list_matchIds)
+            builder.extend(cached_jsons)
+            print('Nombre de matchs en cache:', len(cached_jsons))
 
         # If there are new matches to process, create asynchronous requests for match data
-        futures = [session.get(f'https://{region}.api.riotgames.com/lol/match/v5/matches/{matchId}' + '?' + api_key) for matchId in list_matchIds]
+        # (fetch_match_json checks the answer and stores it in the cache)
+        futures = {executor.submit(fetch_match_json, matchId, region, session, cache, config): matchId
+                   for matchId in list_matchIds_to_fetch}
 
         i = 0
 
-        # Iterate through completed asynchronous requests
+        # Iterate through completed asynchronous requests, a failed match does not stop the others
         for future in as_completed(futures):
-            resp = future.result()
             try:
-                x = resp.json()['metadata']['matchId']
-            except : 
-                    print('Answer :', resp.json())
-                
+                match_json = future.result()
+            except requests.RequestException as e:
+                print(f'Match {futures[future]} not retrieved: {e}')
+                continue
+            if match_json is None:
+                continue
+
             if debug:
                 # If debug is enabled, print match processing information
                 t1 = time.time()
-                df = pd.concat([df, process_match_json_reporting(resp.json())])
+                builder.add(match_json)
 
                 t2 = time.time()
-                
-                print('a',resp.json()['metadata']['matchId'] + f' - {i} ({round(t2 - t1, 2)}s)')
-         
-                i += 1
-            else:
-                df = pd.concat([df, process_match_json_reporting(resp.json())])
-                    
-
-        try:# Return the DataFrame containing information about the fetched matches
-            df['game_creation'] = pd.to_datetime(df['game_creation'], unit='ms')
-            df['game_start_timestamp'] = pd.to_datetime(df['game_start_timestamp'], unit='ms')
-            df['game_end_timestamp'] = pd.to_datetime(df['game_end_timestamp'], unit='ms')
-            df['time_played'] = df['time_played']/60000
-        except: 
-            None
-        return df
-        
-    else:
-        # If there are no new matches to process, print a message and return an empty DataFrame
-        print(f'No matches')
-        return pd.DataFrame()
-
 
+                print('a',match_json['metadata']['matchId'] + f' - {i} ({round(t2 - t1, 2)}s)')
 
+                i += 1
+            else:
+                builder.add(match_json)
+
+        get_metrics().end_stage('fetch_matches', t_fetch)
+        get_metrics().inc('rows_total', len(builder), stage='fetch_matches')
+        if timelines is not None:
+            from timeline import fetch_timelines
+            with get_metrics().stage('fetch_timelines'):
+                fetch_timelines(list_matchIds, timelines, region, session, executor, config=config)
+        if cache is not None:
+            cache.evict()
+        # Build the dataframe once for the whole batch
+        df = builder.to_dataframe()
+
+        # Return the DataFrame containing information about the fetched matches
+        return format_match_dataframe(df)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        session.close()
@@ -0,0 +1,137 @@
+### Imports
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from riot_functions import api_get_match_history_puuid
+
+# Platform of an account -> routing region of its match-v5 calls
+PLATFORM_REGIONS = {
+    'euw1': 'europe', 'eun1': 'europe', 'tr1': 'europe', 'ru': 'europe', 'me1': 'europe',
+    'na1': 'americas', 'br1': 'americas', 'la1': 'americas', 'la2': 'americas',
+    'kr': 'asia', 'jp1': 'asia',
+    'oc1': 'sea', 'ph2': 'sea', 'sg2': 'sea', 'th2': 'sea', 'tw2': 'sea', 'vn2': 'sea',
+}
+ROUTING_REGIONS = {'europe', 'americas', 'asia', 'sea'}
+
+
+def routing_region(value, default='europe'):
+    """Routing region of a roster entry's 'region' (either a platform like 'euw1' or a routing value)."""
+    if not value:
+        return default
+    value = value.lower()
+    if value in ROUTING_REGIONS:
+        return value
+    return PLATFORM_REGIONS.get(value, default)
+
+
+def load_rosters(supabase, teams=None, table='players'):
+    """Roster entries of the players table.
+
+    Args:
+        supabase (Client): Supabase client.
+        teams (list, optional): Teams to keep, None for every team. Defaults to None.
+        table (str, optional): Roster table. Defaults to 'players'.
+
+    Returns:
+        list: Rows with at least player_nickname, main_puuid and current_team.
+    """
+    query = supabase.table(table).select('*')
+    if teams:
+        query = query.in_('current_team', list(teams))
+    return query.execute().data
+
+
+def plan_regions(rows, store=None, default_region='europe', resolve=None):
+    """Groups the roster puuids by routing region, most recently active players first.
+
+    A player listed in several teams is planned once, so the matches the teams
+    share are fetched once. Recency is the player's latest stored game; players
+    without any stored game come last.
+
+    Args:
+        rows (list): Roster entries (see load_rosters).
+        store (SupabaseMatchStore, optional): Store giving the latest game of each player. Defaults to None.
+        default_region (str, optional): Region of the entries without one. Defaults to 'europe'.
+        resolve (callable, optional): Maps nicknames to puuids for the entries without main_puuid,
+            e.g. puuid_cache.resolve_puuids. Defaults to None.
+
+    Returns:
+        dict: Routing region -> list of puuids.
+    """
+    unresolved = [row for row in rows if not row.get('main_puuid') and row.get('player_nickname')]
+    if unresolved and resolve is not None:
+        for row, puuid in zip(unresolved, resolve([row['player_nickname'] for row in unresolved])):
+            row['main_puuid'] = puuid
+
+    plan = {}
+    for row in rows:
+        puuid = row.get('main_puuid')
+        if puuid:
+            region = routing_region(row.get('region'), default_region)
+            plan.setdefault(region, dict())[puuid] = None
+
+    def last_game(puuid):
+        mark = store.high_water_mark(puuid) if store is not None else None
+        return mark['start_time'] if mark is not None else 0
+
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        for region, puuids in plan.items():
+            last_games = dict(zip(puuids, executor.map(last_game, puuids)))
+            plan[region] = sorted(puuids, key=last_games.get, reverse=True)
+    return plan
+
+
+def refresh_regions(plan, handle_games, stream_batch_size=0, checkpoint_dir='.', **fetch_kwargs):
+    """Fetches the new games of every region in parallel.
+
+    Each routing region has its own rate limit budget, so the regions run on
+    their own thread and a full refresh takes about as long as the slowest one.
+    handle_games is called with each DataFrame fetched, one call at a time.
+
+    Args:
+        plan (dict): Routing region -> list of puuids (see plan_regions).
+        handle_games (callable): Stores a DataFrame of games.
+        stream_batch_size (int, optional): Streams batches of this many matches with a checkpoint
+            per region (see match_stream.py), 0 to fetch each region at once. Defaults to 0.
+        checkpoint_dir (str, optional): Directory of the per-region checkpoints. Defaults to '.'.
+        **fetch_kwargs: store, cache, timelines, max_matches... passed to the fetch.
+
+    Returns:
+        dict: Routing region -> {'players', 'rows', 'seconds'}, or {'players', 'error'} if it failed.
+    """
+    lock = threading.Lock()
+
+    def refresh(region, list_puuid):
+        t1 = time.perf_counter()
+        n_rows = 0
+        if stream_batch_size:
+            from match_stream import IngestCheckpoint, iter_match_history_batches
+            checkpoint = IngestCheckpoint(os.path.join(checkpoint_dir, f'ingest_checkpoint_{region}.json'))
+            batches = iter_match_history_batches(list_puuid, region, batch_size=stream_batch_size,
+                                                 checkpoint=checkpoint, **fetch_kwargs)
+        else:
+            batches = [api_get_match_history_puuid(list_puuid, region, asynchronous=True, **fetch_kwargs)]
+        for df_games in batches:
+            if len(df_games):
+                with lock:
+                    handle_games(df_games)
+                n_rows += len(df_games)
+        seconds = time.perf_counter() - t1
+        print(f'{region}: {len(list_puuid)} players, {n_rows} rows in {seconds:.1f}s')
+        return {'players': len(list_puuid), 'rows': n_rows, 'seconds': seconds}
+
+    if not plan:
+        return {}
+    with ThreadPoolExecutor(max_workers=len(plan)) as executor:
+        futures = {region: executor.submit(refresh, region, list_puuid) for region, list_puuid in plan.items()}
+        results = {}
+        for region, future in futures.items():
+            try:
+                results[region] = future.result()
+            except Exception as e:
+                # a failing region must not cost the others their refresh
+                print(f'{region}: refresh failed. Reason: {e}')
+                results[region] = {'players': len(plan[region]), 'error': str(e)}
+        return results
@@ -1,16 +1,11 @@
 import datetime
 import random
-from riot_functions import *
 import altair as alt
 import numpy as np
 import pandas as pd
 import streamlit as st
 
-from configparser import ConfigParser
-parser = ConfigParser()
-parser.read('config.ini')
-
-supabase: Client = create_client(url, key)
+from dashboard_data import get_team_roster, get_team_champion_stats, team_win_rates, player_win_rates, champion_icon
 
 ############## Functions 
 
@@ -45,20 +40,12 @@ st.title(" Zerance Trinkets")
 ## select box teams 
 selected_team = st.selectbox("Select a team (ONLY LILLE AVAILABLE)", list_teams)
 
-# get active players from select team 
-r = supabase.table('players').select('player_nickname,main_puuid').eq('current_team',selected_team).execute()
-
-# get puuid / nicknames lists
-list_puuid = []
-list_nickname = []
-for dict_player in r.data:
-    list_puuid.append(dict_player['main_puuid'])
-    list_nickname.append(dict_player['player_nickname'])
+# get active players from select team (puuid / nicknames lists)
+list_puuid, list_nickname = get_team_roster(selected_team)
 
-
-### get soloq from select players
-r = supabase.table('games_player').select('*').in_('puuid',list_puuid).execute()
-df_players = pd.DataFrame(r.data)
+### get soloq stats per champion from select players (cached, see dashboard_data.py)
+df_stats = get_team_champion_stats(selected_team)
+win_rates_by_player = team_win_rates(df_stats)
 
 
 
@@ -70,16 +57,11 @@ columns = [col1, col2, col3, col4, col5]
 for role, col, puuid, nickname in zip(list_roles, columns, list_puuid, list_nickname):
 
                 #get the  winrate for each role
-                df_player = df_players[(df_players['puuid'] == puuid) & (df_players['team_position'] == role)]
-
-                win_rates = df_player.groupby('champion')['win'].agg(['mean', 'size'])  # Aggregate mean and count
-                win_rates.columns = ['W/R', 'games']
-                win_rates['W/R'] = (win_rates['W/R'] * 100).round(2)
-                win_rates = win_rates.sort_values(by='games', ascending=False)
+                win_rates = player_win_rates(win_rates_by_player, puuid, role)
                 st.write(win_rates)
                 #display images
                 win_rates = win_rates.reset_index(drop = False)
-                win_rates['Champ'] = "https://ddragon.leagueoflegends.com/cdn/15.1.1/img/champion/" + win_rates['champion'] + ".png"
+                win_rates['Champ'] = win_rates['champion'].map(champion_icon)
                 win_rates.drop(columns=['champion'], inplace = True)
                 columns = ['Champ'] + [col for col in win_rates.columns if col != 'Champ']
                 win_rates = win_rates[columns]   
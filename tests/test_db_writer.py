@@ -0,0 +1,24 @@
+import pandas as pd
+
+from db_writer import champion_summary, champion_summary_built, from_df_to_db, rebuild_champion_summary
+from match_parser import MatchBatchBuilder, format_match_dataframe
+from sqlite_supabase import SQLiteSupabase
+from synthetic_matches import make_match_jsons
+
+
+def test_rebuild_champion_summary_counts_every_stored_game():
+    builder = MatchBatchBuilder()
+    builder.extend(make_match_jsons(12))
+    df = format_match_dataframe(builder.to_dataframe())
+    supabase = SQLiteSupabase()
+    from_df_to_db(supabase, df, 'game_player')
+    assert not champion_summary_built(supabase)
+
+    assert rebuild_champion_summary(supabase, batch_size=50) == len(champion_summary(df))
+    assert champion_summary_built(supabase)
+    stored = pd.DataFrame(supabase.table('player_champion_stats').select('puuid,team_position,champion,games,wins')
+                          .execute().data)
+    expected = champion_summary(df)
+    pd.testing.assert_frame_equal(stored.sort_values(['puuid', 'champion']).reset_index(drop=True),
+                                  expected.sort_values(['puuid', 'champion']).reset_index(drop=True),
+                                  check_dtype=False)
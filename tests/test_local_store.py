@@ -0,0 +1,29 @@
+import pytest
+
+from local_store import LocalStore, duckdb
+from match_parser import MatchBatchBuilder, format_match_dataframe
+from synthetic_matches import make_match_jsons
+
+ENGINES = ['sqlite', pytest.param('duckdb', marks=pytest.mark.skipif(duckdb is None, reason='duckdb not installed'))]
+
+
+@pytest.fixture
+def df_games():
+    builder = MatchBatchBuilder()
+    builder.extend(make_match_jsons(3))
+    return format_match_dataframe(builder.to_dataframe())
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_ingest_replaces_the_matches_of_a_batch_delivered_again(tmp_path, df_games, engine):
+    with LocalStore(str(tmp_path / f'local_store.{engine}'), engine) as store:
+        assert store.ingest(df_games) == len(df_games)
+        # the same batch again, with the kills of the first match changed
+        first_match = df_games['match_id'].iloc[0]
+        df_again = df_games.copy()
+        df_again.loc[df_again['match_id'] == first_match, 'kills'] = 99
+        store.ingest(df_again)
+        assert store.count() == len(df_games)
+        stored = store.player_games(columns=['match_id', 'kills'])
+        assert (stored.loc[stored['match_id'] == first_match, 'kills'] == 99).all()
+        assert (stored.loc[stored['match_id'] != first_match, 'kills'] != 99).all()
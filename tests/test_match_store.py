@@ -0,0 +1,60 @@
+import pandas as pd
+import pytest
+
+from match_store import SQLiteMatchStore, filter_new_match_ids, history_bounds_for
+
+
+def match_rows(match_id, day, n_players=10):
+    return [{'match_id': match_id, 'puuid': f'player-{i}', 'game_creation': pd.Timestamp(f'2025-01-{day:02d}')}
+            for i in range(n_players)]
+
+
+@pytest.fixture
+def store():
+    store = SQLiteMatchStore()
+    store.insert_df(pd.DataFrame(match_rows('EUW1_1', 1) + match_rows('EUW1_2', 2) + match_rows('EUW1_3', 3, 4)))
+    return store
+
+
+def test_stored_match_ids_only_counts_complete_matches(store):
+    assert store.stored_match_ids(['EUW1_1', 'EUW1_2', 'EUW1_3', 'EUW1_4']) == {'EUW1_1', 'EUW1_2'}
+
+
+def test_filter_new_match_ids(store):
+    ids = ['EUW1_4', 'EUW1_3', 'EUW1_2', 'EUW1_1']
+    assert filter_new_match_ids(store, ids) == ['EUW1_4', 'EUW1_3']
+    assert filter_new_match_ids(None, ids) == ids
+    assert filter_new_match_ids(store, []) == []
+
+
+def test_high_water_mark_skips_incomplete_matches(store):
+    # EUW1_3 is the latest game of player-0 but only 4 of its rows were stored
+    mark = store.high_water_mark('player-0')
+    assert mark == {'match_id': 'EUW1_2', 'start_time': int(pd.Timestamp('2025-01-02').timestamp())}
+    assert store.high_water_mark('unknown') is None
+
+
+def test_high_water_mark_stays_below_an_older_incomplete_match():
+    # EUW1_A lost 6 of its rows, the newer EUW1_B is complete: the walk must still reach EUW1_A
+    store = SQLiteMatchStore()
+    store.insert_df(pd.DataFrame(match_rows('EUW1_0', 1) + match_rows('EUW1_A', 2, 4) + match_rows('EUW1_B', 3)))
+    day_1 = int(pd.Timestamp('2025-01-01').timestamp())
+    assert store.high_water_mark('player-0') == {'match_id': 'EUW1_0', 'start_time': day_1}
+    assert history_bounds_for(store, 'player-0') == (day_1, {'EUW1_0'})
+    assert 'EUW1_A' in filter_new_match_ids(store, ['EUW1_B', 'EUW1_A'])
+
+
+def test_high_water_mark_without_complete_match_below_the_incomplete_ones():
+    store = SQLiteMatchStore()
+    store.insert_df(pd.DataFrame(match_rows('EUW1_A', 1, 4) + match_rows('EUW1_B', 2)))
+    assert store.high_water_mark('player-0') is None
+    assert history_bounds_for(store, 'player-0', 123) == (123, set())
+
+
+def test_history_bounds_for(store):
+    day_2 = int(pd.Timestamp('2025-01-02').timestamp())
+    assert history_bounds_for(None, 'player-0', 123) == (123, set())
+    assert history_bounds_for(store, 'unknown', 123) == (123, set())
+    assert history_bounds_for(store, 'player-0') == (day_2, {'EUW1_2'})
+    # the requested bound wins when it is more recent than the mark
+    assert history_bounds_for(store, 'player-0', day_2 + 10) == (day_2 + 10, {'EUW1_2'})
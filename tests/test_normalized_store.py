@@ -0,0 +1,49 @@
+import pandas as pd
+import pytest
+
+from match_parser import MatchBatchBuilder, format_match_dataframe
+from normalized_store import (DICTIONARY_TABLES, IdDictionary, NormalizedMatchStore, from_df_to_normalized_db,
+                              sync_dictionary)
+from sqlite_supabase import SQLiteSupabase
+from synthetic_matches import make_match_json
+
+
+def match_with_player(index, puuid):
+    """Synthetic match whose first participant is the given player."""
+    match_json = make_match_json(index)
+    match_json['metadata']['participants'][0] = puuid
+    match_json['info']['participants'][0]['puuid'] = puuid
+    return match_json
+
+
+@pytest.fixture
+def supabase():
+    builder = MatchBatchBuilder()
+    builder.extend([match_with_player(1, 'player-0'), match_with_player(2, 'player-0'), make_match_json(3)])
+    supabase = SQLiteSupabase()
+    from_df_to_normalized_db(supabase, format_match_dataframe(builder.to_dataframe()), IdDictionary(None))
+    return supabase
+
+
+def test_high_water_mark_is_the_latest_match_of_the_player(supabase):
+    dictionary = IdDictionary(None)
+    sync_dictionary(supabase, dictionary)
+    store = NormalizedMatchStore(supabase, dictionary)
+    latest = make_match_json(2)
+    mark = store.high_water_mark('player-0')
+    assert mark['match_id'] == latest['metadata']['matchId']
+    assert mark['start_time'] == int(pd.Timestamp(latest['info']['gameCreation'], unit='ms').timestamp())
+    assert store.high_water_mark('unknown') is None
+
+
+def test_sync_dictionary_keeps_the_ids_of_the_tables(supabase):
+    table = DICTIONARY_TABLES['puuid']
+    rows = supabase.table(table).select('id,puuid').order('id').execute().data
+    # an id lost by the table must not shift the ones after it
+    supabase.connection.execute(f'DELETE FROM "{table}" WHERE id = 3')
+    dictionary = IdDictionary(None)
+    sync_dictionary(supabase, dictionary)
+    for row in rows:
+        if row['id'] != 3:
+            assert dictionary.ids['puuid'][row['puuid']] == row['id']
+    assert dictionary.ids['puuid']['player-0'] == rows[0]['id']
@@ -0,0 +1,85 @@
+import time
+
+import pytest
+import requests
+
+from config import Config
+from mock_riot_server import start_mock_server
+from rate_limiter import RateLimiter, parse_rate_limit_header
+from riot_client import api_request, riot_root_url
+
+METHOD = 'match-v5.getMatch'
+
+
+@pytest.fixture
+def mock_server():
+    servers = []
+
+    def start(**kwargs):
+        server = start_mock_server(**kwargs)
+        servers.append(server)
+        config = Config('missing.ini')
+        config.riot_base_url = server.base_url
+        return server, config
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def get_matches(n, config, limiter, session):
+    url = riot_root_url('europe', config) + '/lol/match/v5/matches/EUW1_7000000001'
+    return [api_request(url, 'europe', METHOD, session, limiter, config=config) for _ in range(n)]
+
+
+def test_parse_rate_limit_header():
+    assert parse_rate_limit_header('20:1,100:120') == [(20, 1), (100, 120)]
+    assert parse_rate_limit_header('') == []
+    assert parse_rate_limit_header(None) == []
+
+
+def test_paces_below_the_server_limits(mock_server):
+    server, config = mock_server(app_limits='5:1')
+    limiter = RateLimiter(app_limits='5:1', headroom=1.0)
+    t1 = time.monotonic()
+    responses = get_matches(12, config, limiter, requests.Session())
+    elapsed = time.monotonic() - t1
+    assert [response.status_code for response in responses] == [200] * 12
+    assert server.stats['429'] == 0
+    # 12 requests at 5 per second need two more windows
+    assert elapsed >= 2
+
+
+def test_learns_the_limits_from_the_headers(mock_server):
+    server, config = mock_server(app_limits='4:1')
+    limiter = RateLimiter(app_limits='100:1')
+    get_matches(1, config, limiter, requests.Session())
+    assert [(bucket.limit, bucket.seconds) for bucket in limiter.app_buckets['europe']] == [(4, 1)]
+    assert [bucket.limit for bucket in limiter.method_buckets[('europe', METHOD)]] == [2000]
+
+
+def test_retries_a_429_after_retry_after(mock_server):
+    # two requests sent before any answer is seen: the server limit is hit once
+    server, config = mock_server(app_limits='1:1')
+    limiter = RateLimiter(app_limits='100:1')
+    session = requests.Session()
+    url = riot_root_url('europe', config) + '/lol/match/v5/matches/EUW1_7000000001'
+    assert session.get(url).status_code == 200
+    t1 = time.monotonic()
+    response = api_request(url, 'europe', METHOD, session, limiter, config=config)
+    assert response.status_code == 200
+    assert server.stats['429'] == 1
+    assert time.monotonic() - t1 >= 0.9
+    assert limiter.blocked_until['europe'] > 0
+
+
+def test_penalize_blocks_the_limited_scope():
+    limiter = RateLimiter()
+    retry_after = limiter.penalize('europe', METHOD, {'Retry-After': '2', 'X-Rate-Limit-Type': 'method'})
+    assert retry_after == 2
+    assert limiter.reserve('europe', METHOD) == pytest.approx(2, abs=0.1)
+    # the application scope and the other methods are not blocked
+    assert limiter.reserve('europe', 'match-v5.getTimeline') == 0
+    assert limiter.penalize('europe', METHOD, {}, default_retry_after=3) == 3
+    assert limiter.reserve('americas', METHOD) == 0
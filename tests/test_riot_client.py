@@ -0,0 +1,41 @@
+import pytest
+
+import riot_client
+
+
+class Answer:
+
+    def __init__(self, status_code, payload=None):
+        self.status_code = status_code
+        self.payload = payload
+
+    def json(self):
+        if self.payload is None:
+            raise ValueError('not json')
+        return self.payload
+
+
+@pytest.fixture
+def history(monkeypatch):
+    """History endpoint answering 403 for 'banned', two ids for the other players."""
+    calls = []
+
+    def api_request(url, region, method, session=None, limiter=None, max_retries=5, config=None):
+        calls.append(url)
+        return Answer(403) if '/banned/' in url else Answer(200, ['EUW1_2', 'EUW1_1'])
+
+    monkeypatch.setattr(riot_client, 'api_request', api_request)
+    monkeypatch.setattr(riot_client.time, 'sleep', lambda seconds: None)
+    monkeypatch.setattr(riot_client, 'riot_root_url', lambda region, config=None: 'http://riot')
+    return calls
+
+
+def test_failed_history_page_raises_after_the_retries(history):
+    with pytest.raises(RuntimeError):
+        riot_client.api_get_match_history_ids('banned', max_retries=2)
+    assert len(history) == 3
+
+
+def test_players_whose_walk_failed_are_skipped(history):
+    ids = riot_client.get_match_history_ids_many(['player-0', 'banned', 'player-1'])
+    assert ids == {'player-0': ['EUW1_2', 'EUW1_1'], 'player-1': ['EUW1_2', 'EUW1_1']}
@@ -0,0 +1,62 @@
+import copy
+
+import requests
+
+import timeline
+from match_parser import MatchBatchBuilder, format_match_dataframe
+from synthetic_matches import make_match_json, make_timeline_json
+from timeline import TimelineStore, early_game_features, extract_timeline_arrays, fetch_timelines, stack_at_minutes
+
+
+def arena_timeline(index):
+    """Timeline of a 16 players match, like Arena."""
+    timeline_json = make_timeline_json(index)
+    for p in range(10, 16):
+        timeline_json['info']['participants'].append({'participantId': p + 1, 'puuid': f'arena-{p}'})
+        for frame in timeline_json['info']['frames']:
+            frame['participantFrames'][str(p + 1)] = copy.deepcopy(frame['participantFrames']['1'])
+    return timeline_json
+
+
+class Answer:
+
+    def __init__(self, payload):
+        self.status_code = 200
+        self.payload = payload
+
+    def json(self):
+        if self.payload is None:
+            raise requests.exceptions.JSONDecodeError('Expecting value', '<html>502</html>', 0)
+        return self.payload
+
+
+def test_fetch_timelines_skips_the_failed_matches(tmp_path, monkeypatch):
+    answers = {make_match_json(i)['metadata']['matchId']: i for i in range(3)}
+
+    def api_request(url, region, method, session=None, limiter=None, max_retries=5, config=None):
+        index = answers[url.split('/')[-2]]
+        if index == 0:
+            raise requests.ConnectionError('connection reset')
+        return Answer(None if index == 1 else make_timeline_json(index))
+
+    monkeypatch.setattr(timeline, 'api_request', api_request)
+    monkeypatch.setattr(timeline, 'riot_root_url', lambda region, config=None: 'http://riot')
+    store = TimelineStore(str(tmp_path))
+    assert fetch_timelines(list(answers), store, max_workers=2) == 1
+    assert store.missing(list(answers)) == list(answers)[:2]
+
+
+def test_early_game_features_leave_out_the_matches_not_of_10_players(tmp_path):
+    store = TimelineStore(str(tmp_path))
+    for timeline_json in [make_timeline_json(0), arena_timeline(1)]:
+        store.put(timeline_json['metadata']['matchId'], extract_timeline_arrays(timeline_json))
+    builder = MatchBatchBuilder()
+    builder.extend([make_match_json(0), make_match_json(1)])
+    df = format_match_dataframe(builder.to_dataframe())
+
+    features = early_game_features(df, store)
+    assert set(features['match_id']) == {make_match_json(0)['metadata']['matchId']}
+    assert len(features) == 10
+    stacked = stack_at_minutes([store.get(make_match_json(0)['metadata']['matchId']),
+                                store.get(make_match_json(1)['metadata']['matchId'])], [10])
+    assert stacked.shape[2] == 16
@@ -0,0 +1,207 @@
+### Imports
+import hashlib
+import io
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from riot_client import api_request, riot_root_url
+from match_store import PLAYERS_PER_MATCH
+
+# Per-frame participant stats kept from the timeline, last axis of the arrays
+TIMELINE_STATS = ['total_gold', 'current_gold', 'xp', 'level', 'minions_killed', 'jungle_minions_killed',
+                  'damage_to_champions', 'position_x', 'position_y']
+STAT_INDEX = {stat: i for i, stat in enumerate(TIMELINE_STATS)}
+
+
+def timeline_url(matchId, region='europe', config=None):
+    return riot_root_url(region, config) + f'/lol/match/v5/matches/{matchId}/timeline'
+
+
+def api_get_match_timeline(matchId, region='europe', session=None, config=None):
+    """Gets the timeline json of a match (with the api key and base url of config, the process one by default).
+
+    Returns:
+        dict: Timeline JSON, None if the call failed or the answer is not a timeline.
+    """
+    try:
+        response = api_request(timeline_url(matchId, region, config), region, 'match-v5.getTimeline', session,
+                               config=config)
+        timeline_json = response.json() if response.status_code == 200 else None
+    except (requests.RequestException, ValueError) as e:
+        print(f"Timeline not retrieved for {matchId}: {e!r}")
+        return None
+    if not isinstance(timeline_json, dict) or 'info' not in timeline_json:
+        print(f"Timeline not retrieved for {matchId}: {response.status_code}")
+        return None
+    return timeline_json
+
+
+def extract_timeline_arrays(timeline_json):
+    """Extracts the per-frame participant stats of a timeline into arrays.
+
+    Args:
+        timeline_json (dict): Timeline JSON.
+
+    Returns:
+        dict: 'stats' int32 array (frames x participants x len(TIMELINE_STATS)), 'timestamps' int64 array
+        (frames, ms) and 'participants' (puuids, participantId order, 10 on Summoner's Rift).
+    """
+    info = timeline_json['info']
+    frames = info['frames']
+    participants = [p['puuid'] for p in sorted(info['participants'], key=lambda p: p['participantId'])] \
+        if 'participants' in info else timeline_json['metadata']['participants']
+    stats = np.zeros((len(frames), len(participants), len(TIMELINE_STATS)), dtype=np.int32)
+    timestamps = np.empty(len(frames), dtype=np.int64)
+    for f, frame in enumerate(frames):
+        timestamps[f] = frame['timestamp']
+        for participant_id, p in frame['participantFrames'].items():
+            position = p.get('position', {})
+            stats[f, int(participant_id) - 1] = (
+                p['totalGold'], p['currentGold'], p['xp'], p['level'], p['minionsKilled'],
+                p['jungleMinionsKilled'], p.get('damageStats', {}).get('totalDamageDoneToChampions', 0),
+                position.get('x', 0), position.get('y', 0))
+    return {'stats': stats, 'timestamps': timestamps, 'participants': np.array(participants)}
+
+
+class TimelineStore:
+
+    """Compact on-disk store of extracted timelines, one compressed .npz per match.
+
+    Files are sharded like the match cache: <root>/<platform>/<2 hex chars>/<match_id>.npz
+
+    Args:
+        root (str, optional): Directory. Defaults to 'timelines'.
+    """
+
+    def __init__(self, root='timelines'):
+        self.root = root
+
+    def path(self, matchId):
+        platform = matchId.split('_')[0]
+        shard = hashlib.sha1(matchId.encode()).hexdigest()[:2]
+        return os.path.join(self.root, platform, shard, matchId + '.npz')
+
+    def __contains__(self, matchId):
+        return os.path.exists(self.path(matchId))
+
+    def put(self, matchId, arrays):
+        path = self.path(matchId)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, **arrays)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(buffer.getvalue())
+        os.replace(tmp_path, path)
+
+    def get(self, matchId):
+        """Returns the arrays of a match, None if it is not stored."""
+        if matchId not in self:
+            return None
+        with np.load(self.path(matchId)) as npz:
+            return {name: npz[name] for name in npz.files}
+
+    def missing(self, list_matchIds):
+        return [matchId for matchId in list_matchIds if matchId not in self]
+
+
+def fetch_timelines(list_matchIds, store, region='europe', session=None, executor=None, max_workers=15, config=None):
+    """Fetches the timelines not stored yet and stores their extracted arrays.
+
+    Pass the session / executor of the match fetch to share its connections and
+    worker threads; every call goes through the shared rate limiter. A timeline
+    that cannot be retrieved or read is skipped, the next call fetches it again.
+
+    Returns:
+        int: Number of timelines stored.
+    """
+    list_matchIds = store.missing(list_matchIds)
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+    n_stored = 0
+    try:
+        for matchId, timeline_json in zip(list_matchIds, executor.map(
+                lambda matchId: api_get_match_timeline(matchId, region, session, config), list_matchIds)):
+            if timeline_json is None:
+                continue
+            try:
+                arrays = extract_timeline_arrays(timeline_json)
+            except (KeyError, TypeError, ValueError, IndexError) as e:
+                print(f"Timeline of {matchId} not readable: {e!r}")
+                continue
+            store.put(matchId, arrays)
+            n_stored += 1
+    finally:
+        if own_executor:
+            executor.shutdown()
+    print('Nombre de timelines:', n_stored)
+    return n_stored
+
+
+def stack_at_minutes(list_arrays, minutes):
+    """Stacks the stats of many matches at given minutes.
+
+    Returns:
+        ndarray: float array (matches x len(minutes) x participants x stats), participants being the
+        largest participant count of the matches; NaN when the game ended before or for the missing slots.
+    """
+    n_participants = max((arrays['stats'].shape[1] for arrays in list_arrays), default=PLAYERS_PER_MATCH)
+    stacked = np.full((len(list_arrays), len(minutes), n_participants, len(TIMELINE_STATS)), np.nan)
+    for m, arrays in enumerate(list_arrays):
+        frames = arrays['stats']
+        available = [k for k, minute in enumerate(minutes) if minute < len(frames)]
+        stacked[m, available, :frames.shape[1]] = frames[[minutes[k] for k in available]]
+    return stacked
+
+
+def early_game_features(df, store, minutes=(10, 15)):
+    """Gold / XP / CS at given minutes and their difference with the lane opponent.
+
+    Only the matches of 10 players are used: lane opponents do not exist in
+    the other modes (Arena...).
+
+    Args:
+        df (DataFrame): Parsed matches with match_id, puuid and opp_puuid.
+        store (TimelineStore): Extracted timelines.
+        minutes (tuple, optional): Minutes to read. Defaults to (10, 15).
+
+    Returns:
+        DataFrame: match_id, puuid and for each minute m: gold_at_m, xp_at_m, cs_at_m,
+        gold_diff_at_m, xp_diff_at_m, cs_diff_at_m.
+    """
+    list_matchIds, list_arrays = [], []
+    for matchId in df['match_id'].unique():
+        arrays = store.get(matchId)
+        if arrays is not None and len(arrays['participants']) == PLAYERS_PER_MATCH:
+            list_matchIds.append(matchId)
+            list_arrays.append(arrays)
+    if not list_arrays:
+        return pd.DataFrame(columns=['match_id', 'puuid'])
+
+    stacked = stack_at_minutes(list_arrays, list(minutes))  # matches x minutes x 10 x stats
+    gold = stacked[..., STAT_INDEX['total_gold']]
+    xp = stacked[..., STAT_INDEX['xp']]
+    cs = stacked[..., STAT_INDEX['minions_killed']] + stacked[..., STAT_INDEX['jungle_minions_killed']]
+
+    # lane opponent of every participant slot, from the parsed opp_puuid
+    participants = np.array([arrays['participants'] for arrays in list_arrays])  # matches x 10
+    slot = pd.Series(np.tile(np.arange(PLAYERS_PER_MATCH), len(list_arrays)),
+                     index=pd.MultiIndex.from_arrays([np.repeat(list_matchIds, PLAYERS_PER_MATCH), participants.ravel()]))
+    opp_puuid = df.set_index(['match_id', 'puuid'])['opp_puuid'].reindex(slot.index)
+    opp_slot = pd.Series(slot.values, index=slot.index).reindex(
+        pd.MultiIndex.from_arrays([slot.index.get_level_values(0), opp_puuid.values]))
+    has_opp = ~np.isnan(opp_slot.values.astype(float))
+    opp = np.where(has_opp, opp_slot.values, 0).astype(int).reshape(len(list_arrays), PLAYERS_PER_MATCH)
+    rows = np.arange(len(list_arrays))[:, None]
+
+    features = pd.DataFrame({'match_id': np.repeat(list_matchIds, PLAYERS_PER_MATCH), 'puuid': participants.ravel()})
+    for k, minute in enumerate(minutes):
+        for name, values in (('gold', gold[:, k]), ('xp', xp[:, k]), ('cs', cs[:, k])):
+            diff = values - values[rows, opp]
+            features[f'{name}_at_{minute}'] = values.ravel()
+            features[f'{name}_diff_at_{minute}'] = np.where(has_opp, diff.ravel(), np.nan)
+    return features
@@ -1,97 +1,136 @@
-from riot_functions import *
-import pandas as pd
-import json
-from datetime import datetime
-import traceback
-from supabase import create_client, Client
-from configparser import ConfigParser
 import multiprocessing
+import os
+from config import Config
 
 def main():
+    # the pipeline modules (pandas, supabase...) are imported here rather than at the top:
+    # a process spawned from this module does not pay for them
+    from supabase import create_client, Client
+    from match_store import SupabaseMatchStore
+    from db_writer import from_df_to_db, update_champion_summary, written_new_games
+    from match_cache import MatchCache
+    from puuid_cache import PuuidCache, resolve_puuids
+    from metrics import get_metrics
+    from scheduler import load_rosters, plan_regions, refresh_regions
 
-    parser = ConfigParser()
-    parser.read('config.ini')
+    # read config.ini once and pass it down: every Riot call of the run gets it explicitly
+    config = Config('config.ini')
 
-    # get keys 
-    url = str(parser.get('supabase', 'SUPABASE_URL'))
-    key= str(parser.get('supabase', 'SUPABASE_KEY'))
-    api_key = str(parser.get('riot_api', 'api_key'))
-    api_key = "api_key="+api_key
+    supabase: Client = create_client(config.supabase_url, config.supabase_key)
 
-    supabase: Client = create_client(url, key)
 
-
-    # list of nicknames 
-    list_nickname = ['Spiritual Realm#Shy','jué ji#00097','cant hold me#zeb','13 김수환#K13','enjawve#EUW']
-
-    def nicknames_to_gamename_tagline(list_nicknames : list):
+    def nicknames_to_puuids(list_nicknames : list):
         """
-        Converts a list of nicknames in the format 'gameName#tagLine' 
-        to a list of puuid by splitting in # and using
-        api_get_puuid function from riot_function.py'.
+        Converts a list of nicknames in the format 'gameName#tagLine'
+        to a list of puuid, concurrently and through the persistent
+        puuid cache (see puuid_cache.py).
 
         Args:
             list_nicknames (list): A list of nicknames in the format 'gameName#tagLine'.
 
         Returns:
-            list: A list of puuids.
-        """ 
-
-        list_puuid = []
-        for nickname in list_nicknames:
-            gameName, tagLine = nickname.split("#")
-            puuid = api_get_puuid(gameName = gameName,tagLine = tagLine)
-            list_puuid.append(puuid)
-        return list_puuid
-
-    # get puuid as list of players
-    list_puuid_players = nicknames_to_gamename_tagline(list_nickname)
-    # get df of all games they played
-    df_games = api_get_match_history_puuid(list_puuid_players)
-
-    def from_df_to_db(df : pd.DataFrame, table = None):
-        '''
-        Function that convert a df indexed to 0 right index according to db
-        & put it 
-        '''
-        df.reset_index(drop=True, inplace = True)
-        df.reset_index(drop=False,inplace = True) 
-        try : 
-            starting_index = supabase.table('game_player').select('index').order("index", desc=True).execute().data[0]['index'] #get the latest index in db
-        except IndexError as e:
-            starting_index = 0
-            
-        
-        # Update the "index" column
-        df['index'] = range(starting_index, starting_index + len(df))
-
-        def epoch_to_iso(epoch_time):
-            return datetime.utcfromtimestamp(epoch_time / 1000).isoformat() + 'Z'
-
-        for i in range(len(df)-1):
-            json_row = df.iloc[i].to_json()
-            json_row = json.loads(json_row)
-            try:
-                transformed_data = {
-                **json_row,  # Start with the base JSON
-                'game_creation': epoch_to_iso(json_row['game_creation']),
-                'game_start_timestamp': epoch_to_iso(json_row['game_start_timestamp']),
-                'game_end_timestamp': epoch_to_iso(json_row['game_end_timestamp']),
-                }
-                # Attempt to insert data into the database
-                supabase.table(table).insert(transformed_data).execute()
+            list: A list of puuids, None for the unresolved nicknames.
+        """
 
+        cache = PuuidCache(config.get('cache', 'puuid_cache_path', fallback='puuid_cache.json'))
+        return resolve_puuids(list_nicknames, cache=cache, config=config)
+
+    # 'wide' (game_player), 'normalized' (matches + match_participant, see normalized_store.py) or 'both'
+    layout = config.get('storage', 'layout', fallback='wide')
+    dictionary = None
+    if layout != 'wide':
+        from normalized_store import IdDictionary, NormalizedMatchStore, from_df_to_normalized_db, sync_dictionary
+        dictionary = IdDictionary(config.get('storage', 'dictionary_path', fallback='id_dictionary.json'))
+        # restore the ids the database holds beyond the local file before the store looks players up
+        sync_dictionary(supabase, dictionary)
+    store = NormalizedMatchStore(supabase, dictionary) if layout == 'normalized' else SupabaseMatchStore(supabase, 'game_player')
+    cache = MatchCache(config.get('cache', 'match_cache_dir', fallback='match_cache'),
+                       max_bytes=config.getint('cache', 'max_bytes', fallback=2 * 1024 ** 3))
+    # timelines (gold/xp/cs per minute) are only fetched when a timeline directory is configured
+    timeline_root = config.get('timeline', 'root', fallback='')
+    timelines = None
+    if timeline_root:
+        from timeline import TimelineStore
+        timelines = TimelineStore(timeline_root)
+
+    # local analytical copy of the games for the dashboard and the notebooks (see local_store.py)
+    local_store_path = config.get('local_store', 'path', fallback='')
+
+    def store_games(df_games):
+        batch_size = config.getint('supabase', 'batch_size', fallback=500)
+        max_workers = config.getint('supabase', 'max_workers', fallback=4)
+        # matches already complete before the write (batch delivered again) must not be counted twice
+        stored_match_ids = store.stored_match_ids(df_games['match_id'].unique().tolist())
+        failed_match_ids = set()
+        if layout != 'normalized':
+            written = from_df_to_db(supabase, df_games, 'game_player', batch_size=batch_size, max_workers=max_workers)
+            failed_match_ids |= written['failed_match_ids']
+        if dictionary is not None:
+            written = from_df_to_normalized_db(supabase, df_games, dictionary, batch_size=batch_size,
+                                               max_workers=max_workers)
+            failed_match_ids |= written['failed_match_ids']
+        # the writers below append: they only get the matches stored for the first time
+        new_games = written_new_games(df_games, stored_match_ids, failed_match_ids)
+
+        # keep a typed, partitioned copy for the analyses when a parquet root is configured
+        parquet_root = config.get('parquet', 'root', fallback='')
+        if parquet_root:
+            from parquet_store import write_parquet_dataset
+            write_parquet_dataset(new_games, parquet_root)
+
+        # merge the new games into the analytics rollups when a rollup directory is configured
+        rollup_dir = config.get('analytics', 'rollup_dir', fallback='')
+        if rollup_dir and not new_games.empty:
+            from analytics import update_rollup
+            os.makedirs(rollup_dir, exist_ok=True)
+            update_rollup(os.path.join(rollup_dir, 'champion_rollup.parquet'), new_games)
+            update_rollup(os.path.join(rollup_dir, 'matchup_rollup.parquet'), new_games, matchups=True)
+
+        # replaces the batch's matches: a batch delivered again is not counted twice. The file is only
+        # held for the write, the dashboard reads it in between
+        if local_store_path:
+            from local_store import open_local_store
+            try:
+                # refresh_regions already calls store_games one region at a time, only the readers
+                # of other processes can hold the file, open_local_store waits for them
+                with open_local_store(local_store_path, config.get('local_store', 'engine', fallback=None)) as local_store:
+                    local_store.ingest(df_games)
             except Exception as e:
-                # Log the exception and row index
-                print(f"Failed to insert row {i}. Reason: {str(e)}")
-                # Optionally, print the stack trace for debugging
-                traceback.print_exc()
+                # rebuild it with python local_store.py --from-parquet
+                print(f"Local store not updated: {e}")
 
-    from_df_to_db(df_games,'game_player')
+        # keep the dashboard summary in sync with the new games, only the matches counted for the first time
+        if config.getboolean('supabase', 'champion_summary', fallback=False):
+            try:
+                update_champion_summary(supabase, new_games, 'player_champion_stats')
+            except Exception as e:
+                # the dashboard aggregates the games when the summary is not available
+                print(f"Champion summary not updated: {e}")
+
+    # rosters of the players table, grouped by routing region, most recently active players first
+    teams = [team.strip() for team in config.get('scheduler', 'teams', fallback='').split(',') if team.strip()]
+    plan = plan_regions(load_rosters(supabase, teams or None), store,
+                        default_region=config.get('scheduler', 'default_region', fallback='europe'),
+                        resolve=nicknames_to_puuids)
+    # the regions have their own rate limits and run in parallel, large backfills are
+    # streamed batch by batch with a resumable checkpoint per region
+    fetch_kwargs = dict(store=store, cache=cache, timelines=timelines, config=config)
+    stream_batch_size = config.getint('ingest', 'stream_batch_size', fallback=0)
+    if stream_batch_size:
+        fetch_kwargs.update(max_in_flight=config.getint('ingest', 'max_in_flight', fallback=30),
+                            max_matches=config.getint('ingest', 'max_matches', fallback=100) or None)
+    refresh_regions(plan, store_games, stream_batch_size,
+                    checkpoint_dir=config.get('ingest', 'checkpoint_dir', fallback='.'), **fetch_kwargs)
+
+    # per-stage metrics of the run, to compare runs and spot regressions
+    metrics = get_metrics()
+    metrics.write_run_summary(config.get('metrics', 'summary_path', fallback='run_summary.json'))
+    textfile = config.get('metrics', 'prometheus_textfile', fallback='')
+    if textfile:
+        metrics.write_prometheus_textfile(textfile)
 
 if __name__ == '__main__':
     # Make sure to use this idiom to avoid issues with multiprocessing
     multiprocessing.set_start_method('spawn')  # Optional if you want to set the start method explicitly
     main()
-    
-## FIXME : check for duplicates match_id from db to not waste time -> make a query to db in list_match_ids? | check for the issue about not having 10 rows for all match_id in db
+